@@ -2,11 +2,22 @@
 API endpoints для работы с бронированиями
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
 from sqlalchemy.orm import Session
 from typing import Optional
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+from app.core.config import settings
 from app.core.database import get_db
 from app.core.auth import get_current_user_id
+from app.core.http_cache import (
+    make_etag,
+    make_version_etag,
+    check_not_modified,
+    if_match_versions,
+)
+from app.core.idempotency import idempotent, request_fingerprint
+from app.core.loaders import RequestLoaders, get_loaders
 from app.schemas.booking import (
     BookingCreate,
     BookingUpdate,
@@ -15,31 +26,165 @@ from app.schemas.booking import (
     BookingSearchParams,
     BookingStatusUpdate,
 )
-from app.schemas.booking_point import BookingPointResponse
+from app.schemas.booking_point import (
+    BookingPointResponse,
+    BookingPointNearbyResponse,
+    BookingPointSlotsResponse,
+)
 from app.services.booking_service import BookingService
-from app.models.booking_point import BookingPoint
+from app.utils.working_hours import week_slot
 
 router = APIRouter(prefix="/bookings", tags=["Бронирования"])
 
+BOOKING_RELATIONS = ("book", "borrower", "booking_point")
+
+# Поиск ближайших пунктов: максимум результатов и радиуса
+NEARBY_MAX_RESULTS = 50
+NEARBY_MAX_RADIUS_KM = 500
+
+# Слоты выдачи: период по умолчанию и максимальный период
+SLOTS_DEFAULT_DAYS = 14
+SLOTS_MAX_DAYS = 92
+
+
+def _set_booking_etag(response: Response, booking) -> None:
+    """ETag с версией бронирования (принимается в If-Match при смене статуса)"""
+    response.headers["ETag"] = make_version_etag(booking.version_id, "booking", booking.id)
+
+
+def _local_time(moment: Optional[datetime], now: bool) -> Optional[datetime]:
+    """Момент для фильтра по часам работы в часовом поясе пунктов выдачи"""
+    local_zone = ZoneInfo(settings.local_timezone)
+    if now:
+        return datetime.now(local_zone)
+    if moment is not None and moment.tzinfo is not None:
+        return moment.astimezone(local_zone)
+    # Время без часового пояса считается местным
+    return moment
+
 
 @router.get("/booking-points", response_model=list[BookingPointResponse])
-async def get_booking_points(db: Session = Depends(get_db)):
+async def get_booking_points(
+    request: Request,
+    response: Response,
+    open_at: Optional[datetime] = Query(
+        None, description="Только пункты, открытые в этот момент"
+    ),
+    open_now: bool = Query(False, description="Только открытые сейчас пункты"),
+    db: Session = Depends(get_db),
+):
     """Получение списка пунктов выдачи"""
-    booking_points = db.query(BookingPoint).filter(BookingPoint.is_active == True).all()
+    if open_now and open_at is not None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Укажите либо open_at, либо open_now",
+        )
+
+    booking_service = BookingService(db)
+    moment = _local_time(open_at, open_now)
+    if moment is None:
+        booking_points = booking_service.get_booking_points()
+    else:
+        # Фильтр битовыми операциями по закэшированным картам часов работы
+        booking_points = booking_service.get_open_booking_points(moment)
+
+    # Версия списка считается по закэшированным данным, без обращения к БД
+    last_modified = max(
+        (
+            datetime.fromisoformat(point["updated_at"])
+            for point in booking_points
+            if point.get("updated_at")
+        ),
+        default=None,
+    )
+    etag = make_etag(
+        "booking-points",
+        len(booking_points),
+        last_modified,
+        week_slot(moment) if moment is not None else None,
+    )
+    not_modified = check_not_modified(request, response, etag, last_modified)
+    if not_modified:
+        return not_modified
+
     return booking_points
 
 
+@router.get("/booking-points/nearby", response_model=list[BookingPointNearbyResponse])
+async def get_nearby_booking_points(
+    lat: float = Query(..., ge=-90, le=90, description="Широта"),
+    lng: float = Query(..., ge=-180, le=180, description="Долгота"),
+    k: int = Query(5, ge=1, le=NEARBY_MAX_RESULTS, description="Количество пунктов"),
+    radius_km: float = Query(
+        25, gt=0, le=NEARBY_MAX_RADIUS_KM, description="Радиус поиска, км"
+    ),
+    db: Session = Depends(get_db),
+):
+    """Ближайшие пункты выдачи, по возрастанию расстояния"""
+    return BookingService(db).get_nearby_booking_points(lat, lng, k, radius_km)
+
+
+@router.get(
+    "/booking-points/{booking_point_id}/slots", response_model=BookingPointSlotsResponse
+)
+async def get_booking_point_slots(
+    booking_point_id: str,
+    date_from: Optional[date] = Query(
+        None, alias="from", description="Начало периода (по умолчанию сегодня)"
+    ),
+    date_to: Optional[date] = Query(
+        None, alias="to", description="Конец периода, не включая дату"
+    ),
+    db: Session = Depends(get_db),
+):
+    """Свободные слоты выдачи пункта по дням"""
+    date_from = date_from or date.today()
+    date_to = date_to or date_from + timedelta(days=SLOTS_DEFAULT_DAYS)
+    if date_to <= date_from:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Конец периода должен быть позже начала",
+        )
+    if (date_to - date_from).days > SLOTS_MAX_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Период не может быть длиннее {SLOTS_MAX_DAYS} дней",
+        )
+
+    slots = BookingService(db).get_booking_point_slots(
+        booking_point_id, date_from, date_to
+    )
+    if slots is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Пункт выдачи не найден"
+        )
+    return slots
+
+
 @router.post("/", response_model=BookingResponse, status_code=status.HTTP_201_CREATED)
 async def create_booking(
     booking_data: BookingCreate,
     request: Request,
     db: Session = Depends(get_db),
+    loaders: RequestLoaders = Depends(get_loaders),
 ):
-    """Создание бронирования"""
+    """Создание бронирования (поддерживает Idempotency-Key)"""
     current_user_id = get_current_user_id(request)
     booking_service = BookingService(db)
-    booking = booking_service.create_booking(booking_data, current_user_id)
-    return booking
+
+    def create() -> dict:
+        booking = booking_service.create_booking(booking_data, current_user_id)
+        loaders.attach([booking], *BOOKING_RELATIONS)
+        return BookingResponse.model_validate(booking).model_dump(mode="json")
+
+    fingerprint = request_fingerprint(request, booking_data.model_dump(mode="json"))
+    return await idempotent(
+        request,
+        current_user_id,
+        fingerprint,
+        create,
+        status_code=status.HTTP_201_CREATED,
+    )
 
 
 @router.get("/", response_model=BookingListResponse)
@@ -51,6 +196,7 @@ async def get_bookings(
     limit: int = Query(20, ge=1, le=100, description="Количество на странице"),
     request: Request = None,
     db: Session = Depends(get_db),
+    loaders: RequestLoaders = Depends(get_loaders),
 ):
     """Получение бронирований пользователя"""
     current_user_id = get_current_user_id(request)
@@ -66,6 +212,9 @@ async def get_bookings(
 
     bookings, total = booking_service.get_user_bookings(current_user_id, search_params)
 
+    # Книги, заемщики и пункты выдачи - по одному запросу на тип сущности
+    loaders.attach(bookings, *BOOKING_RELATIONS)
+
     # Преобразование в формат ответа
     booking_responses = []
     for booking in bookings:
@@ -83,7 +232,9 @@ async def get_bookings(
 async def get_booking(
     booking_id: str,
     request: Request,
+    response: Response,
     db: Session = Depends(get_db),
+    loaders: RequestLoaders = Depends(get_loaders),
 ):
     """Детальная информация о бронировании"""
     current_user_id = get_current_user_id(request)
@@ -98,13 +249,16 @@ async def get_booking(
     # Проверка прав доступа
     book = booking.book
     if not book or (
-        book.owner_id != current_user_id and booking.borrower_id != current_user_id
+        str(book.owner_id) != str(current_user_id)
+        and str(booking.borrower_id) != str(current_user_id)
     ):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Нет прав для просмотра этого бронирования",
         )
 
+    loaders.attach([booking], *BOOKING_RELATIONS)
+    _set_booking_etag(response, booking)
     return booking
 
 
@@ -113,13 +267,18 @@ async def update_booking_status(
     booking_id: str,
     status_data: BookingStatusUpdate,
     request: Request,
+    response: Response,
     db: Session = Depends(get_db),
+    loaders: RequestLoaders = Depends(get_loaders),
 ):
     """Изменение статуса бронирования"""
     current_user_id = get_current_user_id(request)
     booking_service = BookingService(db)
     booking = booking_service.update_booking_status(
-        booking_id, status_data.status, current_user_id
+        booking_id,
+        status_data.status,
+        current_user_id,
+        expected_versions=if_match_versions(request),
     )
 
     if not booking:
@@ -127,6 +286,8 @@ async def update_booking_status(
             status_code=status.HTTP_404_NOT_FOUND, detail="Бронирование не найдено"
         )
 
+    loaders.attach([booking], *BOOKING_RELATIONS)
+    _set_booking_etag(response, booking)
     return booking
 
 
@@ -139,7 +300,9 @@ async def cancel_booking(
     """Отмена бронирования"""
     current_user_id = get_current_user_id(request)
     booking_service = BookingService(db)
-    success = booking_service.cancel_booking(booking_id, current_user_id)
+    success = booking_service.cancel_booking(
+        booking_id, current_user_id, expected_versions=if_match_versions(request)
+    )
 
     if not success:
         raise HTTPException(
@@ -151,18 +314,24 @@ async def cancel_booking(
 async def confirm_pickup(
     booking_id: str,
     request: Request,
+    response: Response,
     db: Session = Depends(get_db),
+    loaders: RequestLoaders = Depends(get_loaders),
 ):
     """Подтверждение получения книги"""
     current_user_id = get_current_user_id(request)
     booking_service = BookingService(db)
-    booking = booking_service.confirm_pickup(booking_id, current_user_id)
+    booking = booking_service.confirm_pickup(
+        booking_id, current_user_id, expected_versions=if_match_versions(request)
+    )
 
     if not booking:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Бронирование не найдено"
         )
 
+    loaders.attach([booking], *BOOKING_RELATIONS)
+    _set_booking_etag(response, booking)
     return booking
 
 
@@ -170,18 +339,24 @@ async def confirm_pickup(
 async def confirm_return(
     booking_id: str,
     request: Request,
+    response: Response,
     db: Session = Depends(get_db),
+    loaders: RequestLoaders = Depends(get_loaders),
 ):
     """Подтверждение возврата книги"""
     current_user_id = get_current_user_id(request)
     booking_service = BookingService(db)
-    booking = booking_service.confirm_return(booking_id, current_user_id)
+    booking = booking_service.confirm_return(
+        booking_id, current_user_id, expected_versions=if_match_versions(request)
+    )
 
     if not booking:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Бронирование не найдено"
         )
 
+    loaders.attach([booking], *BOOKING_RELATIONS)
+    _set_booking_etag(response, booking)
     return booking
 
 
@@ -2,29 +2,149 @@
 API endpoints для работы с книгами
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File, Request
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, Query, UploadFile, File, Request
 from sqlalchemy.orm import Session
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
+import base64
+import hashlib
+import logging
 import os
-from datetime import datetime
-from app.core.database import get_db
+import uuid
+from datetime import date, datetime, timedelta
+from pydantic import ValidationError
+from app.core.database import get_db, SessionLocal
 from app.core.auth import get_current_user_id, get_current_user
+from app.core.http_cache import (
+    make_etag,
+    make_version_etag,
+    if_match_versions,
+    latest,
+    is_not_modified,
+    has_conditional_headers,
+    conditional_json_response,
+)
+from app.core.idempotency import idempotent, request_fingerprint
+from app.core.singleflight import catalog_flight
+from app.core.loaders import RequestLoaders, get_loaders
+from app.core.response_cache import catalog_cache, CATALOG_TAG, book_tag, owner_tag
 from app.utils.image_processing import validate_image, process_image
 from app.schemas.book import (
     BookCreate,
     BookUpdate,
     BookResponse,
     BookListResponse,
+    BookAvailabilityResponse,
     BookSearchParams,
+    NearbyBookListResponse,
+    NearbyBookResponse,
+    WaitlistPositionResponse,
     BookSearchParams as SearchParams,
 )
 from app.services.book_service import BookService
+from app.services.waitlist_service import WaitlistService
+from app.services.auth_service import AuthService
 
 router = APIRouter(prefix="/books", tags=["Книги"])
 
+logger = logging.getLogger(__name__)
+
+# Книги рядом: максимальный радиус поиска, км
+NEARBY_MAX_RADIUS_KM = 100
+
+# Календарь доступности: период по умолчанию и максимальный период
+AVAILABILITY_DEFAULT_DAYS = 90
+AVAILABILITY_MAX_DAYS = 366
+
+
+def _catalog_cache_key(search_params: BookSearchParams) -> str:
+    """Ключ кэша страницы каталога по нормализованным параметрам поиска"""
+    # Поиск регистронезависимый (ilike), поэтому регистр не влияет на результат
+    params = {
+        field: value.lower() if isinstance(value, str) else value
+        for field, value in search_params.model_dump().items()
+    }
+    return catalog_cache.make_key("books", params)
+
+
+def _catalog_page_tags(search_params: BookSearchParams) -> List[str]:
+    """Теги страницы каталога для инвалидации"""
+    tags = [CATALOG_TAG]
+    if search_params.owner_id:
+        tags.append(owner_tag(search_params.owner_id))
+    return tags
+
+
+def _books_page_etag(search_params: BookSearchParams, versions: Dict[str, int]) -> str:
+    """
+    ETag страницы каталога по версиям ее тегов в кэше
+
+    Версии тегов увеличиваются при каждом изменении книг, владельцев
+    и бронирований и начинаются со случайного значения (см. ResponseCache),
+    поэтому проверка не обращается к базе данных.
+    Last-Modified у страниц каталога нет: без выборки время изменения
+    неизвестно.
+    """
+    return make_etag("books", search_params.model_dump_json(), *sorted(versions.items()))
+
+
+def _render_books_page(book_service: BookService, search_params: BookSearchParams) -> dict:
+    """Выборка и сериализация страницы каталога"""
+    books, total = book_service.get_books(search_params)
+    RequestLoaders(book_service.db).attach(books, "bookings")
+    owners = AuthService(book_service.db).get_users_display(
+        book.owner_id for book in books
+    )
+
+    # Преобразование в формат ответа
+    book_responses = []
+    for book in books:
+        book_response = BookResponse.model_validate(book)
+        book_response.owner = owners.get(book_response.owner_id)
+        book_responses.append(book_response)
+
+    limit = search_params.limit
+    pages = (total + limit - 1) // limit
+
+    return BookListResponse(
+        books=book_responses,
+        total=total,
+        page=search_params.page,
+        limit=limit,
+        pages=pages,
+    ).model_dump(mode="json")
+
+
+def _build_books_page(
+    search_params: BookSearchParams, cache_key: str
+) -> Tuple[dict, str, Optional[datetime]]:
+    """Построение страницы каталога в отдельной сессии с записью в кэш"""
+    db = SessionLocal()
+    try:
+        book_service = BookService(db)
+        # Версии тегов берем до выборки, чтобы не потерять параллельную инвалидацию
+        tags = _catalog_page_tags(search_params)
+        versions = catalog_cache.get_versions(tags)
+        etag = _books_page_etag(search_params, versions)
+        body = _render_books_page(book_service, search_params)
+        catalog_cache.set(cache_key, body, tags, versions, etag)
+        return body, etag, None
+    finally:
+        db.close()
+
+
+def _refresh_books_page(search_params: BookSearchParams, cache_key: str) -> None:
+    """Фоновое обновление устаревшей страницы каталога"""
+    try:
+        _build_books_page(search_params, cache_key)
+    except Exception:
+        logger.exception("Ошибка обновления кэша каталога")
+    finally:
+        catalog_cache.release_refresh(cache_key)
+
 
 @router.get("/", response_model=BookListResponse)
 async def get_books(
+    background_tasks: BackgroundTasks,
     search: Optional[str] = Query(
         None, description="Поиск по названию, автору или ISBN"
     ),
@@ -32,50 +152,312 @@ async def get_books(
     author: Optional[str] = Query(None, description="Фильтр по автору"),
     owner_id: Optional[str] = Query(None, description="Фильтр по владельцу"),
     available_only: bool = Query(True, description="Показать только доступные книги"),
+    available_from: Optional[date] = Query(
+        None, description="Свободна с даты (вместе с available_to)"
+    ),
+    available_to: Optional[date] = Query(
+        None, description="Свободна до даты, не включая ее"
+    ),
     page: int = Query(1, ge=1, description="Номер страницы"),
     limit: int = Query(20, ge=1, le=100, description="Количество книг на странице"),
-    db: Session = Depends(get_db),
+    request: Request = None,
 ):
     """Получение каталога книг с фильтрацией и поиском"""
-    book_service = BookService(db)
+    try:
+        search_params = SearchParams(
+            search=search,
+            genre=genre,
+            author=author,
+            owner_id=owner_id,
+            available_only=available_only,
+            available_from=available_from,
+            available_to=available_to,
+            page=page,
+            limit=limit,
+        )
+    except ValidationError as e:
+        error = e.errors()[0]
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(error.get("ctx", {}).get("error", error["msg"])),
+        )
 
-    search_params = SearchParams(
-        search=search,
-        genre=genre,
-        author=author,
-        owner_id=owner_id,
-        available_only=available_only,
-        page=page,
-        limit=limit,
+    # Кэш ответов: устаревшая запись отдается сразу и обновляется в фоне
+    cache_key = _catalog_cache_key(search_params)
+    cached = catalog_cache.get(cache_key)
+    if cached:
+        if cached.is_stale and catalog_cache.acquire_refresh(cache_key):
+            background_tasks.add_task(_refresh_books_page, search_params, cache_key)
+        return conditional_json_response(
+            request,
+            cached.body,
+            cached.etag,
+            cached.last_modified,
+            headers={"X-Cache": "STALE" if cached.is_stale else "HIT"},
+        )
+
+    # Промах кэша: одинаковые параллельные запросы разделяют одну выборку
+    if has_conditional_headers(request) and catalog_cache.is_available():
+        # Условный запрос: сверяем версии тегов каталога до тяжелой выборки
+        versions = catalog_cache.get_versions(_catalog_page_tags(search_params))
+        etag = _books_page_etag(search_params, versions)
+        if is_not_modified(request, etag):
+            return conditional_json_response(
+                request, None, etag, headers={"X-Cache": "MISS"}
+            )
+
+    body, etag, last_modified = await catalog_flight.do(
+        cache_key, _build_books_page, search_params, cache_key
+    )
+    return conditional_json_response(
+        request, body, etag, last_modified, headers={"X-Cache": "MISS"}
     )
 
-    books, total = book_service.get_books(search_params)
 
-    # Преобразование в формат ответа
-    book_responses = []
-    for book in books:
-        book_response = BookResponse.model_validate(book)
-        book_responses.append(book_response)
+@router.get("/genres", response_model=List[str])
+async def get_genres(db: Session = Depends(get_db)):
+    """Список жанров книг каталога"""
+    book_service = BookService(db)
+    return book_service.get_genres()
 
-    pages = (total + limit - 1) // limit
 
-    return BookListResponse(
-        books=book_responses, total=total, page=page, limit=limit, pages=pages
-    )
+def _encode_nearby_cursor(distance_km: float, book_id) -> str:
+    """Курсор страницы книг рядом: последняя пара (расстояние, id)"""
+    raw = f"{distance_km!r}:{book_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def _decode_nearby_cursor(cursor: str) -> Tuple[float, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        distance_km, book_id = raw.split(":", 1)
+        return float(distance_km), str(uuid.UUID(book_id))
+    except (ValueError, UnicodeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Некорректный курсор"
+        )
+
+
+@router.get("/nearby", response_model=NearbyBookListResponse)
+async def get_nearby_books(
+    lat: float = Query(..., ge=-90, le=90, description="Широта"),
+    lng: float = Query(..., ge=-180, le=180, description="Долгота"),
+    radius_km: float = Query(
+        10, gt=0, le=NEARBY_MAX_RADIUS_KM, description="Радиус поиска, км"
+    ),
+    limit: int = Query(20, ge=1, le=100, description="Количество на странице"),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы"),
+    db: Session = Depends(get_db),
+    loaders: RequestLoaders = Depends(get_loaders),
+):
+    """Доступные книги рядом, по возрастанию расстояния до пункта выдачи"""
+    after = _decode_nearby_cursor(cursor) if cursor else None
+    rows = BookService(db).get_nearby_books(lat, lng, radius_km, limit + 1, after)
+
+    page = rows[:limit]
+    loaders.attach([book for book, _, _ in page], "owner", "bookings")
+    books = []
+    for book, distance_km, point_id in page:
+        # Расстояние и пункт выдачи - не колонки книги, а результат поиска
+        book.distance_km, book.booking_point_id = distance_km, point_id
+        books.append(NearbyBookResponse.model_validate(book))
+
+    next_cursor = None
+    if len(rows) > limit:
+        last_book, last_distance, _ = page[-1]
+        next_cursor = _encode_nearby_cursor(last_distance, last_book.id)
+
+    return NearbyBookListResponse(books=books, next_cursor=next_cursor)
+
+
+def _book_validators(
+    book_service: BookService, book_id: str
+) -> Optional[Tuple[str, Optional[datetime]]]:
+    """
+    ETag и Last-Modified книги по дешевой проверке версии
+
+    ETag начинается с version_id книги и принимается в If-Match
+    при изменении и удалении книги.
+    """
+    version = book_service.get_book_version(book_id)
+    if not version:
+        return None
+    version_id, *updated = version
+    return make_version_etag(version_id, "book", book_id, *updated), latest(*updated)
+
+
+def _render_book(book_service: BookService, book_id: str) -> Optional[dict]:
+    """Загрузка и сериализация книги"""
+    book = book_service.get_book_with_owner(book_id)
+    if not book:
+        return None
+    return BookResponse.model_validate(book).model_dump(mode="json")
+
+
+def _probe_book(book_id: str) -> Optional[Tuple[str, Optional[datetime]]]:
+    """Проверка версии книги в отдельной сессии"""
+    db = SessionLocal()
+    try:
+        return _book_validators(BookService(db), book_id)
+    finally:
+        db.close()
+
+
+def _build_book(
+    book_id: str, cache_key: str
+) -> Optional[Tuple[dict, str, Optional[datetime]]]:
+    """
+    Построение карточки книги в отдельной сессии с записью в кэш
+
+    Если книга удалена или скрыта, запись удаляется из кэша: иначе она
+    отдавалась бы как устаревшая до истечения stale_ttl.
+    """
+    db = SessionLocal()
+    try:
+        book_service = BookService(db)
+        versions = catalog_cache.get_versions([book_tag(book_id)])
+        validators = _book_validators(book_service, book_id)
+        body = _render_book(book_service, book_id)
+        if not validators or body is None:
+            catalog_cache.delete(cache_key)
+            return None
+        etag, last_modified = validators
+        tags = [book_tag(book_id), owner_tag(body["owner_id"])]
+        catalog_cache.set(cache_key, body, tags, versions, etag, last_modified)
+        return body, etag, last_modified
+    finally:
+        db.close()
+
+
+def _refresh_book(book_id: str, cache_key: str) -> None:
+    """Фоновое обновление устаревшей карточки книги"""
+    try:
+        _build_book(book_id, cache_key)
+    except Exception:
+        logger.exception("Ошибка обновления кэша книги %s", book_id)
+    finally:
+        catalog_cache.release_refresh(cache_key)
 
 
 @router.get("/{book_id}", response_model=BookResponse)
-async def get_book(book_id: str, db: Session = Depends(get_db)):
+async def get_book(
+    book_id: str,
+    request: Request,
+    background_tasks: BackgroundTasks,
+):
     """Детальная информация о книге"""
-    book_service = BookService(db)
-    book = book_service.get_book_with_owner(book_id)
+    cache_key = catalog_cache.make_key("book", book_id.lower())
+    cached = catalog_cache.get(cache_key)
+    if cached:
+        if cached.is_stale and catalog_cache.acquire_refresh(cache_key):
+            background_tasks.add_task(_refresh_book, book_id, cache_key)
+        return conditional_json_response(
+            request,
+            cached.body,
+            cached.etag,
+            cached.last_modified,
+            headers={"X-Cache": "STALE" if cached.is_stale else "HIT"},
+        )
 
-    if not book:
+    if has_conditional_headers(request):
+        # Условный запрос: сверяем версию книги до загрузки и сериализации
+        validators = await catalog_flight.do(
+            f"probe:{cache_key}", _probe_book, book_id
+        )
+        if validators and is_not_modified(request, *validators):
+            return conditional_json_response(
+                request, None, *validators, headers={"X-Cache": "MISS"}
+            )
+
+    built = await catalog_flight.do(cache_key, _build_book, book_id, cache_key)
+    if not built:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Книга не найдена"
         )
 
-    return book
+    body, etag, last_modified = built
+    return conditional_json_response(
+        request, body, etag, last_modified, headers={"X-Cache": "MISS"}
+    )
+
+
+@router.get("/{book_id}/availability", response_model=BookAvailabilityResponse)
+async def get_book_availability(
+    book_id: str,
+    date_from: Optional[date] = Query(
+        None, alias="from", description="Начало периода (по умолчанию сегодня)"
+    ),
+    date_to: Optional[date] = Query(
+        None, alias="to", description="Конец периода, не включая дату"
+    ),
+    db: Session = Depends(get_db),
+):
+    """Календарь доступности книги: занятые и свободные периоды"""
+    date_from = date_from or date.today()
+    date_to = date_to or date_from + timedelta(days=AVAILABILITY_DEFAULT_DAYS)
+    if date_to <= date_from:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Конец периода должен быть позже начала",
+        )
+    if (date_to - date_from).days > AVAILABILITY_MAX_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Период не может быть длиннее {AVAILABILITY_MAX_DAYS} дней",
+        )
+
+    availability = BookService(db).get_book_availability(book_id, date_from, date_to)
+    if availability is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Книга не найдена"
+        )
+    return availability
+
+
+@router.post(
+    "/{book_id}/waitlist",
+    response_model=WaitlistPositionResponse,
+    status_code=status.HTTP_201_CREATED,
+)
+async def join_book_waitlist(
+    book_id: str,
+    request: Request,
+    db: Session = Depends(get_db),
+):
+    """Постановка в очередь ожидания книги, которая сейчас на руках"""
+    current_user_id = get_current_user_id(request)
+    return WaitlistService(db).join(book_id, current_user_id)
+
+
+@router.get("/{book_id}/waitlist", response_model=WaitlistPositionResponse)
+async def get_book_waitlist_position(
+    book_id: str,
+    request: Request,
+    db: Session = Depends(get_db),
+):
+    """Позиция текущего пользователя в очереди ожидания книги"""
+    current_user_id = get_current_user_id(request)
+    position = WaitlistService(db).get_position(book_id, current_user_id)
+
+    if not position:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Вы не в очереди на эту книгу"
+        )
+    return position
+
+
+@router.delete("/{book_id}/waitlist", status_code=status.HTTP_204_NO_CONTENT)
+async def leave_book_waitlist(
+    book_id: str,
+    request: Request,
+    db: Session = Depends(get_db),
+):
+    """Выход из очереди ожидания книги"""
+    current_user_id = get_current_user_id(request)
+    if not WaitlistService(db).leave(book_id, current_user_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Вы не в очереди на эту книгу"
+        )
 
 
 @router.post("/", response_model=BookResponse, status_code=status.HTTP_201_CREATED)
@@ -83,12 +465,25 @@ async def create_book(
     book_data: BookCreate,
     request: Request,
     db: Session = Depends(get_db),
+    loaders: RequestLoaders = Depends(get_loaders),
 ):
-    """Добавление новой книги"""
+    """Добавление новой книги (поддерживает Idempotency-Key)"""
     current_user_id = get_current_user_id(request)
     book_service = BookService(db)
-    book = book_service.create_book(book_data, current_user_id)
-    return book
+
+    def create() -> dict:
+        book = book_service.create_book(book_data, current_user_id)
+        loaders.attach([book], "owner", "bookings")
+        return BookResponse.model_validate(book).model_dump(mode="json")
+
+    fingerprint = request_fingerprint(request, book_data.model_dump(mode="json"))
+    return await idempotent(
+        request,
+        current_user_id,
+        fingerprint,
+        create,
+        status_code=status.HTTP_201_CREATED,
+    )
 
 
 @router.put("/{book_id}", response_model=BookResponse)
@@ -97,6 +492,7 @@ async def update_book(
     book_data: BookUpdate,
     request: Request,
     db: Session = Depends(get_db),
+    loaders: RequestLoaders = Depends(get_loaders),
 ):
     """Редактирование книги"""
     current_user_id = get_current_user_id(request)
@@ -110,13 +506,19 @@ async def update_book(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Нет данных для обновления"
         )
 
-    book = book_service.update_book(book_id, BookUpdate(**update_data), current_user_id)
+    book = book_service.update_book(
+        book_id,
+        BookUpdate(**update_data),
+        current_user_id,
+        expected_versions=if_match_versions(request),
+    )
 
     if not book:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Книга не найдена"
         )
 
+    loaders.attach([book], "owner", "bookings")
     return book
 
 
@@ -129,7 +531,9 @@ async def delete_book(
     """Удаление книги"""
     current_user_id = get_current_user_id(request)
     book_service = BookService(db)
-    success = book_service.delete_book(book_id, current_user_id)
+    success = book_service.delete_book(
+        book_id, current_user_id, expected_versions=if_match_versions(request)
+    )
 
     if not success:
         raise HTTPException(
@@ -137,14 +541,24 @@ async def delete_book(
         )
 
 
+def _file_digest(file: UploadFile) -> str:
+    """SHA-256 содержимого загружаемого файла (для отпечатка запроса)"""
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: file.file.read(65536), b""):
+        digest.update(chunk)
+    file.file.seek(0)
+    return digest.hexdigest()
+
+
 @router.post("/{book_id}/cover", response_model=BookResponse)
 async def upload_book_cover(
     book_id: str,
     request: Request,
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
+    loaders: RequestLoaders = Depends(get_loaders),
 ):
-    """Загрузка обложки книги"""
+    """Загрузка обложки книги (поддерживает Idempotency-Key)"""
     print(f"Загрузка обложки для книги {book_id}")
     print(f"Файл: {file.filename}, тип: {file.content_type}")
     
@@ -153,55 +567,63 @@ async def upload_book_cover(
     
     book_service = BookService(db)
 
-    # Проверяем, что книга существует и принадлежит пользователю
-    book = book_service.get_book_by_id(book_id)
-    if not book:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Книга не найдена"
-        )
-
-    if book.owner_id != current_user_id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Нет прав для загрузки обложки этой книги",
-        )
-
-    # Валидируем загружаемый файл
-    validate_image(file)
-
-    # Создаем директорию для обложек книг
-    book_covers_dir = os.path.join("static", "uploads", "book_covers")
-    os.makedirs(book_covers_dir, exist_ok=True)
-
-    # Обрабатываем и сохраняем изображение
-    try:
-        print(f"Обрабатываем изображение в директории: {book_covers_dir}")
-        file_path = process_image(file, book_covers_dir, max_size=(800, 600))
-        print(f"Изображение сохранено по пути: {file_path}")
-
-        # Удаляем старую обложку если есть
-        if book.cover_image_url:
-            old_cover_path = book.cover_image_url.replace("/static/", "static/")
-            if os.path.exists(old_cover_path):
-                os.remove(old_cover_path)
-                print(f"Удалена старая обложка: {old_cover_path}")
-
-        # Обновляем URL обложки в базе данных
-        cover_url = f"/static/uploads/book_covers/{os.path.basename(file_path)}"
-        book.cover_image_url = cover_url
-        book.updated_at = datetime.utcnow()
-        db.commit()
-        db.refresh(book)
-        
-        print(f"Обложка обновлена в БД: {cover_url}")
-
-        return BookResponse.model_validate(book)
-
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Ошибка при загрузке обложки: {str(e)}",
-        )
+    def upload() -> dict:
+        # Проверяем, что книга существует и принадлежит пользователю
+        book = book_service.get_book_by_id(book_id)
+        if not book:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Книга не найдена"
+            )
+
+        if str(book.owner_id) != str(current_user_id):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Нет прав для загрузки обложки этой книги",
+            )
+
+        # Валидируем загружаемый файл
+        validate_image(file)
+
+        # Создаем директорию для обложек книг
+        book_covers_dir = os.path.join("static", "uploads", "book_covers")
+        os.makedirs(book_covers_dir, exist_ok=True)
+
+        # Обрабатываем и сохраняем изображение
+        try:
+            print(f"Обрабатываем изображение в директории: {book_covers_dir}")
+            file_path = process_image(file, book_covers_dir, max_size=(800, 600))
+            print(f"Изображение сохранено по пути: {file_path}")
+
+            # Удаляем старую обложку если есть
+            if book.cover_image_url:
+                old_cover_path = book.cover_image_url.replace("/static/", "static/")
+                if os.path.exists(old_cover_path):
+                    os.remove(old_cover_path)
+                    print(f"Удалена старая обложка: {old_cover_path}")
+
+            # Обновляем URL обложки в базе данных
+            cover_url = f"/static/uploads/book_covers/{os.path.basename(file_path)}"
+            book.cover_image_url = cover_url
+            book.updated_at = datetime.utcnow()
+            db.commit()
+            db.refresh(book)
+            catalog_cache.invalidate(CATALOG_TAG, book_tag(book.id))
+
+            print(f"Обложка обновлена в БД: {cover_url}")
+
+            loaders.attach([book], "owner", "bookings")
+            return BookResponse.model_validate(book).model_dump(mode="json")
+
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Ошибка при загрузке обложки: {str(e)}",
+            )
+
+    fingerprint = request_fingerprint(
+        request, file.filename, file.content_type, _file_digest(file)
+    )
+    return await idempotent(request, current_user_id, fingerprint, upload)
 
 
 @router.delete("/{book_id}/cover", response_model=BookResponse)
@@ -209,6 +631,7 @@ async def delete_book_cover(
     book_id: str,
     request: Request,
     db: Session = Depends(get_db),
+    loaders: RequestLoaders = Depends(get_loaders),
 ):
     """Удаление обложки книги"""
     current_user_id = get_current_user_id(request)
@@ -221,7 +644,7 @@ async def delete_book_cover(
             status_code=status.HTTP_404_NOT_FOUND, detail="Книга не найдена"
         )
 
-    if book.owner_id != current_user_id:
+    if str(book.owner_id) != str(current_user_id):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Нет прав для удаления обложки этой книги",
@@ -238,18 +661,23 @@ async def delete_book_cover(
     book.updated_at = datetime.utcnow()
     db.commit()
     db.refresh(book)
+    catalog_cache.invalidate(CATALOG_TAG, book_tag(book.id))
 
+    loaders.attach([book], "owner", "bookings")
     return BookResponse.model_validate(book)
 
 
 @router.get("/my/books", response_model=BookListResponse)
 async def get_my_books(
-    request: Request, db: Session = Depends(get_db)
+    request: Request,
+    db: Session = Depends(get_db),
+    loaders: RequestLoaders = Depends(get_loaders),
 ):
     """Получение книг текущего пользователя"""
     current_user_id = get_current_user_id(request)
     book_service = BookService(db)
     books = book_service.get_user_books(current_user_id)
+    loaders.attach(books, "owner", "bookings")
 
     # Преобразование в формат ответа
     book_responses = []
@@ -2,14 +2,33 @@
 API endpoints для работы с уведомлениями
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+import asyncio
+import base64
+import uuid
+from datetime import datetime
+from typing import Optional, Tuple
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    status,
+    Request,
+    Response,
+)
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from app.core.database import get_db
+from app.core.config import settings
+from app.core.database import SessionLocal, get_db
+from app.core.notification_stream import STREAM_CLOSED, format_sse, notification_broker
 from app.core.auth import get_current_user_id
+from app.core.http_cache import make_etag, check_not_modified
 from app.schemas.notification import (
     NotificationResponse,
     NotificationListResponse,
     NotificationMarkRead,
+    UnreadCountResponse,
 )
 from app.services.notification_service import NotificationService
 from app.models.notification import Notification
@@ -17,21 +36,86 @@ from app.models.notification import Notification
 router = APIRouter(prefix="/notifications", tags=["Уведомления"])
 
 
+def _encode_feed_cursor(notification: Notification) -> str:
+    """Курсор ленты: пара (created_at, id) уведомления"""
+    raw = f"{notification.created_at.isoformat()}|{notification.id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def _decode_feed_cursor(cursor: str) -> Tuple[datetime, uuid.UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        created_at, notification_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), uuid.UUID(notification_id)
+    except (ValueError, UnicodeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Некорректный курсор"
+        )
+
+
 @router.get("/", response_model=NotificationListResponse)
 async def get_notifications(
-    limit: int = 50,
-    offset: int = 0,
+    limit: int = Query(50, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    before: Optional[str] = Query(None, description="Курсор более старой страницы"),
+    since: Optional[str] = Query(
+        None, description="Курсор последнего полученного: вернуть только новые"
+    ),
     request: Request = None,
+    response: Response = None,
     db: Session = Depends(get_db),
 ):
-    """Получение уведомлений пользователя"""
+    """
+    Получение уведомлений пользователя
+
+    Без курсоров - первая страница ленты, before - следующая (более старая)
+    страница. since - дельта: только уведомления новее курсора, без
+    подсчета всей ленты; sync_cursor ответа передается в следующий опрос.
+    """
     current_user_id = get_current_user_id(request)
     notification_service = NotificationService(db)
 
-    notifications = notification_service.get_user_notifications(
-        current_user_id, limit, offset
+    if since:
+        since_cursor = _decode_feed_cursor(since)
+        rows = notification_service.get_notifications_since(
+            current_user_id, since_cursor, limit + 1
+        )
+        new = rows[:limit]
+        return NotificationListResponse(
+            notifications=[
+                NotificationResponse.model_validate(notification)
+                for notification in reversed(new)
+            ],
+            unread_count=notification_service.get_unread_count(current_user_id),
+            sync_cursor=_encode_feed_cursor(new[-1]) if new else since,
+            has_more=len(rows) > limit,
+        )
+
+    before_cursor = _decode_feed_cursor(before) if before else None
+
+    # Условный запрос: один агрегат вместо выборки ленты и подсчета.
+    # Last-Modified не отдаем - отметка о прочтении не меняет created_at
+    count, unread_count, last_created = (
+        notification_service.get_notifications_version(current_user_id)
     )
-    unread_count = notification_service.get_unread_count(current_user_id)
+    etag = make_etag(
+        "notifications",
+        current_user_id,
+        limit,
+        offset,
+        before,
+        count,
+        unread_count,
+        last_created,
+    )
+    not_modified = check_not_modified(request, response, etag, private=True)
+    if not_modified:
+        return not_modified
+
+    rows = notification_service.get_user_notifications(
+        current_user_id, limit + 1, offset, before_cursor
+    )
+    notifications = rows[:limit]
 
     # Преобразование в формат ответа
     notification_responses = []
@@ -52,8 +136,103 @@ async def get_notifications(
 
     return NotificationListResponse(
         notifications=notification_responses,
-        total=len(notifications),
+        total=count,
         unread_count=unread_count,
+        next_cursor=(
+            _encode_feed_cursor(notifications[-1]) if len(rows) > limit else None
+        ),
+        # Курсор для дельты - самое новое уведомление первой страницы
+        sync_cursor=(
+            _encode_feed_cursor(notifications[0])
+            if notifications and not before and not offset
+            else None
+        ),
+    )
+
+
+@router.get("/unread-count", response_model=UnreadCountResponse)
+async def get_unread_count(request: Request, db: Session = Depends(get_db)):
+    """Количество непрочитанных уведомлений (без обращения к таблице уведомлений)"""
+    current_user_id = get_current_user_id(request)
+    return UnreadCountResponse(
+        unread_count=NotificationService(db).get_unread_count(current_user_id)
+    )
+
+
+@router.get("/stream")
+async def stream_notifications(
+    request: Request,
+    last_event_id: Optional[str] = None,
+    last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID"),
+):
+    """
+    Поток новых уведомлений (Server-Sent Events)
+
+    Событие notification содержит уведомление, id события - id уведомления.
+    При переподключении с Last-Event-ID (заголовок или параметр
+    last_event_id) сначала отдаются пропущенные уведомления. Пока новых
+    уведомлений нет, соединение не выполняет запросов к базе данных.
+    """
+    current_user_id = get_current_user_id(request)
+    queue = notification_broker.subscribe(current_user_id)
+
+    # Подписка оформлена до догрузки: уведомления, созданные во время
+    # запроса, попадут в очередь, а повторы отфильтруются по id
+    missed = []
+    resume_from = last_event_id_header or last_event_id
+    if resume_from:
+        try:
+            last_id = uuid.UUID(resume_from)
+        except ValueError:
+            last_id = None
+        if last_id is not None:
+            db = SessionLocal()
+            try:
+                missed = [
+                    NotificationResponse.model_validate(notification)
+                    for notification in NotificationService(db).get_notifications_after(
+                        current_user_id, last_id, settings.notification_stream_resume_limit
+                    )
+                ]
+            finally:
+                db.close()
+
+    async def events():
+        sent = set()
+        try:
+            yield format_sse("", event="ready")
+            for notification in missed:
+                sent.add(notification.id)
+                yield format_sse(
+                    notification.model_dump_json(), "notification", notification.id
+                )
+
+            while True:
+                try:
+                    event = await asyncio.wait_for(
+                        queue.get(), timeout=settings.notification_stream_keepalive
+                    )
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keep-alive\n\n"
+                    continue
+
+                if event is STREAM_CLOSED:
+                    break
+                notification = NotificationResponse.model_validate(event)
+                if notification.id in sent:
+                    continue
+                yield format_sse(
+                    notification.model_dump_json(), "notification", notification.id
+                )
+        finally:
+            notification_broker.unsubscribe(current_user_id, queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
@@ -29,8 +29,25 @@ celery_app.conf.update(
 
 # Настройка расписания задач
 celery_app.conf.beat_schedule = {
-    "send-return-reminders": {
-        "task": "app.tasks.send_return_reminders",
+    "relay-outbox-events": {
+        "task": "app.tasks.relay_outbox_events",
+        "schedule": 5.0,  # Каждые 5 секунд
+    },
+    # Лестница напоминаний включает напоминание о возврате на завтра
+    "escalate-due-bookings": {
+        "task": "app.tasks.escalate_due_bookings",
+        "schedule": 24 * 60 * 60,  # Каждые 24 часа
+    },
+    "expire-stale-bookings": {
+        "task": "app.tasks.expire_stale_bookings",
+        "schedule": 60 * 60,  # Каждый час
+    },
+    "reconcile-unread-counters": {
+        "task": "app.tasks.reconcile_unread_counters",
+        "schedule": 24 * 60 * 60,  # Каждые 24 часа
+    },
+    "create-notification-partitions": {
+        "task": "app.tasks.create_notification_partitions",
         "schedule": 24 * 60 * 60,  # Каждые 24 часа
     },
     "cleanup-old-notifications": {
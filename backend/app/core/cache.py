@@ -0,0 +1,449 @@
+"""
+Кэширование
+
+Хранилища (Redis с запасным вариантом в памяти процесса), двухуровневый кэш
+(L1 в процессе + L2 в Redis) и шина инвалидации L1 между воркерами.
+"""
+
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import redis
+from app.core.config import settings
+
+MISSING = object()
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryCacheBackend:
+    """Хранилище кэша в памяти процесса (используется, если Redis недоступен)"""
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[str, Optional[float]]] = {}
+        self._lock = threading.Lock()
+
+    def _get_alive(self, key: str) -> Optional[str]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at is not None and expires_at <= time.monotonic():
+            self._data.pop(key, None)
+            return None
+        return value
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            return self._get_alive(key)
+
+    def get_many(self, keys: List[str]) -> List[Optional[str]]:
+        with self._lock:
+            return [self._get_alive(key) for key in keys]
+
+    def set(self, key: str, value: str, ttl: Optional[int] = None) -> None:
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+
+    def add(self, key: str, value: str, ttl: Optional[int] = None) -> bool:
+        """Запись только если ключа нет (аналог SET NX)"""
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            if self._get_alive(key) is not None:
+                return False
+            self._data[key] = (value, expires_at)
+            return True
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            value = int(self._get_alive(key) or 0) + 1
+            _, expires_at = self._data.get(key, (None, None))
+            self._data[key] = (str(value), expires_at)
+            return value
+
+    def delete(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+
+class RedisCacheBackend:
+    """
+    Хранилище кэша в Redis
+
+    Ошибки чтения и записи не пробрасываются: кэш деградирует до промахов,
+    а запросы продолжают обслуживаться из базы данных. Ошибка incr
+    пробрасывается: потерянное увеличение версии тега означало бы, что
+    устаревшие записи отдаются как свежие.
+    """
+
+    def __init__(self, client: redis.Redis):
+        self.client = client
+
+    def get(self, key: str) -> Optional[str]:
+        try:
+            return self.client.get(key)
+        except redis.RedisError:
+            return None
+
+    def get_many(self, keys: List[str]) -> List[Optional[str]]:
+        if not keys:
+            return []
+        try:
+            return self.client.mget(keys)
+        except redis.RedisError:
+            return [None] * len(keys)
+
+    def set(self, key: str, value: str, ttl: Optional[int] = None) -> None:
+        try:
+            self.client.set(key, value, ex=ttl)
+        except redis.RedisError:
+            pass
+
+    def add(self, key: str, value: str, ttl: Optional[int] = None) -> bool:
+        try:
+            return bool(self.client.set(key, value, ex=ttl, nx=True))
+        except redis.RedisError:
+            return False
+
+    def incr(self, key: str) -> int:
+        try:
+            return self.client.incr(key)
+        except redis.RedisError:
+            logger.exception("Ошибка увеличения счетчика %s", key)
+            raise
+
+    def delete(self, *keys: str) -> None:
+        if not keys:
+            return
+        try:
+            self.client.delete(*keys)
+        except redis.RedisError:
+            pass
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_cache_backend():
+    """Получение общего хранилища кэша (Redis или память, если Redis недоступен)"""
+    global _backend
+    if _backend is not None:
+        return _backend
+
+    with _backend_lock:
+        if _backend is None:
+            client = redis.Redis.from_url(
+                settings.redis_url,
+                socket_timeout=settings.cache_socket_timeout,
+                socket_connect_timeout=settings.cache_socket_timeout,
+                decode_responses=True,
+            )
+            try:
+                client.ping()
+                _backend = RedisCacheBackend(client)
+            except redis.RedisError as e:
+                logger.warning("Redis недоступен, используется кэш в памяти: %s", e)
+                _backend = MemoryCacheBackend()
+
+    return _backend
+
+
+class CacheStats:
+    """Счетчики попаданий, промахов и вытеснений"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.l1_hits = 0
+        self.l2_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def incr(self, counter: str, value: int = 1) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + value)
+
+    def as_dict(self) -> dict:
+        lookups = self.l1_hits + self.l2_hits + self.misses
+        return {
+            "l1_hits": self.l1_hits,
+            "l2_hits": self.l2_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_ratio": (self.l1_hits + self.l2_hits) / lookups if lookups else 0.0,
+        }
+
+
+class LRUCache:
+    """Ограниченный по размеру кэш в памяти процесса с TTL записей"""
+
+    def __init__(self, max_size: int, ttl: int, stats: Optional[CacheStats] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.stats = stats or CacheStats()
+        self._data: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, default=MISSING):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            value, expires_at = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.stats.incr("evictions")
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value) -> None:
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.stats.incr("evictions")
+
+    def evict(self, keys: Optional[Iterable[str]] = None) -> None:
+        """Удаление записей (всех, если ключи не указаны)"""
+        with self._lock:
+            if keys is None:
+                self._data.clear()
+                return
+            for key in keys:
+                self._data.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class InvalidationBus:
+    """
+    Шина инвалидации L1 между воркерами через Redis pub/sub
+
+    Запись на одном воркере удаляет значение из L2 и публикует сообщение,
+    по которому остальные воркеры вытесняют значение из своего L1.
+    Без Redis шина работает только в пределах процесса.
+    """
+
+    def __init__(self, channel: str):
+        self.channel = channel
+        self.origin = f"{os.getpid()}:{uuid.uuid4().hex}"
+        self._caches: Dict[str, "TwoTierCache"] = {}
+        self._thread = None
+
+    def register(self, cache: "TwoTierCache") -> None:
+        self._caches[cache.namespace] = cache
+
+    @property
+    def caches(self) -> Dict[str, "TwoTierCache"]:
+        return dict(self._caches)
+
+    def publish(self, namespace: str, keys: Optional[List[str]]) -> None:
+        backend = get_cache_backend()
+        if not isinstance(backend, RedisCacheBackend):
+            return
+        message = json.dumps({"origin": self.origin, "ns": namespace, "keys": keys})
+        try:
+            backend.client.publish(self.channel, message)
+        except redis.RedisError as e:
+            logger.warning("Ошибка публикации инвалидации кэша %s: %s", namespace, e)
+
+    def _handle(self, message) -> None:
+        try:
+            data = json.loads(message["data"])
+        except (TypeError, ValueError):
+            return
+        if data.get("origin") == self.origin:
+            return
+        cache = self._caches.get(data.get("ns"))
+        if cache is not None:
+            cache.evict_local(data.get("keys"))
+
+    def _handle_error(self, error, pubsub, thread) -> None:
+        logger.warning("Шина инвалидации кэша остановлена: %s", error)
+        thread.stop()
+        # Пропущенные сообщения означают возможную рассинхронизацию L1
+        for cache in self._caches.values():
+            cache.evict_local(None)
+
+    def start(self) -> None:
+        """Подписка на канал инвалидации (в фоновом потоке)"""
+        if self._thread is not None:
+            return
+        if not isinstance(get_cache_backend(), RedisCacheBackend):
+            return
+
+        # Отдельный клиент без socket_timeout: подписка держит соединение
+        client = redis.Redis.from_url(settings.redis_url, decode_responses=True)
+        try:
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{self.channel: self._handle})
+            self._thread = pubsub.run_in_thread(
+                sleep_time=1.0, daemon=True, exception_handler=self._handle_error
+            )
+        except redis.RedisError as e:
+            logger.warning("Не удалось подписаться на инвалидацию кэша: %s", e)
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._thread.stop()
+            self._thread = None
+
+
+invalidation_bus = InvalidationBus(settings.cache_invalidation_channel)
+
+
+class TwoTierCache:
+    """
+    Двухуровневый кэш: L1 (LRU в процессе) и L2 (общее хранилище)
+
+    Значения должны сериализоваться в JSON. TTL L1 короче TTL L2 и ограничивает
+    расхождение воркеров, если сообщение об инвалидации было потеряно.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        ttl: int,
+        l1_max_size: Optional[int] = None,
+        l1_ttl: Optional[int] = None,
+        backend=None,
+    ):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self.l1 = LRUCache(
+            l1_max_size or settings.l1_cache_max_size,
+            min(l1_ttl or settings.l1_cache_ttl, ttl),
+            self.stats,
+        )
+        self._backend = backend
+        invalidation_bus.register(self)
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            self._backend = get_cache_backend()
+        return self._backend
+
+    def _l2_key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def get(self, key: str, default=MISSING):
+        value = self.l1.get(key)
+        if value is not MISSING:
+            self.stats.incr("l1_hits")
+            return value
+
+        raw = self.backend.get(self._l2_key(key))
+        if raw is not None:
+            value = json.loads(raw)
+            self.l1.set(key, value)
+            self.stats.incr("l2_hits")
+            return value
+
+        self.stats.incr("misses")
+        return default
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Получение нескольких значений (в результате только найденные)"""
+        found = {}
+        l2_keys = []
+        for key in keys:
+            value = self.l1.get(key)
+            if value is not MISSING:
+                found[key] = value
+                self.stats.incr("l1_hits")
+            else:
+                l2_keys.append(key)
+
+        if l2_keys:
+            raws = self.backend.get_many([self._l2_key(key) for key in l2_keys])
+            for key, raw in zip(l2_keys, raws):
+                if raw is None:
+                    self.stats.incr("misses")
+                    continue
+                value = json.loads(raw)
+                self.l1.set(key, value)
+                found[key] = value
+                self.stats.incr("l2_hits")
+
+        return found
+
+    def set(self, key: str, value) -> None:
+        self.backend.set(
+            self._l2_key(key), json.dumps(value, ensure_ascii=False), ttl=self.ttl
+        )
+        self.l1.set(key, value)
+
+    def set_many(self, values: Dict[str, Any]) -> None:
+        for key, value in values.items():
+            self.set(key, value)
+
+    def delete(self, *keys: str) -> None:
+        """Инвалидация значений на всех воркерах"""
+        if not keys:
+            return
+        self.backend.delete(*[self._l2_key(key) for key in keys])
+        self.evict_local(list(keys))
+        self.stats.incr("invalidations", len(keys))
+        invalidation_bus.publish(self.namespace, list(keys))
+
+    def evict_local(self, keys: Optional[List[str]]) -> None:
+        """Вытеснение значений из L1 этого процесса"""
+        self.l1.evict(keys)
+
+
+def cached_method(cache: TwoTierCache, key: Optional[Callable[..., str]] = None):
+    """
+    Декоратор кэширования результата метода сервиса
+
+    Ключ строится функцией key(*args, **kwargs) без self, по умолчанию -
+    из имени метода и аргументов. None не кэшируется.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            if key is not None:
+                cache_key = key(*args, **kwargs)
+            else:
+                cache_key = ":".join(
+                    [func.__name__]
+                    + [str(arg) for arg in args]
+                    + [f"{k}={v}" for k, v in sorted(kwargs.items())]
+                )
+
+            value = cache.get(cache_key)
+            if value is not MISSING:
+                return value
+
+            value = func(self, *args, **kwargs)
+            if value is not None:
+                cache.set(cache_key, value)
+            return value
+
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
+
+
+def cache_metrics() -> Dict[str, dict]:
+    """Метрики всех двухуровневых кэшей процесса"""
+    return {
+        namespace: {**cache.stats.as_dict(), "l1_size": len(cache.l1)}
+        for namespace, cache in invalidation_bus.caches.items()
+    }
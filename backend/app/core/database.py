@@ -2,7 +2,11 @@
 Настройка подключения к базе данных
 """
 
+import random
+import time
+from typing import Any, Callable
 from sqlalchemy import create_engine
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
@@ -18,6 +22,45 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 # Базовый класс для моделей
 Base = declarative_base()
 
+# Стратегия загрузки связей по умолчанию: в тестах и строгом режиме любая
+# ленивая загрузка, не предусмотренная профилем загрузки, вызывает ошибку
+RELATIONSHIP_LAZY = "raise" if settings.strict_loading or settings.testing else "select"
+
+
+# SQLSTATE ошибок, после которых транзакцию можно безопасно повторить:
+# serialization_failure и deadlock_detected
+RETRYABLE_SQLSTATES = {"40001", "40P01"}
+
+
+def is_retryable_error(error: DBAPIError) -> bool:
+    """Можно ли повторить транзакцию после ошибки"""
+    return getattr(error.orig, "pgcode", None) in RETRYABLE_SQLSTATES
+
+
+def run_in_transaction(db, func: Callable[..., Any], *args, attempts: int = None) -> Any:
+    """
+    Выполнение func(*args) и commit с повтором при конфликте транзакций
+
+    func выполняет все изменения транзакции и не вызывает commit сам.
+    При любой ошибке транзакция откатывается; при конфликте сериализации
+    или взаимоблокировке func выполняется заново после случайной паузы.
+    """
+    attempts = attempts or settings.transaction_retry_attempts
+    for attempt in range(1, attempts + 1):
+        try:
+            result = func(*args)
+            db.commit()
+            return result
+        except DBAPIError as error:
+            db.rollback()
+            if attempt == attempts or not is_retryable_error(error):
+                raise
+            delay = settings.transaction_retry_backoff * 2 ** (attempt - 1)
+            time.sleep(random.uniform(0, delay))
+        except Exception:
+            db.rollback()
+            raise
+
 
 def get_db():
     """Получение сессии базы данных"""
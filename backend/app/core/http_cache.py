@@ -0,0 +1,173 @@
+"""
+Условные HTTP-запросы (ETag / Last-Modified / 304)
+"""
+
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Collection, Optional, Set
+from fastapi import HTTPException, Request, Response, status
+from fastapi.responses import JSONResponse
+
+
+def make_etag(*parts) -> str:
+    """Формирование слабого ETag из компонентов версии ресурса"""
+    raw = "|".join("" if part is None else str(part) for part in parts)
+    return f'W/"{hashlib.sha1(raw.encode("utf-8")).hexdigest()}"'
+
+
+def make_version_etag(version: int, *parts) -> str:
+    """
+    Сильный ETag ресурса с номером версии строки
+
+    Номер версии в начале тега позволяет проверять If-Match без загрузки
+    встроенных данных; остальные части меняют тег при их изменении.
+    """
+    raw = "|".join("" if part is None else str(part) for part in parts)
+    digest = hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+    return f'"{version}-{digest}"'
+
+
+def latest(*values: Optional[datetime]) -> Optional[datetime]:
+    """Наибольшая из дат изменения (None игнорируются)"""
+    present = [v for v in values if v is not None]
+    return max(present) if present else None
+
+
+def format_http_date(value: datetime) -> str:
+    """Форматирование даты для заголовка Last-Modified"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def _strip_weak(tag: str) -> str:
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """Слабое сравнение ETag со значением If-None-Match"""
+    if header.strip() == "*":
+        return True
+    expected = _strip_weak(etag)
+    return any(_strip_weak(tag.strip()) == expected for tag in header.split(","))
+
+
+def has_conditional_headers(request: Request) -> bool:
+    """Есть ли в запросе валидаторы клиента"""
+    return "if-none-match" in request.headers or "if-modified-since" in request.headers
+
+
+def if_match_versions(request: Request) -> Optional[Set[int]]:
+    """
+    Версии ресурса из заголовка If-Match
+
+    None - заголовка нет или указан "*". Слабые и нераспознанные теги
+    не совпадают ни с одной версией (If-Match использует сильное сравнение).
+    """
+    header = request.headers.get("if-match")
+    if header is None or header.strip() == "*":
+        return None
+
+    versions = set()
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/") or len(tag) < 2 or tag[0] != '"' or tag[-1] != '"':
+            continue
+        version = tag[1:-1].partition("-")[0]
+        if version.isdigit():
+            versions.add(int(version))
+    return versions
+
+
+def precondition_failed() -> HTTPException:
+    """Ошибка 412: ресурс изменен после получения клиентом"""
+    return HTTPException(
+        status_code=status.HTTP_412_PRECONDITION_FAILED,
+        detail="Ресурс был изменен другим запросом, получите актуальную версию",
+    )
+
+
+def check_if_match(version: int, expected_versions: Optional[Collection[int]]) -> None:
+    """Проверка версии ресурса по If-Match (412 при несовпадении)"""
+    if expected_versions is not None and version not in expected_versions:
+        raise precondition_failed()
+
+
+def is_not_modified(
+    request: Request, etag: str, last_modified: Optional[datetime] = None
+) -> bool:
+    """Проверка, что у клиента актуальная версия ресурса"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match имеет приоритет над If-Modified-Since (RFC 9110)
+        return _etag_matches(if_none_match, etag)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        if last_modified.tzinfo is None:
+            last_modified = last_modified.replace(tzinfo=timezone.utc)
+        # HTTP-даты имеют точность до секунды
+        return last_modified.replace(microsecond=0) <= since
+
+    return False
+
+
+def set_validators(
+    response: Response,
+    etag: str,
+    last_modified: Optional[datetime] = None,
+    private: bool = False,
+) -> None:
+    """Установка заголовков ETag / Last-Modified / Cache-Control"""
+    response.headers["ETag"] = etag
+    if last_modified is not None:
+        response.headers["Last-Modified"] = format_http_date(last_modified)
+    # no-cache: клиент может хранить ответ, но обязан его перепроверять
+    response.headers["Cache-Control"] = "private, no-cache" if private else "no-cache"
+
+
+def check_not_modified(
+    request: Request,
+    response: Response,
+    etag: str,
+    last_modified: Optional[datetime] = None,
+    private: bool = False,
+) -> Optional[Response]:
+    """
+    Обработка условного запроса
+
+    Устанавливает валидаторы на ответ и возвращает готовый ответ 304,
+    если версия у клиента совпадает с текущей. Иначе возвращает None.
+    """
+    set_validators(response, etag, last_modified, private)
+
+    if not is_not_modified(request, etag, last_modified):
+        return None
+
+    not_modified = Response(status_code=status.HTTP_304_NOT_MODIFIED)
+    set_validators(not_modified, etag, last_modified, private)
+    return not_modified
+
+
+def conditional_json_response(
+    request: Request,
+    body,
+    etag: str,
+    last_modified: Optional[datetime] = None,
+    private: bool = False,
+    headers: Optional[dict] = None,
+) -> Response:
+    """Ответ с уже сериализованным телом или 304, если версия у клиента актуальна"""
+    if is_not_modified(request, etag, last_modified):
+        response = Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    else:
+        response = JSONResponse(content=body, headers=headers)
+    set_validators(response, etag, last_modified, private)
+    return response
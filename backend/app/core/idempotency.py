@@ -0,0 +1,181 @@
+"""
+Ключи идемпотентности для изменяющих запросов (Idempotency-Key)
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+from typing import Any, Callable, Optional, Tuple
+from fastapi import HTTPException, Request, status
+from fastapi.responses import JSONResponse
+from app.core.cache import get_cache_backend
+from app.core.config import settings
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+
+IN_PROGRESS = "in_progress"
+DONE = "done"
+# Попыток захвата ключа, если запись исчезает между add и get
+BEGIN_ATTEMPTS = 3
+
+
+class IdempotencyStore:
+    """
+    Хранилище результатов запросов по (пользователь, ключ)
+
+    Первый запрос с ключом атомарно (SET NX) записывает отметку "выполняется"
+    с коротким ttl, после выполнения - статус и тело ответа на ttl.
+    Повторы получают сохраненный ответ без выполнения запроса.
+    """
+
+    def __init__(self, namespace: str, ttl: int, lock_ttl: int, backend=None):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.lock_ttl = lock_ttl
+        self._backend = backend
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            self._backend = get_cache_backend()
+        return self._backend
+
+    def _key(self, user_id: str, key: str) -> str:
+        return f"{self.namespace}:{user_id}:{key}"
+
+    def begin(self, user_id: str, key: str, fingerprint: str) -> Tuple[bool, Optional[dict]]:
+        """
+        Захват ключа
+
+        Возвращает (True, None), если запрос нужно выполнить, иначе
+        (False, запись) с результатом или отметкой о выполнении.
+        (False, None) - ключ не удалось ни захватить, ни прочитать
+        (хранилище недоступно).
+        """
+        marker = json.dumps({"state": IN_PROGRESS, "fingerprint": fingerprint})
+        for _ in range(BEGIN_ATTEMPTS):
+            if self.backend.add(self._key(user_id, key), marker, ttl=self.lock_ttl):
+                return True, None
+
+            raw = self.backend.get(self._key(user_id, key))
+            if raw is not None:
+                return False, json.loads(raw)
+            # Запись истекла между add и get - пробуем захватить снова
+        return False, None
+
+    def complete(
+        self, user_id: str, key: str, fingerprint: str, status_code: int, body: Any
+    ) -> None:
+        """Сохранение ответа для повторов"""
+        record = {
+            "state": DONE,
+            "fingerprint": fingerprint,
+            "status_code": status_code,
+            "body": body,
+        }
+        self.backend.set(
+            self._key(user_id, key), json.dumps(record, ensure_ascii=False), ttl=self.ttl
+        )
+
+    def release(self, user_id: str, key: str) -> None:
+        """Освобождение ключа после сбоя: повтор выполнит запрос заново"""
+        self.backend.delete(self._key(user_id, key))
+
+
+idempotency_store = IdempotencyStore(
+    "idempotency",
+    ttl=settings.idempotency_ttl,
+    lock_ttl=settings.idempotency_lock_ttl,
+)
+
+
+def request_fingerprint(request: Request, *parts) -> str:
+    """Отпечаток запроса: метод, путь и содержимое"""
+    raw = json.dumps(
+        [request.method, request.url.path, *parts],
+        sort_keys=True,
+        default=str,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _replay(record: dict) -> JSONResponse:
+    return JSONResponse(
+        content=record["body"],
+        status_code=record["status_code"],
+        headers={REPLAYED_HEADER: "true"},
+    )
+
+
+async def idempotent(
+    request: Request,
+    user_id: str,
+    fingerprint: str,
+    handler: Callable[[], Any],
+    status_code: int = status.HTTP_200_OK,
+):
+    """
+    Выполнение изменяющего запроса с учетом Idempotency-Key
+
+    handler возвращает JSON-совместимое тело ответа. Без заголовка запрос
+    выполняется как обычно. Повтор с тем же ключом получает сохраненный
+    ответ (в том числе ошибку 4xx), а одновременный дубликат ждет результата
+    первого запроса. Ключ, использованный с другим содержимым, дает 422,
+    недоступное хранилище ключей - 503.
+    """
+    key = request.headers.get(IDEMPOTENCY_HEADER)
+    if key is None:
+        return JSONResponse(content=handler(), status_code=status_code)
+
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Некорректный {IDEMPOTENCY_HEADER}",
+        )
+
+    deadline = time.monotonic() + settings.idempotency_wait_timeout
+    acquired, record = idempotency_store.begin(user_id, key, fingerprint)
+    while not acquired:
+        if record is None:
+            # Без хранилища повтор запроса мог бы выполниться дважды
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Сервис временно недоступен, повторите запрос позже",
+                headers={"Retry-After": "1"},
+            )
+        if record["fingerprint"] != fingerprint:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"{IDEMPOTENCY_HEADER} уже использован с другим запросом",
+            )
+        if record["state"] == DONE:
+            return _replay(record)
+        if time.monotonic() > deadline:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Запрос с этим ключом еще выполняется",
+            )
+        await asyncio.sleep(settings.idempotency_poll_interval)
+        acquired, record = idempotency_store.begin(user_id, key, fingerprint)
+
+    try:
+        body = handler()
+    except HTTPException as error:
+        # Ошибки клиента детерминированы - повтор получит тот же ответ
+        if error.status_code < 500:
+            idempotency_store.complete(
+                user_id, key, fingerprint, error.status_code, {"detail": error.detail}
+            )
+        else:
+            idempotency_store.release(user_id, key)
+        raise
+    except Exception:
+        idempotency_store.release(user_id, key)
+        raise
+
+    idempotency_store.complete(user_id, key, fingerprint, status_code, body)
+    return JSONResponse(content=body, status_code=status_code)
@@ -0,0 +1,191 @@
+"""
+Пакетная загрузка связанных сущностей в пределах запроса (DataLoader)
+"""
+
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Tuple
+from fastapi import Depends
+from sqlalchemy import inspect, select
+from sqlalchemy.orm import Session, joinedload, noload, raiseload, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from app.core.database import get_db
+from app.models.book import Book
+from app.models.booking import Booking
+from app.models.booking_point import BookingPoint
+from app.models.user import User
+
+
+# Профили загрузки связей по сценариям использования. Связь, не указанная
+# в профиле, не загружается (raiseload) и проставляется RequestLoaders
+# либо не нужна ответу - случайное обращение к ней вызывает ошибку.
+LOADER_PROFILES = {
+    # Страница каталога: владелец из кэша отображаемых данных,
+    # бронирования страницы - пакетно через RequestLoaders
+    "catalog_list": (noload(Book.owner), raiseload("*")),
+    # Карточка книги: владелец в том же запросе, бронирования одним IN
+    "book_detail": (joinedload(Book.owner), selectinload(Book.bookings), raiseload("*")),
+    # Книги рядом: владельцы и бронирования - через RequestLoaders
+    "nearby_list": (raiseload("*"),),
+    # Изменение книги владельцем: связи для ответа проставляются после commit
+    "book_write": (raiseload("*"),),
+    # Список бронирований: книги, заемщики и пункты выдачи - через RequestLoaders
+    "booking_list": (raiseload("*"),),
+    # Детали бронирования
+    "booking_detail": (
+        joinedload(Booking.book),
+        joinedload(Booking.borrower),
+        joinedload(Booking.booking_point),
+        raiseload("*"),
+    ),
+}
+
+
+def loader_options(profile: str) -> tuple:
+    """Опции загрузки связей для профиля"""
+    return LOADER_PROFILES[profile]
+
+
+class BatchLoader:
+    """
+    Загрузчик сущностей одного типа по ключу
+
+    Ключи накапливаются через queue() и загружаются одним запросом
+    WHERE key IN (...). Уже загруженные ключи повторно не запрашиваются.
+    При many=True по ключу возвращается список (связь один-ко-многим).
+    """
+
+    def __init__(self, model, key_column=None, many: bool = False):
+        self.model = model
+        self.key_column = key_column if key_column is not None else model.id
+        self.many = many
+        self._loaded: Dict[str, Any] = {}
+        self._pending: Dict[str, Any] = {}
+
+    def queue(self, keys: Iterable) -> None:
+        for key in keys:
+            if key is None:
+                continue
+            normalized = str(key)
+            if normalized not in self._loaded:
+                self._pending[normalized] = key
+
+    def prime(self, obj) -> None:
+        """Добавление уже загруженного объекта (только для загрузчиков по ID)"""
+        if not self.many:
+            self._loaded.setdefault(str(obj.id), obj)
+
+    @property
+    def has_pending(self) -> bool:
+        return bool(self._pending)
+
+    def _take_statement(self) -> Tuple[List[str], Any]:
+        pending, self._pending = self._pending, {}
+        statement = select(self.model).where(self.key_column.in_(list(pending.values())))
+        return list(pending.keys()), statement
+
+    def _store(self, keys: List[str], rows) -> None:
+        key_attr = self.key_column.key
+        if self.many:
+            grouped = defaultdict(list)
+            for row in rows:
+                grouped[str(getattr(row, key_attr))].append(row)
+            for key in keys:
+                self._loaded[key] = grouped.get(key, [])
+        else:
+            by_key = {str(getattr(row, key_attr)): row for row in rows}
+            for key in keys:
+                self._loaded[key] = by_key.get(key)
+
+    def dispatch(self, db: Session) -> None:
+        """Загрузка накопленных ключей одним запросом (синхронная сессия)"""
+        if not self._pending:
+            return
+        keys, statement = self._take_statement()
+        self._store(keys, db.execute(statement).scalars().all())
+
+    async def adispatch(self, db) -> None:
+        """Загрузка накопленных ключей одним запросом (AsyncSession)"""
+        if not self._pending:
+            return
+        keys, statement = self._take_statement()
+        result = await db.execute(statement)
+        self._store(keys, result.scalars().all())
+
+    def get(self, key):
+        if key is None:
+            return [] if self.many else None
+        return self._loaded.get(str(key), [] if self.many else None)
+
+
+class RequestLoaders:
+    """
+    Загрузчики связей для одного запроса
+
+    attach() собирает внешние ключи всех объектов ответа, загружает каждый
+    тип сущности одним запросом и проставляет связи без ленивой загрузки.
+    Повторяющиеся владельцы, книги и пункты выдачи загружаются один раз.
+    """
+
+    # связь -> (загрузчик, атрибут с ключом)
+    RELATIONS = {
+        Book: {
+            "owner": ("users", "owner_id"),
+            "bookings": ("bookings_by_book", "id"),
+        },
+        Booking: {
+            "book": ("books", "book_id"),
+            "borrower": ("users", "borrower_id"),
+            "booking_point": ("booking_points", "booking_point_id"),
+        },
+    }
+
+    def __init__(self, db):
+        self.db = db
+        self.users = BatchLoader(User)
+        self.books = BatchLoader(Book)
+        self.booking_points = BatchLoader(BookingPoint)
+        self.bookings_by_book = BatchLoader(Booking, Booking.book_id, many=True)
+
+    def _loaders(self) -> List[BatchLoader]:
+        return [self.users, self.books, self.booking_points, self.bookings_by_book]
+
+    def _plan(self, objects: Iterable, relations: Tuple[str, ...]) -> list:
+        plan = []
+        for obj in objects:
+            if obj is None:
+                continue
+            unloaded = inspect(obj).unloaded
+            specs = self.RELATIONS[type(obj)]
+            for relation in relations:
+                if relation not in unloaded:
+                    continue
+                loader_name, key_attr = specs[relation]
+                loader = getattr(self, loader_name)
+                key = getattr(obj, key_attr)
+                loader.queue([key])
+                plan.append((obj, relation, loader, key))
+        return plan
+
+    @staticmethod
+    def _assign(plan: list) -> None:
+        for obj, relation, loader, key in plan:
+            set_committed_value(obj, relation, loader.get(key))
+
+    def attach(self, objects: Iterable, *relations: str) -> None:
+        """Проставление связей объектам (синхронная сессия)"""
+        plan = self._plan(list(objects), relations)
+        for loader in self._loaders():
+            loader.dispatch(self.db)
+        self._assign(plan)
+
+    async def aattach(self, objects: Iterable, *relations: str) -> None:
+        """Проставление связей объектам (AsyncSession)"""
+        plan = self._plan(list(objects), relations)
+        for loader in self._loaders():
+            await loader.adispatch(self.db)
+        self._assign(plan)
+
+
+def get_loaders(db: Session = Depends(get_db)) -> RequestLoaders:
+    """Загрузчики связей в пределах запроса (используют сессию запроса)"""
+    return RequestLoaders(db)
@@ -0,0 +1,158 @@
+"""
+Поток уведомлений в реальном времени
+
+Брокер рассылает события о новых уведомлениях подключенным клиентам (SSE).
+Между процессами (воркеры API, Celery) события передаются через Redis
+pub/sub, без Redis - только в пределах процесса.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import redis
+from app.core.cache import RedisCacheBackend, get_cache_backend
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Признак закрытия потока: клиент переподключается с Last-Event-ID
+# и догружает пропущенное из базы данных
+STREAM_CLOSED = None
+
+
+class NotificationBroker:
+    """
+    Рассылка событий уведомлений подписчикам
+
+    Подписчик - asyncio.Queue соединения клиента. События из фонового
+    потока Redis передаются в цикл событий соединения через
+    call_soon_threadsafe. Если клиент не успевает читать и очередь
+    переполнена, поток закрывается, а не теряет события молча.
+    """
+
+    def __init__(self, channel: str):
+        self.channel = channel
+        self._subscribers: Dict[str, Set[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = (
+            defaultdict(set)
+        )
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def subscribe(self, user_id: str) -> asyncio.Queue:
+        """Очередь событий пользователя для текущего цикла событий"""
+        queue = asyncio.Queue(maxsize=settings.notification_stream_queue_size)
+        with self._lock:
+            self._subscribers[str(user_id)].add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, user_id: str, queue: asyncio.Queue) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(str(user_id))
+            if subscribers is None:
+                return
+            subscribers.difference_update(
+                [item for item in subscribers if item[1] is queue]
+            )
+            if not subscribers:
+                del self._subscribers[str(user_id)]
+
+    def publish(self, events: Iterable[dict]) -> None:
+        """
+        Публикация событий (словари с ключом user_id)
+
+        С Redis события доставляются всем процессам через канал, включая
+        текущий, без Redis - только подписчикам этого процесса.
+        """
+        events = list(events)
+        if not events:
+            return
+
+        backend = get_cache_backend()
+        if isinstance(backend, RedisCacheBackend):
+            try:
+                pipe = backend.client.pipeline(transaction=False)
+                for event in events:
+                    pipe.publish(self.channel, json.dumps(event, default=str))
+                pipe.execute()
+                return
+            except redis.RedisError as e:
+                logger.warning("Ошибка публикации уведомлений: %s", e)
+
+        for event in events:
+            self._deliver(json.loads(json.dumps(event, default=str)))
+
+    def _deliver(self, event: dict) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers.get(str(event.get("user_id")), ()))
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(self._put, queue, event)
+
+    def _close_all(self) -> None:
+        with self._lock:
+            subscribers = [item for items in self._subscribers.values() for item in items]
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(self._put, queue, STREAM_CLOSED)
+
+    @staticmethod
+    def _put(queue: asyncio.Queue, event: Optional[dict]) -> None:
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Освобождаем место под признак закрытия: клиент догрузит
+            # пропущенные события при переподключении
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(STREAM_CLOSED)
+
+    def _handle(self, message) -> None:
+        try:
+            event = json.loads(message["data"])
+        except (TypeError, ValueError):
+            return
+        self._deliver(event)
+
+    def _handle_error(self, error, pubsub, thread) -> None:
+        logger.warning("Поток уведомлений остановлен: %s", error)
+        thread.stop()
+        self._thread = None
+        self._close_all()
+
+    def start(self) -> None:
+        """Подписка на канал уведомлений (в фоновом потоке)"""
+        if self._thread is not None:
+            return
+        if not isinstance(get_cache_backend(), RedisCacheBackend):
+            return
+
+        client = redis.Redis.from_url(settings.redis_url, decode_responses=True)
+        try:
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{self.channel: self._handle})
+            self._thread = pubsub.run_in_thread(
+                sleep_time=1.0, daemon=True, exception_handler=self._handle_error
+            )
+        except redis.RedisError as e:
+            logger.warning("Не удалось подписаться на поток уведомлений: %s", e)
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._thread.stop()
+            self._thread = None
+        self._close_all()
+
+
+notification_broker = NotificationBroker(settings.notification_stream_channel)
+
+
+def format_sse(data: str, event: Optional[str] = None, event_id: Optional[str] = None) -> str:
+    """Кадр Server-Sent Events"""
+    lines: List[str] = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event is not None:
+        lines.append(f"event: {event}")
+    lines.extend(f"data: {line}" for line in data.splitlines() or [""])
+    return "\n".join(lines) + "\n\n"
@@ -0,0 +1,240 @@
+"""
+Кэш ответов публичного каталога с инвалидацией по тегам
+"""
+
+import hashlib
+import json
+import logging
+import secrets
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+from app.core.cache import get_cache_backend
+from app.core.config import settings
+
+CATALOG_TAG = "catalog"
+
+logger = logging.getLogger(__name__)
+
+
+def book_tag(book_id) -> str:
+    """Тег записей, содержащих книгу"""
+    return f"book:{book_id}"
+
+
+def owner_tag(owner_id) -> str:
+    """Тег записей, содержащих данные владельца"""
+    return f"owner:{owner_id}"
+
+
+class CachedResponse:
+    """Закэшированный ответ"""
+
+    def __init__(
+        self,
+        body,
+        etag: Optional[str],
+        last_modified: Optional[datetime],
+        is_stale: bool,
+    ):
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.is_stale = is_stale
+
+
+class ResponseCache:
+    """
+    Кэш сериализованных ответов
+
+    Инвалидация устроена через версии тегов: запись хранит версии своих тегов
+    на момент построения, а invalidate() лишь увеличивает счетчик тега.
+    Счетчик создается со случайным начальным значением: после перезапуска,
+    вытеснения ключа или в памяти другого процесса версии не повторяют
+    прежние, и построенные по ним ETag не совпадут со старыми.
+    Запись с устаревшей версией тега или с истекшим ttl не удаляется, а считается
+    устаревшей и может отдаваться еще stale_ttl секунд, пока один из запросов
+    пересчитывает ее в фоне (stale-while-revalidate).
+
+    Если увеличить версию тега не удалось (хранилище недоступно), тег
+    запоминается, и пока версия не увеличена повторной попыткой, процесс
+    обходит кэш: изменение уже зафиксировано в базе данных, поэтому ошибка
+    кэша не должна превращаться в ошибку запроса.
+    """
+
+    def __init__(self, namespace: str, ttl: int, stale_ttl: int, backend=None):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._backend = backend
+        self._pending_tags = set()
+        self._pending_lock = threading.Lock()
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            self._backend = get_cache_backend()
+        return self._backend
+
+    def make_key(self, *parts) -> str:
+        """Построение ключа записи из нормализованных параметров"""
+        raw = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def _entry_key(self, key: str) -> str:
+        return f"{self.namespace}:entry:{key}"
+
+    def _tag_key(self, tag: str) -> str:
+        return f"{self.namespace}:tag:{tag}"
+
+    def _refresh_key(self, key: str) -> str:
+        return f"{self.namespace}:refresh:{key}"
+
+    def get_versions(self, tags: Iterable[str]) -> Dict[str, int]:
+        """
+        Текущие версии тегов
+
+        Снимок нужно брать до выборки данных: тогда запись, построенная
+        параллельно с инвалидацией, сразу окажется устаревшей.
+        """
+        tags = list(tags)
+        keys = [self._tag_key(tag) for tag in tags]
+        values = self.backend.get_many(keys)
+        if None in values:
+            for key, value in zip(keys, values):
+                if value is None:
+                    self.backend.add(key, str(self._new_version()))
+            values = self.backend.get_many(keys)
+        # Хранилище недоступно - версия, которая ни с чем не совпадет
+        return {
+            tag: int(value) if value is not None else self._new_version()
+            for tag, value in zip(tags, values)
+        }
+
+    @staticmethod
+    def _new_version() -> int:
+        """Случайное начальное значение счетчика тега"""
+        return secrets.randbits(62)
+
+    def _bump(self, tags: Iterable[str]) -> bool:
+        """Увеличение версий тегов; при ошибке теги остаются в очереди повтора"""
+        failed = []
+        for tag in tags:
+            key = self._tag_key(tag)
+            try:
+                self.backend.add(key, str(self._new_version()))
+                self.backend.incr(key)
+            except Exception:
+                failed.append(tag)
+        with self._pending_lock:
+            self._pending_tags.update(failed)
+        return not failed
+
+    def is_available(self) -> bool:
+        """
+        Можно ли пользоваться кэшем
+
+        Сначала повторяет неудавшиеся увеличения версий тегов: пока они не
+        применены, записи с этими тегами могли бы отдаваться как свежие.
+        """
+        if not settings.response_cache_enabled:
+            return False
+        with self._pending_lock:
+            if not self._pending_tags:
+                return True
+            pending = list(self._pending_tags)
+            self._pending_tags.clear()
+        if self._bump(pending):
+            logger.warning("Кэш %s снова доступен", self.namespace)
+            return True
+        return False
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        """Получение записи (в том числе устаревшей)"""
+        if not self.is_available():
+            return None
+
+        raw = self.backend.get(self._entry_key(key))
+        if raw is None:
+            return None
+
+        try:
+            entry = json.loads(raw)
+        except ValueError:
+            return None
+
+        current_versions = self.get_versions(entry["tags"].keys())
+        is_stale = (
+            current_versions != entry["tags"]
+            or time.time() - entry["stored_at"] > self.ttl
+        )
+        last_modified = (
+            datetime.fromisoformat(entry["last_modified"])
+            if entry.get("last_modified")
+            else None
+        )
+        return CachedResponse(entry["body"], entry.get("etag"), last_modified, is_stale)
+
+    def set(
+        self,
+        key: str,
+        body,
+        tags: List[str],
+        versions: Optional[Dict[str, int]] = None,
+        etag: Optional[str] = None,
+        last_modified: Optional[datetime] = None,
+    ) -> None:
+        """Сохранение записи с версиями тегов на момент выборки"""
+        if not self.is_available():
+            return
+
+        versions = dict(versions or {})
+        missing = [tag for tag in tags if tag not in versions]
+        versions.update(self.get_versions(missing))
+
+        entry = {
+            "body": body,
+            "etag": etag,
+            "last_modified": last_modified.isoformat() if last_modified else None,
+            "tags": {tag: versions[tag] for tag in tags},
+            "stored_at": time.time(),
+        }
+        self.backend.set(
+            self._entry_key(key),
+            json.dumps(entry, ensure_ascii=False),
+            ttl=self.ttl + self.stale_ttl,
+        )
+
+    def delete(self, key: str) -> None:
+        """Удаление записи (например, если объект больше не существует)"""
+        self.backend.delete(self._entry_key(key))
+
+    def invalidate(self, *tags: str) -> None:
+        """
+        Инвалидация всех записей с указанными тегами
+
+        Вызывается после commit и не пробрасывает ошибок хранилища: версии
+        неудавшихся тегов увеличиваются повторно, а до этого кэш не
+        используется (см. is_available).
+        """
+        if not self._bump(tags):
+            logger.warning(
+                "Не удалось инвалидировать теги кэша %s, кэш отключен до "
+                "восстановления хранилища",
+                self.namespace,
+            )
+
+    def acquire_refresh(self, key: str) -> bool:
+        """Захват права на фоновое обновление записи (одно на кластер)"""
+        return self.backend.add(self._refresh_key(key), "1", ttl=self.ttl or 1)
+
+    def release_refresh(self, key: str) -> None:
+        self.backend.delete(self._refresh_key(key))
+
+
+catalog_cache = ResponseCache(
+    "catalog",
+    ttl=settings.catalog_cache_ttl,
+    stale_ttl=settings.catalog_cache_stale_ttl,
+)
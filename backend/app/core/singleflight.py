@@ -0,0 +1,43 @@
+"""
+Объединение одинаковых параллельных запросов (single-flight)
+"""
+
+import asyncio
+from typing import Any, Callable, Dict
+from fastapi.concurrency import run_in_threadpool
+
+
+class SingleFlight:
+    """
+    Выполнение не более одного вычисления на ключ в пределах процесса
+
+    Пока вычисление по ключу выполняется, все новые вызовы с тем же ключом
+    ждут его результата (или исключения) вместо повторного запуска.
+    Синхронная функция выполняется в пуле потоков и не должна использовать
+    сессию БД запроса: ведущий запрос может завершиться раньше ведомых.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Future] = {}
+
+    async def do(self, key: str, func: Callable[..., Any], *args) -> Any:
+        """Выполнение func(*args) или ожидание уже запущенного вычисления"""
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(run_in_threadpool(func, *args))
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+
+        # shield: отмена одного из ожидающих запросов не отменяет общее вычисление
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Future) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Исключение получат ожидающие; помечаем его обработанным,
+        # чтобы не было предупреждения, если ожидающих не осталось
+        if not task.cancelled():
+            task.exception()
+
+
+catalog_flight = SingleFlight()
@@ -4,8 +4,20 @@
 
 from .user import User
 from .book import Book
-from .booking_point import BookingPoint
+from .booking_point import BookingPoint, BookingPointSlot
 from .booking import Booking
-from .notification import Notification
+from .notification import Notification, NotificationDedup
+from .waitlist import WaitlistEntry
+from .outbox import OutboxEvent
 
-__all__ = ["User", "Book", "BookingPoint", "Booking", "Notification"]
+__all__ = [
+    "User",
+    "Book",
+    "BookingPoint",
+    "BookingPointSlot",
+    "Booking",
+    "Notification",
+    "NotificationDedup",
+    "WaitlistEntry",
+    "OutboxEvent",
+]
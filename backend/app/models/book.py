@@ -16,7 +16,7 @@ from sqlalchemy import (
 )
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
-from app.core.database import Base
+from app.core.database import Base, RELATIONSHIP_LAZY
 import enum
 
 
@@ -49,11 +49,17 @@ class Book(Base):
     updated_at = Column(
         DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False
     )
+    # Версия строки для оптимистичной блокировки: ORM увеличивает ее при каждом
+    # UPDATE и проверяет в WHERE; UPDATE-запросы Core увеличивают ее явно
+    version_id = Column(Integer, nullable=False, default=1, server_default="1")
+
+    __mapper_args__ = {"version_id_col": version_id}
 
     # Связи
-    owner = relationship("User", back_populates="books")
+    owner = relationship("User", back_populates="books", lazy=RELATIONSHIP_LAZY)
     bookings = relationship(
-        "Booking", back_populates="book", cascade="all, delete-orphan"
+        "Booking", back_populates="book", cascade="all, delete-orphan",
+        lazy=RELATIONSHIP_LAZY,
     )
 
     def __repr__(self):
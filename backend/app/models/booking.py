@@ -4,10 +4,23 @@
 
 import uuid
 from datetime import datetime, date
-from sqlalchemy import Column, String, Boolean, DateTime, Text, Date, ForeignKey, Enum
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import (
+    Column,
+    String,
+    Boolean,
+    DateTime,
+    Text,
+    Date,
+    ForeignKey,
+    Enum,
+    Integer,
+    Computed,
+    Index,
+    text,
+)
+from sqlalchemy.dialects.postgresql import UUID, DATERANGE, ExcludeConstraint
 from sqlalchemy.orm import relationship
-from app.core.database import Base
+from app.core.database import Base, RELATIONSHIP_LAZY
 import enum
 
 
@@ -21,10 +34,43 @@ class BookingStatus(str, enum.Enum):
     CANCELLED = "cancelled"
 
 
+# Статусы, при которых книга занята бронированием
+ACTIVE_BOOKING_STATUSES = (
+    BookingStatus.PENDING,
+    BookingStatus.CONFIRMED,
+    BookingStatus.TAKEN,
+)
+
+# Период бронирования: дата возврата не входит, в этот день книгу
+# может забрать следующий заемщик
+BOOKING_PERIOD_SQL = "daterange(planned_pickup_date, planned_return_date, '[)')"
+
+
 class Booking(Base):
     """Модель бронирования"""
 
     __tablename__ = "bookings"
+    __table_args__ = (
+        # Периоды активных бронирований одной книги не пересекаются.
+        # GiST-индекс ограничения обслуживает и поиск занятых периодов
+        # (в enum хранятся имена статусов)
+        ExcludeConstraint(
+            ("book_id", "="),
+            ("period", "&&"),
+            name="ex_bookings_book_period",
+            using="gist",
+            where=text("status IN ('PENDING', 'CONFIRMED', 'TAKEN')"),
+        ),
+        # Поиск просроченных неполученных бронирований (expire_stale_bookings)
+        Index("ix_bookings_status_pickup_date", "status", "planned_pickup_date"),
+        # Выданные книги к возврату на дату, по порядку id (напоминания)
+        Index(
+            "ix_bookings_status_return_date",
+            "status",
+            "planned_return_date",
+            "id",
+        ),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
     book_id = Column(UUID(as_uuid=True), ForeignKey("books.id"), nullable=False)
@@ -37,21 +83,28 @@ class Booking(Base):
     planned_pickup_date = Column(Date, nullable=False)
     actual_pickup_date = Column(DateTime, nullable=True)
     planned_return_date = Column(Date, nullable=False)
+    period = Column(DATERANGE, Computed(BOOKING_PERIOD_SQL, persisted=True))
     actual_return_date = Column(DateTime, nullable=True)
     notes = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(
         DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False
     )
+    # Версия строки для оптимистичной блокировки (см. Book.version_id)
+    version_id = Column(Integer, nullable=False, default=1, server_default="1")
+
+    __mapper_args__ = {"version_id_col": version_id}
 
     # Связи
-    book = relationship("Book", back_populates="bookings")
+    book = relationship("Book", back_populates="bookings", lazy=RELATIONSHIP_LAZY)
     borrower = relationship(
-        "User", back_populates="bookings_as_borrower", foreign_keys=[borrower_id]
+        "User", back_populates="bookings_as_borrower", foreign_keys=[borrower_id],
+        lazy=RELATIONSHIP_LAZY,
     )
-    booking_point = relationship("BookingPoint", back_populates="bookings")
+    booking_point = relationship("BookingPoint", back_populates="bookings", lazy=RELATIONSHIP_LAZY)
     notifications = relationship(
-        "Notification", back_populates="booking", cascade="all, delete-orphan"
+        "Notification", back_populates="booking", cascade="all, delete-orphan",
+        lazy=RELATIONSHIP_LAZY,
     )
 
     def __repr__(self):
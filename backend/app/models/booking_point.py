@@ -3,10 +3,25 @@
 """
 
 import uuid
-from sqlalchemy import Column, String, Boolean, Text
+from datetime import datetime
+from sqlalchemy import (
+    Column,
+    String,
+    Boolean,
+    Date,
+    DateTime,
+    Float,
+    ForeignKey,
+    Integer,
+    LargeBinary,
+    Text,
+    CheckConstraint,
+)
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship
-from app.core.database import Base
+from sqlalchemy.orm import relationship, validates
+from app.core.database import Base, RELATIONSHIP_LAZY
+from app.utils.geo import parse_coordinates
+from app.utils.working_hours import BITMAP_BYTES, working_hours_bitmap
 
 
 class BookingPoint(Base):
@@ -18,12 +33,64 @@ class BookingPoint(Base):
     name = Column(String(255), nullable=False)
     address = Column(Text, nullable=False)
     coordinates = Column(String(100), nullable=True)  # "lat,lng" format
+    # Координаты числами, разбираются из coordinates при записи
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
     working_hours = Column(String(255), nullable=False)
+    # Часы работы битовой картой 7 x 96 (см. app.utils.working_hours);
+    # None - строку часов работы не удалось разобрать
+    working_hours_bitmap = Column(LargeBinary(BITMAP_BYTES), nullable=True)
     phone = Column(String(20), nullable=True)
+    # Сколько выдач пункт принимает в день (None - без ограничения)
+    daily_capacity = Column(Integer, nullable=True)
     is_active = Column(Boolean, default=True, nullable=False)
+    updated_at = Column(
+        DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False
+    )
 
     # Связи
-    bookings = relationship("Booking", back_populates="booking_point")
+    bookings = relationship("Booking", back_populates="booking_point", lazy=RELATIONSHIP_LAZY)
+
+    @validates("coordinates")
+    def _update_lat_lng(self, key, value):
+        """Пересчет числовых координат при изменении строки координат"""
+        self.latitude, self.longitude = parse_coordinates(value) or (None, None)
+        return value
+
+    @validates("working_hours")
+    def _update_working_hours_bitmap(self, key, value):
+        """Пересчет битовой карты при изменении часов работы"""
+        try:
+            self.working_hours_bitmap = working_hours_bitmap(value)
+        except ValueError:
+            self.working_hours_bitmap = None
+        return value
 
     def __repr__(self):
         return f"<BookingPoint(id={self.id}, name={self.name})>"
+
+
+class BookingPointSlot(Base):
+    """
+    Счетчик выдач пункта на день
+
+    Строка создается при первом бронировании на дату и изменяется условным
+    инкрементом (reserved < capacity), поэтому проверка вместимости не
+    зависит от количества бронирований.
+    """
+
+    __tablename__ = "booking_point_slots"
+    __table_args__ = (
+        CheckConstraint("reserved >= 0", name="ck_booking_point_slots_reserved"),
+    )
+
+    booking_point_id = Column(
+        UUID(as_uuid=True), ForeignKey("booking_points.id"), primary_key=True
+    )
+    slot_date = Column(Date, primary_key=True)
+    # Вместимость на момент последнего бронирования
+    capacity = Column(Integer, nullable=False)
+    reserved = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<BookingPointSlot(booking_point_id={self.booking_point_id}, slot_date={self.slot_date}, reserved={self.reserved})>"
@@ -4,10 +4,23 @@
 
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, Boolean, DateTime, Text, ForeignKey, Enum
+from sqlalchemy import (
+    DDL,
+    Column,
+    String,
+    Boolean,
+    Date,
+    DateTime,
+    Text,
+    ForeignKey,
+    Enum,
+    Index,
+    event,
+    text,
+)
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
-from app.core.database import Base
+from app.core.database import Base, RELATIONSHIP_LAZY
 import enum
 
 
@@ -18,12 +31,38 @@ class NotificationType(str, enum.Enum):
     RETURN_REMINDER = "return_reminder"
     BOOK_AVAILABLE = "book_available"
     BOOKING_CANCELLED = "booking_cancelled"
+    BOOKING_OVERDUE = "booking_overdue"
+    OVERDUE_ALERT = "overdue_alert"
+
+
+# Секция по умолчанию: строки вне месячных секций (не созданных заранее)
+DEFAULT_PARTITION = "notifications_default"
+# Архивная секция: непрочитанные строки удаленных месячных секций
+# (диапазон от MINVALUE до конца последнего удаленного месяца)
+ARCHIVE_PARTITION = "notifications_archive"
 
 
 class Notification(Base):
-    """Модель уведомления"""
+    """
+    Модель уведомления
+
+    Таблица секционирована по месяцам created_at (notifications_pYYYYMM),
+    секции создает и удаляет NotificationPartitionService. Первичный ключ
+    включает created_at - этого требует секционирование.
+    """
 
     __tablename__ = "notifications"
+    __table_args__ = (
+        # Лента уведомлений пользователя (курсоры по created_at, id)
+        Index("ix_notifications_user_created", "user_id", "created_at", "id"),
+        # Непрочитанные уведомления пользователя (сверка счетчика)
+        Index(
+            "ix_notifications_user_unread",
+            "user_id",
+            postgresql_where=text("NOT is_read"),
+        ),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
@@ -32,11 +71,43 @@ class Notification(Base):
     title = Column(String(255), nullable=False)
     message = Column(Text, nullable=False)
     is_read = Column(Boolean, default=False, nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    # Дата, на которую запланировано уведомление (None - событийное)
+    scheduled_for = Column(Date, nullable=True)
+    created_at = Column(
+        DateTime, primary_key=True, default=datetime.utcnow, nullable=False
+    )
 
     # Связи
-    user = relationship("User", back_populates="notifications")
-    booking = relationship("Booking", back_populates="notifications")
+    user = relationship("User", back_populates="notifications", lazy=RELATIONSHIP_LAZY)
+    booking = relationship("Booking", back_populates="notifications", lazy=RELATIONSHIP_LAZY)
 
     def __repr__(self):
         return f"<Notification(id={self.id}, user_id={self.user_id}, type={self.type})>"
+
+
+# Без секции по умолчанию вставка в только что созданную таблицу
+# (Base.metadata.create_all) падала бы до создания месячных секций
+event.listen(
+    Notification.__table__,
+    "after_create",
+    DDL(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF notifications DEFAULT"),
+)
+
+
+class NotificationDedup(Base):
+    """
+    Отметка о созданном плановом уведомлении
+
+    Уникальный индекс секционированной таблицы обязан включать created_at,
+    поэтому уникальность (бронирование, тип, дата) хранится отдельно:
+    уведомление создается, только если вставка отметки прошла
+    (ON CONFLICT DO NOTHING).
+    """
+
+    __tablename__ = "notification_dedup"
+
+    booking_id = Column(
+        UUID(as_uuid=True), ForeignKey("bookings.id"), primary_key=True
+    )
+    type = Column(Enum(NotificationType), primary_key=True)
+    scheduled_for = Column(Date, primary_key=True)
@@ -0,0 +1,56 @@
+"""
+Модель исходящих событий (transactional outbox)
+"""
+
+import enum
+import uuid
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Enum, Index, Integer, text
+from sqlalchemy.dialects.postgresql import UUID
+from app.core.database import Base
+
+
+class OutboxEventType(str, enum.Enum):
+    """Тип исходящего события"""
+
+    BOOKING_CREATED = "booking_created"
+    BOOKING_CANCELLED = "booking_cancelled"
+
+
+class OutboxEvent(Base):
+    """
+    Исходящее событие
+
+    Записывается в той же транзакции, что и изменение бронирования, и
+    передается в Celery задачей relay_outbox_events. processed_at ставит
+    обработчик в транзакции со своими изменениями - повторная доставка
+    события ничего не дублирует.
+    """
+
+    __tablename__ = "outbox_events"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    event_type = Column(Enum(OutboxEventType), nullable=False)
+    aggregate_id = Column(UUID(as_uuid=True), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    dispatched_at = Column(DateTime, nullable=True)
+    processed_at = Column(DateTime, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+
+    __table_args__ = (
+        # Необработанные события по порядку создания (выборка relay)
+        Index(
+            "ix_outbox_events_pending",
+            "created_at",
+            postgresql_where=text("processed_at IS NULL"),
+        ),
+        # Обработанные события по времени обработки (очистка purge_processed)
+        Index(
+            "ix_outbox_events_processed",
+            "processed_at",
+            postgresql_where=text("processed_at IS NOT NULL"),
+        ),
+    )
+
+    def __repr__(self):
+        return f"<OutboxEvent(id={self.id}, event_type={self.event_type}, aggregate_id={self.aggregate_id})>"
@@ -4,10 +4,10 @@
 
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, Boolean, DateTime, Text
+from sqlalchemy import Column, String, Boolean, DateTime, Integer, Text, ForeignKey
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
-from app.core.database import Base
+from app.core.database import Base, RELATIONSHIP_LAZY
 
 
 class User(Base):
@@ -22,6 +22,15 @@ class User(Base):
     full_name = Column(String(100), nullable=False)
     phone = Column(String(20), nullable=True)
     avatar_url = Column(String(500), nullable=True)
+    # Пункт выдачи, где пользователь передает свои книги (поиск книг рядом)
+    preferred_booking_point_id = Column(
+        UUID(as_uuid=True), ForeignKey("booking_points.id"), nullable=True
+    )
+    # Счетчик непрочитанных уведомлений: меняется в одной транзакции
+    # с уведомлениями, сверяется задачей reconcile_unread_counters
+    unread_notifications_count = Column(
+        Integer, nullable=False, default=0, server_default="0"
+    )
     is_active = Column(Boolean, default=True, nullable=False)
     is_verified = Column(Boolean, default=False, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -30,12 +39,14 @@ class User(Base):
     )
 
     # Связи
-    books = relationship("Book", back_populates="owner", cascade="all, delete-orphan")
+    books = relationship("Book", back_populates="owner", cascade="all, delete-orphan", lazy=RELATIONSHIP_LAZY)
     bookings_as_borrower = relationship(
-        "Booking", back_populates="borrower", foreign_keys="Booking.borrower_id"
+        "Booking", back_populates="borrower", foreign_keys="Booking.borrower_id",
+        lazy=RELATIONSHIP_LAZY,
     )
     notifications = relationship(
-        "Notification", back_populates="user", cascade="all, delete-orphan"
+        "Notification", back_populates="user", cascade="all, delete-orphan",
+        lazy=RELATIONSHIP_LAZY,
     )
 
     def __repr__(self):
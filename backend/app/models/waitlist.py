@@ -0,0 +1,29 @@
+"""
+Модель очереди ожидания книги
+"""
+
+import uuid
+from datetime import datetime
+from sqlalchemy import Column, DateTime, ForeignKey, Index, UniqueConstraint
+from sqlalchemy.dialects.postgresql import UUID
+from app.core.database import Base
+
+
+class WaitlistEntry(Base):
+    """Место пользователя в очереди ожидания книги (FIFO по created_at)"""
+
+    __tablename__ = "waitlist_entries"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    book_id = Column(UUID(as_uuid=True), ForeignKey("books.id"), nullable=False)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("book_id", "user_id", name="uq_waitlist_entries_book_user"),
+        # Голова очереди и позиция пользователя - по индексу без сортировки
+        Index("ix_waitlist_entries_book_queue", "book_id", "created_at", "id"),
+    )
+
+    def __repr__(self):
+        return f"<WaitlistEntry(id={self.id}, book_id={self.book_id}, user_id={self.user_id})>"
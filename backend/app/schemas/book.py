@@ -3,11 +3,12 @@
 """
 
 from typing import Optional, List
-from datetime import datetime
+from datetime import datetime, date
 from pydantic import BaseModel, validator, Field
 import re
 from uuid import UUID
 from app.models.book import BookCondition
+from app.models.booking import BookingStatus
 
 
 class BookBase(BaseModel):
@@ -96,6 +97,7 @@ class BookResponse(BookBase):
     is_active: bool
     created_at: datetime
     updated_at: datetime
+    version_id: int = Field(..., description="Версия книги (для If-Match)")
     owner: Optional[dict] = None
     bookings: Optional[List[dict]] = None
 
@@ -153,6 +155,9 @@ class BookSearchParams(BaseModel):
     author: Optional[str] = None
     owner_id: Optional[str] = None
     available_only: bool = True
+    # Свободна на весь период [available_from, available_to)
+    available_from: Optional[date] = None
+    available_to: Optional[date] = None
     page: int = 1
     limit: int = 20
 
@@ -167,3 +172,66 @@ class BookSearchParams(BaseModel):
         if v < 1 or v > 100:
             raise ValueError("Лимит должен быть от 1 до 100")
         return v
+
+    @validator("available_to", always=True)
+    def validate_available_to(cls, v, values):
+        available_from = values.get("available_from")
+        if (v is None) != (available_from is None):
+            raise ValueError("Период доступности задается обеими датами")
+        if v is not None and v <= available_from:
+            raise ValueError("Конец периода должен быть позже начала")
+        return v
+
+
+class BookPeriod(BaseModel):
+    """Период [start, end): дата end не входит"""
+
+    start: date
+    end: date
+
+
+class BookBusyPeriod(BookPeriod):
+    """Период, занятый бронированием"""
+
+    status: BookingStatus
+
+
+class BookAvailabilityResponse(BaseModel):
+    """Календарь доступности книги на период"""
+
+    book_id: str
+    date_from: date
+    date_to: date
+    busy: List[BookBusyPeriod]
+    free: List[BookPeriod]
+
+
+class NearbyBookResponse(BookResponse):
+    """Книга с пунктом выдачи владельца и расстоянием до него"""
+
+    booking_point_id: str
+    distance_km: float
+
+    @validator("booking_point_id", pre=True)
+    def convert_point_id_to_str(cls, v):
+        if isinstance(v, UUID):
+            return str(v)
+        return v
+
+
+class NearbyBookListResponse(BaseModel):
+    """Страница книг рядом, по возрастанию расстояния"""
+
+    books: List[NearbyBookResponse]
+    next_cursor: Optional[str] = Field(
+        None, description="Курсор следующей страницы (None - страница последняя)"
+    )
+
+
+class WaitlistPositionResponse(BaseModel):
+    """Место пользователя в очереди ожидания книги"""
+
+    book_id: str
+    position: int = Field(..., description="Позиция в очереди, начиная с 1")
+    queue_length: int
+    joined_at: datetime
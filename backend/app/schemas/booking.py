@@ -74,6 +74,7 @@ class BookingResponse(BookingBase):
     actual_return_date: Optional[datetime] = None
     created_at: datetime
     updated_at: datetime
+    version_id: int = Field(..., description="Версия бронирования (для If-Match)")
     book: Optional[dict] = None
     borrower: Optional[dict] = None
     booking_point: Optional[dict] = None
@@ -3,6 +3,7 @@
 """
 
 from typing import Optional, List
+from datetime import date, datetime
 from pydantic import BaseModel, validator, Field
 from uuid import UUID
 
@@ -15,6 +16,9 @@ class BookingPointBase(BaseModel):
     coordinates: Optional[str] = None  # "lat,lng" format
     working_hours: str
     phone: Optional[str] = None
+    daily_capacity: Optional[int] = Field(
+        None, description="Выдач в день (не задано - без ограничения)"
+    )
 
     @validator("name")
     def validate_name(cls, v):
@@ -56,7 +60,10 @@ class BookingPointResponse(BookingPointBase):
     """Схема ответа с данными пункта выдачи"""
 
     id: str = Field(..., description="ID пункта выдачи")
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
     is_active: bool
+    updated_at: Optional[datetime] = None
 
     @validator("id", pre=True)
     def convert_uuid_to_str(cls, v):
@@ -68,8 +75,30 @@ class BookingPointResponse(BookingPointBase):
         from_attributes = True
 
 
+class BookingPointNearbyResponse(BookingPointResponse):
+    """Пункт выдачи с расстоянием до точки поиска"""
+
+    distance_km: float
+
+
 class BookingPointListResponse(BaseModel):
     """Схема ответа со списком пунктов выдачи"""
 
     booking_points: List[BookingPointResponse]
     total: int
+
+
+class BookingPointSlotResponse(BaseModel):
+    """Загрузка пункта выдачи на день"""
+
+    date: date
+    reserved: int
+    available: Optional[int] = Field(None, description="None - без ограничения")
+
+
+class BookingPointSlotsResponse(BaseModel):
+    """Свободные слоты выдачи пункта на период"""
+
+    booking_point_id: str
+    daily_capacity: Optional[int] = None
+    slots: List[BookingPointSlotResponse]
@@ -32,10 +32,27 @@ class NotificationResponse(BaseModel):
 
 
 class NotificationListResponse(BaseModel):
-    """Схема ответа со списком уведомлений"""
+    """Схема ответа со списком уведомлений (новые первыми)"""
 
     notifications: List[NotificationResponse]
-    total: int
+    total: Optional[int] = Field(
+        None, description="Всего уведомлений (не считается для дельты since)"
+    )
+    unread_count: int
+    next_cursor: Optional[str] = Field(
+        None, description="Курсор before для более старых уведомлений"
+    )
+    sync_cursor: Optional[str] = Field(
+        None, description="Курсор since для получения только новых уведомлений"
+    )
+    has_more: bool = Field(
+        False, description="Для дельты: есть еще новые уведомления после sync_cursor"
+    )
+
+
+class UnreadCountResponse(BaseModel):
+    """Схема ответа с количеством непрочитанных уведомлений"""
+
     unread_count: int
 
 
@@ -60,6 +60,7 @@ class UserUpdate(BaseModel):
     username: Optional[str] = None
     full_name: Optional[str] = None
     phone: Optional[str] = None
+    preferred_booking_point_id: Optional[str] = None
 
     @validator("username")
     def validate_username(cls, v):
@@ -93,12 +94,13 @@ class UserResponse(UserBase):
 
     id: str = Field(..., description="ID пользователя")
     avatar_url: Optional[str] = None
+    preferred_booking_point_id: Optional[str] = None
     is_active: bool
     is_verified: bool
     created_at: datetime
     updated_at: datetime
 
-    @validator("id", pre=True)
+    @validator("id", "preferred_booking_point_id", pre=True)
     def convert_uuid_to_str(cls, v):
         if isinstance(v, UUID):
             return str(v)
@@ -3,10 +3,13 @@
 """
 
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Dict, Iterable, Optional
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
 from app.models.user import User
+from app.models.booking_point import BookingPoint
+from app.core.cache import TwoTierCache
+from app.core.response_cache import catalog_cache, CATALOG_TAG, owner_tag
 from app.schemas.user import UserCreate
 from app.schemas.auth import UserLogin
 from app.core.security import (
@@ -16,6 +19,9 @@ from app.core.security import (
     create_refresh_token,
 )
 
+# Отображаемые данные пользователя встраиваются в каждый BookResponse.owner
+user_display_cache = TwoTierCache("user_display", ttl=3600)
+
 
 class AuthService:
     """Сервис для работы с аутентификацией"""
@@ -109,6 +115,31 @@ class AuthService:
         """Получение пользователя по ID"""
         return self.db.query(User).filter(User.id == user_id).first()
 
+    def get_users_display(self, user_ids: Iterable) -> Dict[str, dict]:
+        """Отображаемые данные пользователей по ID (одним запросом для промахов кэша)"""
+        ids = {str(user_id) for user_id in user_ids}
+        found = user_display_cache.get_many(ids)
+
+        missing = ids - found.keys()
+        if missing:
+            users = (
+                self.db.query(User.id, User.username, User.full_name)
+                .filter(User.id.in_(missing))
+                .all()
+            )
+            loaded = {
+                str(user.id): {
+                    "id": str(user.id),
+                    "username": user.username,
+                    "full_name": user.full_name,
+                }
+                for user in users
+            }
+            user_display_cache.set_many(loaded)
+            found.update(loaded)
+
+        return found
+
     def update_user(self, user_id: str, update_data: dict) -> Optional[User]:
         """Обновление данных пользователя"""
         user = self.get_user_by_id(user_id)
@@ -139,6 +170,22 @@ class AuthService:
                     detail="Пользователь с таким именем уже существует",
                 )
 
+        # Проверка пункта выдачи, если он изменяется
+        if "preferred_booking_point_id" in update_data:
+            point = (
+                self.db.query(BookingPoint.id)
+                .filter(
+                    BookingPoint.id == update_data["preferred_booking_point_id"],
+                    BookingPoint.is_active == True,
+                )
+                .first()
+            )
+            if not point:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Пункт выдачи не найден",
+                )
+
         # Обновление полей
         for field, value in update_data.items():
             if hasattr(user, field) and value is not None:
@@ -148,6 +195,10 @@ class AuthService:
         self.db.commit()
         self.db.refresh(user)
 
+        # Имя владельца встроено в ответы каталога
+        user_display_cache.delete(str(user.id))
+        catalog_cache.invalidate(CATALOG_TAG, owner_tag(user.id))
+
         return user
 
     def change_password(
@@ -2,14 +2,44 @@
 Сервис для работы с книгами
 """
 
-from typing import List, Optional, Tuple
-from datetime import datetime
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import and_, or_
+import uuid
+from typing import Collection, List, Optional, Tuple
+from datetime import date, datetime
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import (
+    Float,
+    and_,
+    column,
+    distinct,
+    func,
+    literal,
+    or_,
+    select,
+    tuple_,
+    values,
+)
+from sqlalchemy.dialects.postgresql import DATERANGE, UUID
+from sqlalchemy.orm.exc import StaleDataError
 from fastapi import HTTPException, status
 from app.models.book import Book
+from app.models.booking import Booking, ACTIVE_BOOKING_STATUSES
 from app.models.user import User
+from app.core.cache import TwoTierCache, cached_method
+from app.core.http_cache import check_if_match, precondition_failed
+from app.core.loaders import loader_options
+from app.core.response_cache import catalog_cache, CATALOG_TAG, book_tag, owner_tag
 from app.schemas.book import BookCreate, BookUpdate, BookSearchParams
+from app.services.booking_service import BookingService
+
+genres_cache = TwoTierCache("genres", ttl=600)
+
+# Сколько ближайших пунктов выдачи учитывается в поиске книг рядом
+NEARBY_BOOKS_MAX_POINTS = 500
+
+
+def _date_range(start: date, end: date):
+    """Выражение daterange [start, end)"""
+    return func.daterange(start, end, literal("[)"), type_=DATERANGE)
 
 
 class BookService:
@@ -42,30 +72,29 @@ class BookService:
         self.db.commit()
         self.db.refresh(db_book)
 
+        genres_cache.delete("active")
+        catalog_cache.invalidate(CATALOG_TAG, owner_tag(owner_id))
+
         return db_book
 
     def get_book_by_id(self, book_id: str) -> Optional[Book]:
-        """Получение книги по ID"""
+        """Получение книги по ID (без связей: для изменения книги)"""
         return (
             self.db.query(Book)
-            .options(joinedload(Book.owner))
+            .options(*loader_options("book_write"))
             .filter(Book.id == book_id)
             .first()
         )
 
-    def get_books(self, search_params: BookSearchParams) -> Tuple[List[Book], int]:
-        """Получение списка книг с фильтрацией"""
-        query = (
-            self.db.query(Book)
-            .options(
-                joinedload(Book.owner),
-                joinedload(Book.bookings)
-            )
-            .filter(Book.is_active == True)
-        )
+    def _apply_search_filters(self, query, search_params: BookSearchParams):
+        """Применение фильтров каталога к запросу"""
+        query = query.filter(Book.is_active == True)
 
-        # Фильтр по доступности
-        if search_params.available_only:
+        # Фильтр по доступности: на период (если задан) или сейчас
+        if search_params.available_from:
+            period = _date_range(search_params.available_from, search_params.available_to)
+            query = query.filter(~self._busy_bookings(period).exists())
+        elif search_params.available_only:
             query = query.filter(Book.is_available == True)
 
         # Поиск по тексту
@@ -87,47 +116,229 @@ class BookService:
         if search_params.owner_id:
             query = query.filter(Book.owner_id == search_params.owner_id)
 
+        return query
+
+    def _busy_bookings(self, period, book_id=None):
+        """
+        Активные бронирования книги, пересекающиеся с периодом
+
+        Условие (book_id, period &&) обслуживает GiST-индекс ограничения
+        ex_bookings_book_period. Без book_id запрос коррелирует только с Book
+        (внешний запрос может сам соединять bookings).
+        """
+        if book_id is not None:
+            return self.db.query(Booking).filter(
+                Booking.book_id == book_id,
+                Booking.status.in_(ACTIVE_BOOKING_STATUSES),
+                Booking.period.op("&&")(period),
+            )
+        busy = aliased(Booking)
+        return (
+            self.db.query(busy)
+            .filter(
+                busy.book_id == Book.id,
+                busy.status.in_(ACTIVE_BOOKING_STATUSES),
+                busy.period.op("&&")(period),
+            )
+            .correlate(Book)
+        )
+
+    def get_book_availability(
+        self, book_id: str, date_from: date, date_to: date
+    ) -> Optional[dict]:
+        """
+        Календарь доступности книги на период [date_from, date_to)
+
+        Возвращает занятые бронированиями и свободные интервалы
+        или None, если книга не найдена.
+        """
+        book_exists = self.db.query(
+            self.db.query(Book).filter(Book.id == book_id, Book.is_active == True).exists()
+        ).scalar()
+        if not book_exists:
+            return None
+
+        period = _date_range(date_from, date_to)
+        rows = (
+            self._busy_bookings(period, book_id)
+            .with_entities(
+                func.lower(Booking.period), func.upper(Booking.period), Booking.status
+            )
+            .order_by(func.lower(Booking.period))
+            .all()
+        )
+
+        busy, free = [], []
+        cursor = date_from
+        for start, end, booking_status in rows:
+            start, end = max(start, date_from), min(end, date_to)
+            if start > cursor:
+                free.append({"start": cursor, "end": start})
+            busy.append({"start": start, "end": end, "status": booking_status})
+            cursor = max(cursor, end)
+        if cursor < date_to:
+            free.append({"start": cursor, "end": date_to})
+
+        return {
+            "book_id": str(book_id),
+            "date_from": date_from,
+            "date_to": date_to,
+            "busy": busy,
+            "free": free,
+        }
+
+    def get_books(self, search_params: BookSearchParams) -> Tuple[List[Book], int]:
+        """
+        Получение списка книг с фильтрацией
+
+        Владелец не загружается: его отображаемые данные берутся из кэша
+        через AuthService.get_users_display. Бронирования страницы подгружаются
+        пакетно через RequestLoaders.
+        """
+        query = self._apply_search_filters(
+            self.db.query(Book).options(*loader_options("catalog_list")), search_params
+        )
+
         # Подсчет общего количества
         total = query.count()
 
-        # Пагинация
+        # Пагинация (стабильный порядок нужен для корректных ETag страниц)
         offset = (search_params.page - 1) * search_params.limit
-        books = query.offset(offset).limit(search_params.limit).all()
+        books = (
+            query.order_by(Book.created_at.desc(), Book.id)
+            .offset(offset)
+            .limit(search_params.limit)
+            .all()
+        )
 
         return books, total
 
+    def get_nearby_books(
+        self,
+        lat: float,
+        lng: float,
+        radius_km: float,
+        limit: int,
+        after: Optional[Tuple[float, str]] = None,
+    ) -> List[Tuple[Book, float, str]]:
+        """
+        Доступные книги рядом, по возрастанию расстояния до пункта выдачи
+
+        Пункт выдачи книги - предпочитаемый пункт владельца, иначе пункт
+        его последнего бронирования. Расстояния считаются один раз на пункт
+        по индексу в памяти и передаются в запрос таблицей VALUES, книги
+        присоединяются к ней. Пагинация по ключу (расстояние, id):
+        after - последняя пара предыдущей страницы.
+        """
+        points = BookingService(self.db).get_nearby_booking_points(
+            lat, lng, NEARBY_BOOKS_MAX_POINTS, radius_km
+        )
+        if not points:
+            return []
+
+        nearby = values(
+            column("point_id", UUID(as_uuid=True)),
+            column("distance_km", Float),
+            name="nearby_points",
+        ).data([(uuid.UUID(point["id"]), point["distance_km"]) for point in points])
+
+        owner_book = aliased(Book)
+        last_used_point = (
+            select(Booking.booking_point_id)
+            .join(owner_book, Booking.book_id == owner_book.id)
+            .where(owner_book.owner_id == User.id)
+            .order_by(Booking.created_at.desc())
+            .limit(1)
+            .correlate(User)
+            .scalar_subquery()
+        )
+        pickup_point = func.coalesce(User.preferred_booking_point_id, last_used_point)
+
+        query = (
+            self.db.query(Book, nearby.c.distance_km, nearby.c.point_id)
+            .options(*loader_options("nearby_list"))
+            .join(User, Book.owner_id == User.id)
+            .join(nearby, nearby.c.point_id == pickup_point)
+            .filter(Book.is_active == True, Book.is_available == True)
+        )
+        if after is not None:
+            query = query.filter(
+                tuple_(nearby.c.distance_km, Book.id)
+                > tuple_(literal(after[0], Float), literal(after[1], UUID(as_uuid=True)))
+            )
+
+        return query.order_by(nearby.c.distance_km, Book.id).limit(limit).all()
+
+    def get_book_version(
+        self, book_id: str
+    ) -> Optional[Tuple[int, Optional[datetime], Optional[datetime], Optional[datetime]]]:
+        """
+        Дешевая проверка версии книги
+
+        Возвращает version_id книги и время изменения книги, владельца
+        и бронирований.
+        """
+        last_booking_update = (
+            self.db.query(func.max(Booking.updated_at))
+            .filter(Booking.book_id == Book.id)
+            .correlate(Book)
+            .scalar_subquery()
+        )
+        row = (
+            self.db.query(
+                Book.version_id, Book.updated_at, User.updated_at, last_booking_update
+            )
+            .join(User, Book.owner_id == User.id)
+            .filter(Book.id == book_id)
+            .first()
+        )
+        return tuple(row) if row else None
+
+    @cached_method(genres_cache, key=lambda: "active")
+    def get_genres(self) -> List[str]:
+        """Получение списка жанров активных книг"""
+        rows = (
+            self.db.query(distinct(Book.genre))
+            .filter(Book.is_active == True, Book.genre.isnot(None))
+            .order_by(Book.genre)
+            .all()
+        )
+        return [genre for (genre,) in rows]
+
     def get_user_books(self, user_id: str) -> List[Book]:
         """Получение книг пользователя"""
         return (
             self.db.query(Book)
-            .options(
-                joinedload(Book.owner),
-                joinedload(Book.bookings)
-            )
+            .options(*loader_options("book_write"))
             .filter(and_(Book.owner_id == user_id, Book.is_active == True))
             .all()
         )
 
     def update_book(
-        self, book_id: str, book_data: BookUpdate, user_id: str
+        self,
+        book_id: str,
+        book_data: BookUpdate,
+        user_id: str,
+        expected_versions: Optional[Collection[int]] = None,
     ) -> Optional[Book]:
-        """Обновление книги"""
+        """
+        Обновление книги
+
+        expected_versions - версии из If-Match. Параллельное изменение книги
+        обнаруживается по version_id в WHERE запроса UPDATE, без блокировки.
+        """
         book = self.get_book_by_id(book_id)
         if not book:
             return None
 
         # Проверка прав владельца
-        if book.owner_id != user_id:
+        if str(book.owner_id) != str(user_id):
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Нет прав для редактирования этой книги",
             )
 
-        # Валидация ISBN если указан
-        if book_data.isbn and not validate_isbn(book_data.isbn):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST, detail="Некорректный ISBN"
-            )
+        check_if_match(book.version_id, expected_versions)
 
         # Обновление полей
         for field, value in book_data.dict(exclude_unset=True).items():
@@ -135,38 +346,45 @@ class BookService:
                 setattr(book, field, value)
 
         book.updated_at = datetime.utcnow()
-        self.db.commit()
+        self._commit_versioned(expected_versions)
         self.db.refresh(book)
 
+        genres_cache.delete("active")
+        catalog_cache.invalidate(CATALOG_TAG, book_tag(book.id))
+
         return book
 
-    def delete_book(self, book_id: str, user_id: str) -> bool:
+    def delete_book(
+        self,
+        book_id: str,
+        user_id: str,
+        expected_versions: Optional[Collection[int]] = None,
+    ) -> bool:
         """Удаление книги"""
         book = self.get_book_by_id(book_id)
         if not book:
             return False
 
         # Проверка прав владельца
-        if book.owner_id != user_id:
+        if str(book.owner_id) != str(user_id):
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Нет прав для удаления этой книги",
             )
 
+        check_if_match(book.version_id, expected_versions)
+
         # Проверка активных бронирований
-        active_bookings = (
-            self.db.query(Book)
-            .join(Book.bookings)
+        has_active_bookings = self.db.query(
+            self.db.query(Booking)
             .filter(
-                and_(
-                    Book.id == book_id,
-                    Book.bookings.any(status.in_(["pending", "confirmed", "taken"])),
-                )
+                Booking.book_id == book.id,
+                Booking.status.in_(ACTIVE_BOOKING_STATUSES),
             )
-            .first()
-        )
+            .exists()
+        ).scalar()
 
-        if active_bookings:
+        if has_active_bookings:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Нельзя удалить книгу с активными бронированиями",
@@ -176,10 +394,31 @@ class BookService:
         book.is_active = False
         book.is_available = False
         book.updated_at = datetime.utcnow()
-        self.db.commit()
+        self._commit_versioned(expected_versions)
+
+        genres_cache.delete("active")
+        catalog_cache.invalidate(CATALOG_TAG, book_tag(book.id))
 
         return True
 
+    def _commit_versioned(self, expected_versions: Optional[Collection[int]]) -> None:
+        """
+        Commit изменений книги с проверкой version_id
+
+        Если книгу изменили после ее загрузки, UPDATE не находит строку
+        с прежней версией: 412 для запроса с If-Match, иначе 409.
+        """
+        try:
+            self.db.commit()
+        except StaleDataError:
+            self.db.rollback()
+            if expected_versions is not None:
+                raise precondition_failed()
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Книга была изменена другим запросом, повторите попытку",
+            )
+
     def update_book_availability(self, book_id: str, is_available: bool) -> bool:
         """Обновление доступности книги"""
         book = self.get_book_by_id(book_id)
@@ -190,8 +429,15 @@ class BookService:
         book.updated_at = datetime.utcnow()
         self.db.commit()
 
+        catalog_cache.invalidate(CATALOG_TAG, book_tag(book.id))
+
         return True
 
     def get_book_with_owner(self, book_id: str) -> Optional[Book]:
-        """Получение книги с информацией о владельце"""
-        return self.db.query(Book).join(User).filter(Book.id == book_id).first()
+        """Получение книги с информацией о владельце и бронированиями"""
+        return (
+            self.db.query(Book)
+            .options(*loader_options("book_detail"))
+            .filter(Book.id == book_id)
+            .first()
+        )
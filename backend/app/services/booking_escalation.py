@@ -0,0 +1,95 @@
+"""
+Лестница напоминаний о возврате и просрочке
+"""
+
+from typing import List, NamedTuple, Tuple
+from sqlalchemy import String, cast, func
+from app.core.config import settings
+from app.models.book import Book
+from app.models.booking import Booking
+from app.models.notification import NotificationType
+from app.services.booking_transitions import Actor
+
+
+class EscalationStep(NamedTuple):
+    """
+    Ступень напоминаний по выданной книге
+
+    offset_days - день относительно planned_return_date, в который
+    отправляется уведомление (отрицательный - до срока возврата);
+    recipient - заемщик или владелец книги.
+    """
+
+    offset_days: int
+    recipient: Actor
+    notification_type: NotificationType
+    title: str
+
+    def message(self):
+        """SQL-выражение текста уведомления (по строкам bookings JOIN books)"""
+        return_date = cast(Booking.planned_return_date, String)
+        if self.recipient == Actor.OWNER:
+            return func.concat(
+                "Книгу '", Book.title, "' не вернули в срок (", return_date, ")"
+            )
+        if self.offset_days < 0:
+            return func.concat(
+                "Не забудьте вернуть книгу '", Book.title, "' до ", return_date
+            )
+        if self.offset_days == 0:
+            return func.concat(
+                "Сегодня последний день возврата книги '", Book.title, "'"
+            )
+        return func.concat(
+            "Книга '",
+            Book.title,
+            f"' просрочена на {self.offset_days} дн. Пожалуйста, верните ее",
+        )
+
+
+def borrower_step(offset_days: int) -> EscalationStep:
+    """Ступень для заемщика: напоминание до срока или уведомление о просрочке"""
+    if offset_days < 0:
+        return EscalationStep(
+            offset_days, Actor.BORROWER, NotificationType.RETURN_REMINDER, "Напоминание о возврате"
+        )
+    if offset_days == 0:
+        return EscalationStep(
+            offset_days, Actor.BORROWER, NotificationType.RETURN_REMINDER, "Сегодня срок возврата"
+        )
+    return EscalationStep(
+        offset_days, Actor.BORROWER, NotificationType.BOOKING_OVERDUE, "Книга просрочена"
+    )
+
+
+def escalation_ladder() -> List[EscalationStep]:
+    """Ступени из настроек return_reminder_days и overdue_owner_alert_days"""
+    steps = [borrower_step(offset) for offset in settings.return_reminder_days]
+    steps.extend(
+        EscalationStep(
+            offset, Actor.OWNER, NotificationType.OVERDUE_ALERT, "Книгу не вернули в срок"
+        )
+        for offset in settings.overdue_owner_alert_days
+    )
+    return steps
+
+
+def catchup_days(
+    steps: List[EscalationStep], max_days: int
+) -> List[Tuple[EscalationStep, int]]:
+    """
+    Сколько дней после своей даты каждая ступень может быть дослана
+
+    Пропущенная ступень досылается не дольше max_days и только пока не
+    наступила следующая ступень того же получателя: вместо устаревшего
+    напоминания уходит актуальное.
+    """
+    result = []
+    for step in steps:
+        later = [
+            other.offset_days - step.offset_days
+            for other in steps
+            if other.recipient == step.recipient and other.offset_days > step.offset_days
+        ]
+        result.append((step, min([max_days] + [gap - 1 for gap in later])))
+    return result
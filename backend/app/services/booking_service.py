@@ -2,16 +2,127 @@
 Сервис для работы с бронированиями
 """
 
-from typing import List, Optional, Tuple
+import uuid
+from itertools import chain
+from typing import Collection, Dict, List, Optional, Tuple
 from datetime import datetime, date, timedelta
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import and_, or_
+from zoneinfo import ZoneInfo
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import (
+    and_,
+    cast,
+    event,
+    exists,
+    false,
+    func,
+    insert,
+    literal,
+    or_,
+    select,
+    true,
+    union_all,
+    update,
+)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
 from fastapi import HTTPException, status
 from app.models.booking import Booking, BookingStatus
 from app.models.book import Book
-from app.models.user import User
-from app.models.booking_point import BookingPoint
+from app.models.booking_point import BookingPoint, BookingPointSlot
+from app.models.notification import Notification, NotificationType
+from app.models.outbox import OutboxEventType
+from app.core.cache import TwoTierCache, cached_method
+from app.core.config import settings
+from app.core.database import run_in_transaction
+from app.core.http_cache import precondition_failed
+from app.core.loaders import loader_options
+from app.core.response_cache import catalog_cache, CATALOG_TAG, book_tag
+from app.services.booking_transitions import (
+    BOOKING_TRANSITIONS,
+    STATUS_UPDATE_ACTIONS,
+    Actor,
+    Transition,
+)
+from app.services.notification_service import (
+    NOTIFICATION_EVENT_FIELDS,
+    notification_events,
+    queue_notification_events,
+    unread_counter_increment,
+)
+from app.services.outbox_service import outbox_event
+from app.services.waitlist_service import waitlist_handoff
 from app.schemas.booking import BookingCreate, BookingUpdate, BookingSearchParams
+from app.schemas.booking_point import BookingPointResponse
+from app.utils.geo import GridIndex
+from app.utils.working_hours import is_open
+
+# Пункты выдачи меняются редко, а читаются при каждом бронировании
+booking_points_cache = TwoTierCache("booking_points", ttl=300)
+BOOKING_POINTS_CHANGED_KEY = "booking_points_changed"
+
+
+@event.listens_for(Session, "after_flush")
+def _track_booking_point_changes(session, flush_context):
+    """Отметка об изменении пунктов выдачи через ORM (init_db, админка)"""
+    if any(
+        isinstance(obj, BookingPoint)
+        for obj in chain(session.new, session.dirty, session.deleted)
+    ):
+        session.info[BOOKING_POINTS_CHANGED_KEY] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_booking_points(session):
+    """
+    Инвалидация кэша пунктов выдачи после commit
+
+    Список и часы работы удаляются на всех воркерах, ETag списка
+    пересчитывается по свежим данным. Изменения в обход ORM станут
+    видны после ttl кэша.
+    """
+    if session.info.pop(BOOKING_POINTS_CHANGED_KEY, False):
+        booking_points_cache.delete("active", "hours")
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_booking_point_changes(session):
+    session.info.pop(BOOKING_POINTS_CHANGED_KEY, None)
+
+
+class BookingPointsIndex:
+    """
+    Пространственный индекс активных пунктов выдачи процесса
+
+    Строится по закэшированному списку пунктов и перестраивается, только
+    если пункты изменились (количество или время последнего изменения).
+    """
+
+    def __init__(self):
+        self._source = None
+        self._signature = None
+        self._index: Optional[GridIndex] = None
+        self.by_id: Dict[str, dict] = {}
+
+    def get(self, points: List[dict]) -> GridIndex:
+        if points is not self._source:
+            signature = (
+                len(points),
+                max((point.get("updated_at") or "" for point in points), default=""),
+            )
+            if signature != self._signature or self._index is None:
+                self._index = GridIndex(
+                    (point["id"], point["latitude"], point["longitude"])
+                    for point in points
+                    if point.get("latitude") is not None
+                    and point.get("longitude") is not None
+                )
+                self._signature = signature
+            self.by_id = {point["id"]: point for point in points}
+            self._source = points
+        return self._index
+
+
+booking_points_index = BookingPointsIndex()
 
 
 class BookingService:
@@ -21,102 +132,289 @@ class BookingService:
         self.db = db
 
     def create_booking(self, booking_data: BookingCreate, borrower_id: str) -> Booking:
-        """Создание нового бронирования"""
-        # Проверка существования книги
-        book = self.db.query(Book).filter(Book.id == booking_data.book_id).first()
-        if not book:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="Книга не найдена"
-            )
+        """
+        Создание бронирования
+
+        Бронирование занимает период [дата получения, дата возврата).
+        Пересечение с другими активными бронированиями книги запрещает
+        ограничение ex_bookings_book_period, поэтому из одновременных
+        запросов на одни даты проходит ровно один. Бронирование с получением
+        сегодня сразу выдает книгу (условный UPDATE ... WHERE is_available
+        в том же запросе), будущее - ожидает подтверждения владельцем.
+        В той же транзакции занимается слот выдачи пункта на дату получения
+        и записывается событие BOOKING_CREATED для уведомления владельца.
+        """
+        booking = run_in_transaction(self.db, self._reserve_book, booking_data, borrower_id)
+
+        # Доступность и бронирования книги встроены в ответы каталога
+        catalog_cache.invalidate(CATALOG_TAG, book_tag(booking.book_id))
 
-        # Проверка доступности книги
-        if not book.is_available:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Книга недоступна для бронирования",
-            )
+        return booking
 
-        # Проверка, что пользователь не бронирует свою книгу
-        if book.owner_id == borrower_id:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Нельзя бронировать собственную книгу",
+    def _reserve_book(self, booking_data: BookingCreate, borrower_id: str) -> Booking:
+        """Резервирование книги и вставка бронирования одним запросом"""
+        self._reserve_slot(booking_data.booking_point_id, booking_data.planned_pickup_date)
+
+        now = datetime.utcnow()
+        today = datetime.now(ZoneInfo(settings.local_timezone)).date()
+        starts_now = booking_data.planned_pickup_date <= today
+
+        conditions = [
+            Book.id == booking_data.book_id,
+            Book.is_active == True,
+            Book.owner_id != borrower_id,
+        ]
+        book_values = {"updated_at": now, "version_id": Book.version_id + 1}
+        if starts_now:
+            # Книгу забирают сейчас: она не должна быть на руках у другого
+            conditions.append(Book.is_available == True)
+            book_values["is_available"] = False
+
+        claimed = (
+            update(Book)
+            .where(*conditions)
+            .values(**book_values)
+            .returning(Book.id)
+            .cte("claimed")
+        )
+
+        # Бронирование на сегодня сразу получает статус "взято"
+        values = {
+            Booking.id: uuid.uuid4(),
+            Booking.borrower_id: borrower_id,
+            Booking.booking_point_id: booking_data.booking_point_id,
+            Booking.status: BookingStatus.TAKEN if starts_now else BookingStatus.PENDING,
+            Booking.planned_pickup_date: booking_data.planned_pickup_date,
+            Booking.actual_pickup_date: now if starts_now else None,
+            Booking.planned_return_date: booking_data.planned_return_date,
+            Booking.notes: booking_data.notes,
+            Booking.booking_date: now,
+            Booking.created_at: now,
+            Booking.updated_at: now,
+            Booking.version_id: 1,
+        }
+        booked = (
+            insert(Booking)
+            .from_select(
+                [Booking.book_id, *values.keys()],
+                select(
+                    claimed.c.id,
+                    *(literal(value, column.type) for column, value in values.items()),
+                ),
+            )
+            .returning(*Booking.__table__.c)
+            .cte("booked")
+        )
+        # Уведомление владельцу отправит relay_outbox_events после commit
+        statement = select(booked).add_cte(
+            outbox_event(
+                OutboxEventType.BOOKING_CREATED, select(booked.c.id), now, "booking_event"
             )
+        )
 
-        # Проверка существования пункта выдачи
-        booking_point = (
-            self.db.query(BookingPoint)
-            .filter(BookingPoint.id == booking_data.booking_point_id)
-            .first()
+        try:
+            booking = self.db.scalars(
+                select(Booking)
+                .from_statement(statement)
+                .execution_options(populate_existing=True)
+            ).one_or_none()
+        except IntegrityError as error:
+            raise self._integrity_error(error) from error
+
+        if booking is None:
+            raise self._reservation_error(booking_data.book_id, borrower_id)
+
+        return booking
+
+    def _reserve_slot(self, booking_point_id: str, slot_date: date) -> None:
+        """
+        Занятие слота выдачи пункта на дату
+
+        Счетчик на (пункт, дата) увеличивается одним upsert с условием
+        reserved < daily_capacity: одновременные бронирования ждут только
+        блокировку строки счетчика, а не пересчитывают бронирования.
+        Тот же запрос возвращает вместимость пункта, поэтому случаи "пункта
+        нет", "без ограничения" и "мест нет" различаются без второго запроса.
+        """
+        inserted = pg_insert(BookingPointSlot).from_select(
+            ["booking_point_id", "slot_date", "capacity", "reserved"],
+            select(
+                BookingPoint.id,
+                literal(slot_date, BookingPointSlot.slot_date.type),
+                BookingPoint.daily_capacity,
+                literal(1),
+            ).where(
+                BookingPoint.id == booking_point_id, BookingPoint.daily_capacity > 0
+            ),
+        )
+        claimed = (
+            inserted.on_conflict_do_update(
+                index_elements=[BookingPointSlot.booking_point_id, BookingPointSlot.slot_date],
+                set_={
+                    "reserved": BookingPointSlot.reserved + 1,
+                    "capacity": inserted.excluded.capacity,
+                },
+                where=BookingPointSlot.reserved < inserted.excluded.capacity,
+            )
+            .returning(BookingPointSlot.booking_point_id)
+            .cte("slot_claim")
         )
-        if not booking_point:
+        point = self.db.execute(
+            select(BookingPoint.daily_capacity, claimed.c.booking_point_id.label("claimed"))
+            .outerjoin(claimed, true())
+            .where(BookingPoint.id == booking_point_id)
+        ).first()
+
+        if not point:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Пункт выдачи не найден"
             )
-
-        # Проверка существования заемщика
-        borrower = self.db.query(User).filter(User.id == borrower_id).first()
-        if not borrower:
+        if point.daily_capacity is not None and point.claimed is None:
             raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="Пользователь не найден"
+                status_code=status.HTTP_409_CONFLICT,
+                detail="В пункте выдачи нет свободных слотов на эту дату",
             )
 
-        # Проверка активных бронирований этой книги
-        existing_booking = (
-            self.db.query(Booking)
-            .filter(
-                and_(
-                    Booking.book_id == booking_data.book_id,
-                    Booking.status.in_(
-                        [
-                            BookingStatus.PENDING,
-                            BookingStatus.CONFIRMED,
-                            BookingStatus.TAKEN,
-                        ]
-                    ),
-                )
+    def _integrity_error(self, error: IntegrityError) -> Exception:
+        """Преобразование нарушения ограничения при вставке бронирования"""
+        constraint = getattr(getattr(error.orig, "diag", None), "constraint_name", None)
+        if constraint == "ex_bookings_book_period":
+            return HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Книга уже забронирована на эти даты",
+            )
+        if constraint == "bookings_booking_point_id_fkey":
+            return HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Пункт выдачи не найден"
             )
+        if constraint == "bookings_borrower_id_fkey":
+            return HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Пользователь не найден"
+            )
+        return error
+
+    def _reservation_error(self, book_id: str, borrower_id: str) -> HTTPException:
+        """Причина отказа в резервировании (запрашивается только при отказе)"""
+        book = (
+            self.db.query(Book.owner_id, Book.is_active)
+            .filter(Book.id == book_id)
             .first()
         )
+        if not book or not book.is_active:
+            return HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Книга не найдена"
+            )
 
-        if existing_booking:
-            raise HTTPException(
+        if str(book.owner_id) == str(borrower_id):
+            return HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Книга уже забронирована",
-            )
-
-        # Создание бронирования со статусом "TAKEN" (сразу взято)
-        db_booking = Booking(
-            book_id=booking_data.book_id,
-            borrower_id=borrower_id,
-            booking_point_id=booking_data.booking_point_id,
-            status=BookingStatus.TAKEN,  # Сразу статус "взято"
-            planned_pickup_date=booking_data.planned_pickup_date,
-            actual_pickup_date=datetime.utcnow(),  # Устанавливаем дату взятия
-            planned_return_date=booking_data.planned_return_date,
-            notes=booking_data.notes,
+                detail="Нельзя бронировать собственную книгу",
+            )
+
+        return HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Книга недоступна для бронирования",
         )
 
-        self.db.add(db_booking)
+    @cached_method(booking_points_cache, key=lambda: "active")
+    def get_booking_points(self) -> List[dict]:
+        """Получение активных пунктов выдачи (сериализованных, из кэша)"""
+        booking_points = (
+            self.db.query(BookingPoint).filter(BookingPoint.is_active == True).all()
+        )
+        return [
+            BookingPointResponse.model_validate(point).model_dump(mode="json")
+            for point in booking_points
+        ]
+
+    def get_nearby_booking_points(
+        self, lat: float, lng: float, k: int, radius_km: float
+    ) -> List[dict]:
+        """k ближайших активных пунктов выдачи в радиусе (по индексу в памяти)"""
+        index = booking_points_index.get(self.get_booking_points())
+        return [
+            {**booking_points_index.by_id[point_id], "distance_km": round(distance, 3)}
+            for point_id, distance in index.nearest(lat, lng, k, radius_km)
+        ]
+
+    @cached_method(booking_points_cache, key=lambda: "hours")
+    def get_booking_point_hours(self) -> Dict[str, int]:
+        """
+        Битовые карты часов работы активных пунктов (из кэша)
+
+        Карта хранится числом: пункт открыт в 15-минутный интервал недели
+        slot, если установлен бит mask >> slot & 1.
+        """
+        rows = (
+            self.db.query(BookingPoint.id, BookingPoint.working_hours_bitmap)
+            .filter(
+                BookingPoint.is_active == True,
+                BookingPoint.working_hours_bitmap.isnot(None),
+            )
+            .all()
+        )
+        return {
+            str(point_id): int.from_bytes(bitmap, "little") for point_id, bitmap in rows
+        }
+
+    def get_open_booking_points(self, moment: datetime) -> List[dict]:
+        """Пункты выдачи, открытые в момент moment (местное время)"""
+        hours = self.get_booking_point_hours()
+        return [
+            point
+            for point in self.get_booking_points()
+            if is_open(hours.get(point["id"], 0), moment)
+        ]
+
+    def get_booking_point_slots(
+        self, booking_point_id: str, date_from: date, date_to: date
+    ) -> Optional[dict]:
+        """Загрузка пункта выдачи по дням периода [date_from, date_to)"""
+        point = (
+            self.db.query(BookingPoint.id, BookingPoint.daily_capacity)
+            .filter(BookingPoint.id == booking_point_id)
+            .first()
+        )
+        if not point:
+            return None
 
-        # Обновление доступности книги
-        book.is_available = False
-        book.updated_at = datetime.utcnow()
+        reserved = dict(
+            self.db.query(BookingPointSlot.slot_date, BookingPointSlot.reserved)
+            .filter(
+                BookingPointSlot.booking_point_id == booking_point_id,
+                BookingPointSlot.slot_date >= date_from,
+                BookingPointSlot.slot_date < date_to,
+            )
+            .all()
+        )
 
-        self.db.commit()
-        self.db.refresh(db_booking)
+        slots = []
+        for offset in range((date_to - date_from).days):
+            day = date_from + timedelta(days=offset)
+            day_reserved = reserved.get(day, 0)
+            slots.append(
+                {
+                    "date": day,
+                    "reserved": day_reserved,
+                    "available": (
+                        None
+                        if point.daily_capacity is None
+                        else max(point.daily_capacity - day_reserved, 0)
+                    ),
+                }
+            )
 
-        return db_booking
+        return {
+            "booking_point_id": str(point.id),
+            "daily_capacity": point.daily_capacity,
+            "slots": slots,
+        }
 
     def get_booking_by_id(self, booking_id: str) -> Optional[Booking]:
         """Получение бронирования по ID"""
         return (
             self.db.query(Booking)
-            .options(
-                joinedload(Booking.book),
-                joinedload(Booking.borrower),
-                joinedload(Booking.booking_point),
-            )
+            .options(*loader_options("booking_detail"))
             .filter(Booking.id == booking_id)
             .first()
         )
@@ -124,12 +422,8 @@ class BookingService:
     def get_user_bookings(
         self, user_id: str, search_params: BookingSearchParams
     ) -> Tuple[List[Booking], int]:
-        """Получение бронирований пользователя"""
-        query = self.db.query(Booking).options(
-            joinedload(Booking.book),
-            joinedload(Booking.borrower),
-            joinedload(Booking.booking_point),
-        )
+        """Получение бронирований пользователя (связи подгружаются через RequestLoaders)"""
+        query = self.db.query(Booking).options(*loader_options("booking_list"))
 
         # Фильтр по пользователю
         if search_params.as_borrower and search_params.as_owner:
@@ -159,201 +453,381 @@ class BookingService:
         return bookings, total
 
     def update_booking_status(
-        self, booking_id: str, new_status: BookingStatus, user_id: str
+        self,
+        booking_id: str,
+        new_status: BookingStatus,
+        user_id: str,
+        expected_versions: Optional[Collection[int]] = None,
     ) -> Optional[Booking]:
         """Обновление статуса бронирования"""
-        booking = self.get_booking_by_id(booking_id)
-        if not booking:
-            return None
-
-        # Получение книги для проверки прав
-        book = self.db.query(Book).filter(Book.id == booking.book_id).first()
-        if not book:
-            return None
-
-        # Проверка прав (владелец книги или заемщик)
-        if book.owner_id != user_id and booking.borrower_id != user_id:
+        action = STATUS_UPDATE_ACTIONS.get(new_status)
+        if action is None:
             raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Нет прав для изменения статуса этого бронирования",
-            )
-
-        # Логика изменения статуса
-        old_status = booking.status
-
-        # Владелец может подтвердить или отменить
-        if book.owner_id == user_id:
-            if (
-                new_status == BookingStatus.CONFIRMED
-                and old_status == BookingStatus.PENDING
-            ):
-                booking.status = new_status
-            elif new_status == BookingStatus.CANCELLED and old_status in [
-                BookingStatus.PENDING,
-                BookingStatus.CONFIRMED,
-            ]:
-                booking.status = new_status
-                # Возвращаем доступность книги
-                book.is_available = True
-                book.updated_at = datetime.utcnow()
-            else:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Недопустимое изменение статуса",
-                )
-
-        # Заемщик может отменить только pending бронирование
-        elif booking.borrower_id == user_id:
-            if (
-                new_status == BookingStatus.CANCELLED
-                and old_status == BookingStatus.PENDING
-            ):
-                booking.status = new_status
-                # Возвращаем доступность книги
-                book.is_available = True
-                book.updated_at = datetime.utcnow()
-            else:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Недопустимое изменение статуса",
-                )
-
-        booking.updated_at = datetime.utcnow()
-        self.db.commit()
-        self.db.refresh(booking)
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Недопустимое изменение статуса",
+            )
 
-        return booking
+        return self._apply_transition(action, booking_id, user_id, expected_versions)
 
-    def confirm_pickup(self, booking_id: str, user_id: str) -> Optional[Booking]:
+    def confirm_pickup(
+        self,
+        booking_id: str,
+        user_id: str,
+        expected_versions: Optional[Collection[int]] = None,
+    ) -> Optional[Booking]:
         """Подтверждение получения книги"""
-        booking = self.get_booking_by_id(booking_id)
-        if not booking:
-            return None
+        return self._apply_transition("pickup", booking_id, user_id, expected_versions)
 
-        # Только заемщик может подтвердить получение
-        if booking.borrower_id != user_id:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Только заемщик может подтвердить получение книги",
-            )
+    def confirm_return(
+        self,
+        booking_id: str,
+        user_id: str,
+        expected_versions: Optional[Collection[int]] = None,
+    ) -> Optional[Booking]:
+        """Подтверждение возврата книги"""
+        return self._apply_transition("return", booking_id, user_id, expected_versions)
+
+    def cancel_booking(
+        self,
+        booking_id: str,
+        user_id: str,
+        expected_versions: Optional[Collection[int]] = None,
+    ) -> bool:
+        """Отмена бронирования"""
+        self._apply_transition("withdraw", booking_id, user_id, expected_versions)
+        return True
 
-        if booking.status != BookingStatus.CONFIRMED:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Бронирование должно быть подтверждено владельцем",
-            )
+    def return_book(self, booking_id: str, user_id: str) -> bool:
+        """Возврат книги"""
+        self._apply_transition("return", booking_id, user_id)
+        return True
 
-        booking.status = BookingStatus.TAKEN
-        booking.actual_pickup_date = datetime.utcnow()
-        booking.updated_at = datetime.utcnow()
+    def _apply_transition(
+        self,
+        action: str,
+        booking_id: str,
+        user_id: str,
+        expected_versions: Optional[Collection[int]] = None,
+    ) -> Booking:
+        """
+        Выполнение перехода статуса по таблице BOOKING_TRANSITIONS
+
+        Бронирование обновляется одним запросом UPDATE ... WHERE status IN (...)
+        с проверкой роли пользователя и версии из If-Match, доступность книги
+        и передача первому в очереди ожидания - в том же запросе. Если условие
+        не выполнилось, причина выясняется отдельно.
+        """
+        transition = BOOKING_TRANSITIONS[action]
+        booking = run_in_transaction(
+            self.db,
+            self._execute_transition,
+            transition,
+            booking_id,
+            user_id,
+            expected_versions,
+        )
 
-        self.db.commit()
-        self.db.refresh(booking)
+        catalog_cache.invalidate(CATALOG_TAG, book_tag(booking.book_id))
 
         return booking
 
-    def confirm_return(self, booking_id: str, user_id: str) -> Optional[Booking]:
-        """Подтверждение возврата книги"""
-        booking = self.get_booking_by_id(booking_id)
-        if not booking:
-            return None
-
-        # Только заемщик может подтвердить возврат
-        if booking.borrower_id != user_id:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Только заемщик может подтвердить возврат книги",
+    def _execute_transition(
+        self,
+        transition: Transition,
+        booking_id: str,
+        user_id: str,
+        expected_versions: Optional[Collection[int]],
+    ) -> Booking:
+        """Условное обновление бронирования и книги одним запросом"""
+        now = datetime.utcnow()
+        actor_conditions = {
+            Actor.OWNER: Book.owner_id == user_id,
+            Actor.BORROWER: Booking.borrower_id == user_id,
+        }
+        guard = or_(
+            *(
+                and_(actor_conditions[actor], Booking.status.in_(statuses))
+                for actor, statuses in transition.allowed_from.items()
             )
+        )
 
-        if booking.status != BookingStatus.TAKEN:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Книга должна быть получена перед возвратом",
+        if expected_versions is not None:
+            guard = and_(guard, Booking.version_id.in_(list(expected_versions)))
+        if transition.requires_book_available:
+            guard = and_(guard, Book.is_available == True)
+
+        values = {
+            Booking.status: transition.to_status,
+            Booking.updated_at: now,
+            Booking.version_id: Booking.version_id + 1,
+        }
+        if transition.timestamp_field:
+            values[getattr(Booking, transition.timestamp_field)] = now
+
+        updated = (
+            update(Booking)
+            .where(Booking.id == booking_id, Booking.book_id == Book.id, guard)
+            .values(values)
+            .returning(*Booking.__table__.c)
+            .cte("updated")
+        )
+        statement = select(updated)
+        if transition.book_available is not None:
+            statement = statement.add_cte(
+                update(Book)
+                .where(Book.id == updated.c.book_id)
+                .values(
+                    is_available=transition.book_available,
+                    updated_at=now,
+                    version_id=Book.version_id + 1,
+                )
+                .cte("book_update")
+            )
+        if transition.releases_slot:
+            # Слот выдачи освобождается для других бронирований на эту дату
+            statement = statement.add_cte(
+                update(BookingPointSlot)
+                .where(
+                    BookingPointSlot.booking_point_id == updated.c.booking_point_id,
+                    BookingPointSlot.slot_date == updated.c.planned_pickup_date,
+                    BookingPointSlot.reserved > 0,
+                )
+                .values(reserved=BookingPointSlot.reserved - 1)
+                .cte("slot_release")
+            )
+        handoff = []
+        if transition.notify_waitlist:
+            popped, notified = waitlist_handoff(select(updated.c.book_id), now)
+            # Уведомление первому в очереди (не больше одного) - в той же строке
+            events = notification_events(notified)
+            handoff = [events.c[field].label(f"event_{field}") for field in NOTIFICATION_EVENT_FIELDS]
+            statement = (
+                statement.add_cte(
+                    popped, notified, unread_counter_increment("waitlist_unread", notified)
+                )
+                .outerjoin(events, true())
+                .add_columns(*handoff)
+            )
+        if transition.event is not None:
+            statement = statement.add_cte(
+                outbox_event(transition.event, select(updated.c.id), now, "booking_event")
             )
 
-        booking.status = BookingStatus.RETURNED
-        booking.actual_return_date = datetime.utcnow()
-        booking.updated_at = datetime.utcnow()
+        row = self.db.execute(
+            select(Booking, *handoff)
+            .from_statement(statement)
+            .execution_options(populate_existing=True)
+        ).one_or_none()
 
-        # Возвращаем доступность книги
-        book = self.db.query(Book).filter(Book.id == booking.book_id).first()
-        if book:
-            book.is_available = True
-            book.updated_at = datetime.utcnow()
+        if row is None:
+            raise self._transition_error(
+                transition, booking_id, user_id, expected_versions
+            )
 
-        self.db.commit()
-        self.db.refresh(booking)
+        booking, *event = row
+        if event and event[0] is not None:
+            queue_notification_events(self.db, [dict(zip(NOTIFICATION_EVENT_FIELDS, event))])
 
         return booking
 
-    def cancel_booking(self, booking_id: str, user_id: str) -> bool:
-        """Отмена бронирования"""
-        booking = self.get_booking_by_id(booking_id)
-        if not booking:
-            return False
+    def _transition_error(
+        self,
+        transition: Transition,
+        booking_id: str,
+        user_id: str,
+        expected_versions: Optional[Collection[int]],
+    ) -> HTTPException:
+        """Причина отказа в переходе (запрашивается только при отказе)"""
+        row = (
+            self.db.query(
+                Booking.borrower_id,
+                Booking.status,
+                Booking.version_id,
+                Book.owner_id,
+                Book.is_available,
+            )
+            .join(Book, Booking.book_id == Book.id)
+            .filter(Booking.id == booking_id)
+            .first()
+        )
+        if not row:
+            return HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Бронирование не найдено"
+            )
 
-        # Проверка прав
-        book = self.db.query(Book).filter(Book.id == booking.book_id).first()
-        if not book:
-            return False
+        if str(row.owner_id) == str(user_id):
+            actor = Actor.OWNER
+        elif str(row.borrower_id) == str(user_id):
+            actor = Actor.BORROWER
+        else:
+            actor = None
 
-        if book.owner_id != user_id and booking.borrower_id != user_id:
-            raise HTTPException(
+        if actor not in transition.allowed_from:
+            return HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
-                detail="Нет прав для отмены этого бронирования",
+                detail=transition.forbidden_detail,
             )
 
-        # Можно отменить только pending или confirmed бронирования
-        if booking.status not in [BookingStatus.PENDING, BookingStatus.CONFIRMED]:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Невозможно отменить бронирование в текущем статусе",
+        if expected_versions is not None and row.version_id not in expected_versions:
+            return precondition_failed()
+
+        if (
+            transition.requires_book_available
+            and not row.is_available
+            and row.status in transition.allowed_from[actor]
+        ):
+            return HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Книга еще не возвращена предыдущим заемщиком",
             )
 
-        booking.status = BookingStatus.CANCELLED
-        booking.updated_at = datetime.utcnow()
-
-        # Возвращаем доступность книги
-        book.is_available = True
-        book.updated_at = datetime.utcnow()
+        # Роль подходит, но статус уже не тот, что ожидает переход
+        return HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail=transition.conflict_detail
+        )
 
-        self.db.commit()
+    def get_taken_booking_ids(
+        self,
+        return_date: date,
+        id_from: Optional[str],
+        id_to: Optional[str],
+        limit: int,
+        after: Optional[str] = None,
+    ) -> List:
+        """
+        Пакет id выданных бронирований со сроком возврата return_date
+
+        Диапазон [id_from, id_to) задает часть для параллельной обработки,
+        after - последний id предыдущего пакета. Запрос обслуживает индекс
+        (status, planned_return_date, id).
+        """
+        query = select(Booking.id).where(
+            Booking.status == BookingStatus.TAKEN,
+            Booking.planned_return_date == return_date,
+        )
+        if id_from is not None:
+            query = query.where(Booking.id >= id_from)
+        if id_to is not None:
+            query = query.where(Booking.id < id_to)
+        if after is not None:
+            query = query.where(Booking.id > after)
+        return self.db.scalars(query.order_by(Booking.id).limit(limit)).all()
+
+    def expire_stale_bookings(self, today: date, limit: int) -> int:
+        """
+        Отмена бронирований, которые не забрали к планируемой дате
+
+        Один пакет - один запрос: до limit бронирований PENDING/CONFIRMED
+        с planned_pickup_date < today (индекс status, planned_pickup_date)
+        отменяются, книги без выданных бронирований снова становятся
+        доступны, заемщику и владельцу создаются уведомления. Строки,
+        заблокированные другими транзакциями, пропускаются до следующего
+        пакета. Возвращает количество отмененных бронирований.
+        """
+        book_ids = run_in_transaction(self.db, self._expire_batch, today, limit)
+
+        if book_ids:
+            catalog_cache.invalidate(
+                CATALOG_TAG, *(book_tag(book_id) for book_id in set(book_ids))
+            )
 
-        return True
+        return len(book_ids)
 
-    def return_book(self, booking_id: str, user_id: str) -> bool:
-        """Возврат книги"""
-        booking = self.get_booking_by_id(booking_id)
-        if not booking:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="Бронирование не найдено"
+    def _expire_batch(self, today: date, limit: int) -> List:
+        """Отмена пакета просроченных бронирований одним запросом"""
+        now = datetime.utcnow()
+        stale = (
+            select(Booking.id)
+            .where(
+                Booking.status.in_((BookingStatus.PENDING, BookingStatus.CONFIRMED)),
+                Booking.planned_pickup_date < today,
             )
-
-        # Проверка прав - только заемщик может вернуть книгу
-        if str(booking.borrower_id) != str(user_id):
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Нет прав для возврата этой книги",
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .cte("stale")
+        )
+        expired = (
+            update(Booking)
+            .where(Booking.id.in_(select(stale.c.id)))
+            .values(
+                status=BookingStatus.CANCELLED,
+                updated_at=now,
+                version_id=Booking.version_id + 1,
             )
+            .returning(Booking.id, Booking.book_id, Booking.borrower_id)
+            .cte("expired")
+        )
 
-        # Можно вернуть только взятые книги
-        if booking.status != BookingStatus.TAKEN:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Книга не была взята или уже возвращена",
+        # Книга освобождается, если она не выдана по другому бронированию
+        taken = aliased(Booking)
+        freed = (
+            update(Book)
+            .where(
+                Book.id.in_(select(expired.c.book_id)),
+                Book.is_available == False,
+                ~exists().where(
+                    taken.book_id == Book.id, taken.status == BookingStatus.TAKEN
+                ),
             )
+            .values(is_available=True, updated_at=now, version_id=Book.version_id + 1)
+            .returning(Book.id)
+            .cte("freed")
+        )
+        # Освобожденная книга передается первому в очереди ожидания
+        popped, handed_off = waitlist_handoff(select(freed.c.id), now)
 
-        # Обновляем статус бронирования
-        booking.status = BookingStatus.RETURNED
-        booking.actual_return_date = datetime.utcnow()
-        booking.updated_at = datetime.utcnow()
-
-        # Возвращаем доступность книги
-        book = self.db.query(Book).filter(Book.id == booking.book_id).first()
-        if book:
-            book.is_available = True
-            book.updated_at = datetime.utcnow()
-
-        self.db.commit()
+        message = func.concat(
+            "Бронирование книги '", Book.title, "' отменено: книгу не забрали в срок"
+        )
+        recipients = [
+            select(
+                func.gen_random_uuid(),
+                recipient,
+                expired.c.id,
+                # UNION ALL выводит тип литерала как text - нужен явный CAST
+                cast(
+                    literal(NotificationType.BOOKING_CANCELLED, Notification.type.type),
+                    Notification.type.type,
+                ),
+                literal("Бронирование истекло"),
+                message,
+                false(),
+                literal(now, Notification.created_at.type),
+            ).join_from(expired, Book, Book.id == expired.c.book_id)
+            for recipient in (expired.c.borrower_id, Book.owner_id)
+        ]
+        notified = (
+            insert(Notification)
+            .from_select(
+                [
+                    Notification.id,
+                    Notification.user_id,
+                    Notification.booking_id,
+                    Notification.type,
+                    Notification.title,
+                    Notification.message,
+                    Notification.is_read,
+                    Notification.created_at,
+                ],
+                union_all(*recipients),
+            )
+            .returning(*(getattr(Notification, field) for field in NOTIFICATION_EVENT_FIELDS))
+            .cte("expired_notifications")
+        )
+        unread = unread_counter_increment("expired_unread", notified, handed_off)
+
+        # Отмененные бронирования и созданные уведомления - строки одного
+        # результата (FULL JOIN ON false дополняет каждую сторону NULL)
+        events = notification_events(notified, handed_off)
+        rows = (
+            self.db.execute(
+                select(expired.c.book_id, *events.c)
+                .select_from(expired.join(events, false(), full=True))
+                .add_cte(freed, popped, handed_off, notified, unread)
+            )
+            .mappings()
+            .all()
+        )
+        queue_notification_events(self.db, (row for row in rows if row["id"] is not None))
 
-        return True
+        return [row["book_id"] for row in rows if row["book_id"] is not None]
@@ -0,0 +1,98 @@
+"""
+Таблица переходов статусов бронирования
+"""
+
+import enum
+from typing import Dict, NamedTuple, Optional, Tuple
+from app.models.booking import BookingStatus
+from app.models.outbox import OutboxEventType
+
+
+class Actor(str, enum.Enum):
+    """Роль пользователя в бронировании"""
+
+    OWNER = "owner"  # владелец книги
+    BORROWER = "borrower"  # заемщик
+
+
+class Transition(NamedTuple):
+    """
+    Переход статуса бронирования
+
+    allowed_from - из каких статусов переход разрешен каждой роли;
+    book_available - новое значение Book.is_available (None - не меняется);
+    requires_book_available - переход возможен, только если книга не на руках;
+    notify_waitlist - книга освобождается и передается первому в очереди ожидания;
+    releases_slot - освобождается слот выдачи пункта на дату получения;
+    event - исходящее событие, записываемое в той же транзакции (outbox);
+    timestamp_field - поле бронирования, в которое записывается время перехода.
+    """
+
+    to_status: BookingStatus
+    allowed_from: Dict[Actor, Tuple[BookingStatus, ...]]
+    book_available: Optional[bool] = None
+    requires_book_available: bool = False
+    notify_waitlist: bool = False
+    releases_slot: bool = False
+    event: Optional[OutboxEventType] = None
+    timestamp_field: Optional[str] = None
+    forbidden_detail: str = "Нет прав для изменения статуса этого бронирования"
+    conflict_detail: str = "Недопустимое изменение статуса"
+
+
+BOOKING_TRANSITIONS: Dict[str, Transition] = {
+    # Владелец подтверждает бронирование
+    "confirm": Transition(
+        to_status=BookingStatus.CONFIRMED,
+        allowed_from={Actor.OWNER: (BookingStatus.PENDING,)},
+    ),
+    # Отмена через смену статуса: заемщик - только до подтверждения.
+    # Книга до получения не на руках, поэтому доступность не меняется
+    "cancel": Transition(
+        to_status=BookingStatus.CANCELLED,
+        allowed_from={
+            Actor.OWNER: (BookingStatus.PENDING, BookingStatus.CONFIRMED),
+            Actor.BORROWER: (BookingStatus.PENDING,),
+        },
+        releases_slot=True,
+        event=OutboxEventType.BOOKING_CANCELLED,
+    ),
+    # Отмена (удаление) бронирования любой из сторон
+    "withdraw": Transition(
+        to_status=BookingStatus.CANCELLED,
+        allowed_from={
+            Actor.OWNER: (BookingStatus.PENDING, BookingStatus.CONFIRMED),
+            Actor.BORROWER: (BookingStatus.PENDING, BookingStatus.CONFIRMED),
+        },
+        releases_slot=True,
+        event=OutboxEventType.BOOKING_CANCELLED,
+        forbidden_detail="Нет прав для отмены этого бронирования",
+        conflict_detail="Невозможно отменить бронирование в текущем статусе",
+    ),
+    # Заемщик получил книгу по подтвержденному бронированию
+    "pickup": Transition(
+        to_status=BookingStatus.TAKEN,
+        allowed_from={Actor.BORROWER: (BookingStatus.CONFIRMED,)},
+        book_available=False,
+        requires_book_available=True,
+        timestamp_field="actual_pickup_date",
+        forbidden_detail="Только заемщик может подтвердить получение книги",
+        conflict_detail="Бронирование должно быть подтверждено владельцем",
+    ),
+    # Заемщик вернул книгу
+    "return": Transition(
+        to_status=BookingStatus.RETURNED,
+        allowed_from={Actor.BORROWER: (BookingStatus.TAKEN,)},
+        book_available=True,
+        notify_waitlist=True,
+        timestamp_field="actual_return_date",
+        forbidden_detail="Только заемщик может подтвердить возврат книги",
+        conflict_detail="Книга должна быть получена перед возвратом",
+    ),
+}
+
+# Действие, выполняемое при смене статуса через PUT /bookings/{id}/status
+STATUS_UPDATE_ACTIONS: Dict[BookingStatus, str] = {
+    BookingStatus.CONFIRMED: "confirm",
+    BookingStatus.CANCELLED: "cancel",
+}
@@ -0,0 +1,175 @@
+"""
+Сервис секций таблицы уведомлений
+"""
+
+import re
+from datetime import date, datetime
+from typing import List
+from sqlalchemy import func, select, text
+from sqlalchemy.orm import Session
+from app.models.notification import ARCHIVE_PARTITION, DEFAULT_PARTITION, Notification
+
+PARTITION_PREFIX = "notifications_p"
+_PARTITION_NAME = re.compile(rf"^{PARTITION_PREFIX}(\d{{4}})(\d{{2}})$")
+# Явный список колонок для переноса строк между секциями
+_COLUMNS = ", ".join(column.name for column in Notification.__table__.columns)
+# Обслуживание секций выполняется одним процессом одновременно
+_MAINTENANCE_LOCK = "notification_partitions"
+
+
+def month_start(day: date) -> datetime:
+    """Начало месяца, в который попадает day"""
+    return datetime(day.year, day.month, 1)
+
+
+def add_months(start: datetime, months: int) -> datetime:
+    """Начало месяца через months месяцев после start"""
+    month = start.year * 12 + start.month - 1 + months
+    return datetime(month // 12, month % 12 + 1, 1)
+
+
+def partition_name(start: datetime) -> str:
+    """Имя месячной секции: notifications_pYYYYMM"""
+    return f"{PARTITION_PREFIX}{start:%Y%m}"
+
+
+class NotificationPartitionService:
+    """
+    Месячные секции таблицы notifications
+
+    Секции создаются заранее задачей create_notification_partitions, старые
+    секции удаляются целиком (DROP TABLE вместо DELETE по строкам).
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _lock(self) -> None:
+        self.db.execute(
+            select(func.pg_advisory_xact_lock(func.hashtext(_MAINTENANCE_LOCK)))
+        )
+
+    def list_partitions(self) -> List[datetime]:
+        """Начала месяцев существующих месячных секций по возрастанию"""
+        names = self.db.scalars(
+            text(
+                "SELECT c.relname FROM pg_inherits i "
+                "JOIN pg_class c ON c.oid = i.inhrelid "
+                "WHERE i.inhparent = 'notifications'::regclass"
+            )
+        )
+        starts = []
+        for name in names:
+            match = _PARTITION_NAME.match(name)
+            if match:
+                starts.append(datetime(int(match.group(1)), int(match.group(2)), 1))
+        return sorted(starts)
+
+    def _create_partition(self, start: datetime) -> str:
+        """
+        Создание секции месяца start
+
+        Секция создается отдельной таблицей и присоединяется через ATTACH
+        PARTITION: строки этого месяца, попавшие в секцию по умолчанию
+        (секция не была создана вовремя), переносятся в новую таблицу,
+        иначе присоединение было бы невозможно.
+        """
+        end = add_months(start, 1)
+        name = partition_name(start)
+        self.db.execute(text(f"CREATE TABLE {name} (LIKE notifications INCLUDING DEFAULTS)"))
+        self.db.execute(
+            text(
+                f"WITH moved AS ("
+                f"DELETE FROM {DEFAULT_PARTITION} "
+                f"WHERE created_at >= :start AND created_at < :end "
+                f"RETURNING {_COLUMNS}) "
+                f"INSERT INTO {name} ({_COLUMNS}) SELECT {_COLUMNS} FROM moved"
+            ),
+            {"start": start, "end": end},
+        )
+        self.db.execute(
+            text(
+                f"ALTER TABLE notifications ATTACH PARTITION {name} "
+                f"FOR VALUES FROM ('{start.isoformat(' ')}') TO ('{end.isoformat(' ')}')"
+            )
+        )
+        return name
+
+    def ensure_partitions(self, today: date, months_ahead: int) -> List[str]:
+        """Секции текущего месяца и months_ahead следующих; возвращает созданные"""
+        self._lock()
+        existing = set(self.list_partitions())
+        created = []
+        for offset in range(months_ahead + 1):
+            start = add_months(month_start(today), offset)
+            if start not in existing:
+                created.append(self._create_partition(start))
+        self.db.commit()
+        return created
+
+    def drop_expired_partitions(self, cutoff: datetime) -> List[str]:
+        """
+        Удаление секций, целиком старше cutoff
+
+        Непрочитанные уведомления не удаляются и не меняются: секция
+        отсоединяется, ее непрочитанные строки переносятся как есть в архивную
+        секцию, затем таблица удаляется. Архивная секция присоединяется заново
+        с диапазоном до конца удаленного месяца, поэтому created_at остается
+        прежним - порядок ленты, курсоры и Last-Event-ID не ломаются. Туда же
+        уходят непрочитанные строки этого диапазона из секции по умолчанию
+        (прочитанные удаляются): секция по умолчанию не растет, и ATTACH
+        PARTITION при создании новых секций проверяет ее быстро. Прочитанные
+        строки архива удаляются. Каждая секция - отдельная короткая транзакция.
+        """
+        dropped = []
+        self._lock()
+        for start in self.list_partitions():
+            end = add_months(start, 1)
+            if end > cutoff:
+                break
+            name = partition_name(start)
+            self.db.execute(text(f"ALTER TABLE notifications DETACH PARTITION {name}"))
+            self._detach_archive()
+            self.db.execute(
+                text(
+                    f"INSERT INTO {ARCHIVE_PARTITION} ({_COLUMNS}) "
+                    f"SELECT {_COLUMNS} FROM {name} WHERE NOT is_read"
+                )
+            )
+            self.db.execute(
+                text(
+                    f"WITH moved AS ("
+                    f"DELETE FROM {DEFAULT_PARTITION} "
+                    f"WHERE created_at < :end "
+                    f"RETURNING {_COLUMNS}) "
+                    f"INSERT INTO {ARCHIVE_PARTITION} ({_COLUMNS}) "
+                    f"SELECT {_COLUMNS} FROM moved WHERE NOT is_read"
+                ),
+                {"end": end},
+            )
+            self.db.execute(text(f"DROP TABLE {name}"))
+            self.db.execute(
+                text(
+                    f"ALTER TABLE notifications ATTACH PARTITION {ARCHIVE_PARTITION} "
+                    f"FOR VALUES FROM (MINVALUE) TO ('{end.isoformat(' ')}')"
+                )
+            )
+            self.db.commit()
+            dropped.append(name)
+            self._lock()
+
+        if self.db.scalar(select(func.to_regclass(ARCHIVE_PARTITION))) is not None:
+            self.db.execute(text(f"DELETE FROM {ARCHIVE_PARTITION} WHERE is_read"))
+        self.db.commit()
+        return dropped
+
+    def _detach_archive(self) -> None:
+        """Отсоединение архивной секции (создается при первом удалении)"""
+        if self.db.scalar(select(func.to_regclass(ARCHIVE_PARTITION))) is None:
+            self.db.execute(
+                text(f"CREATE TABLE {ARCHIVE_PARTITION} (LIKE notifications INCLUDING DEFAULTS)")
+            )
+        else:
+            self.db.execute(
+                text(f"ALTER TABLE notifications DETACH PARTITION {ARCHIVE_PARTITION}")
+            )
@@ -2,13 +2,153 @@
 Сервис для работы с уведомлениями
 """
 
-from typing import List, Optional
-from datetime import datetime, timedelta
+import uuid
+from collections import Counter
+from itertools import islice
+from typing import Collection, Dict, Iterable, List, NamedTuple, Optional, Tuple
+from datetime import date, datetime, timedelta
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, desc
-from app.models.notification import Notification, NotificationType
+from sqlalchemy import (
+    Integer,
+    and_,
+    column,
+    delete,
+    desc,
+    event,
+    false,
+    func,
+    insert,
+    literal,
+    select,
+    text,
+    tuple_,
+    union_all,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import UUID, insert as pg_insert
+from app.core.database import run_in_transaction
+from app.core.notification_stream import notification_broker
+from app.models.notification import (
+    DEFAULT_PARTITION,
+    Notification,
+    NotificationDedup,
+    NotificationType,
+)
 from app.models.user import User
+from app.models.book import Book
 from app.models.booking import Booking
+from app.services.booking_escalation import EscalationStep
+from app.services.booking_transitions import Actor
+from app.services.notification_partitions import NotificationPartitionService
+
+# Строк в одном многострочном INSERT (9 параметров на строку при лимите
+# 65535 параметров запроса)
+BULK_INSERT_BATCH_SIZE = 1000
+
+
+# Поля события потока уведомлений
+NOTIFICATION_EVENT_FIELDS = (
+    "id",
+    "user_id",
+    "booking_id",
+    "type",
+    "title",
+    "message",
+    "is_read",
+    "created_at",
+)
+PENDING_EVENTS_KEY = "notification_events"
+
+
+def queue_notification_events(session: Session, rows: Iterable[dict]) -> None:
+    """
+    Отложенная публикация событий о созданных уведомлениях
+
+    События хранятся в session.info и публикуются после commit, при
+    откате отбрасываются: клиент не увидит уведомление, которого нет в базе.
+    """
+    pending = session.info.setdefault(PENDING_EVENTS_KEY, [])
+    pending.extend({field: row[field] for field in NOTIFICATION_EVENT_FIELDS} for row in rows)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_notification_events(session, flush_context):
+    """Уведомления, добавленные через ORM (session.add)"""
+    queue_notification_events(
+        session,
+        (
+            {field: getattr(obj, field) for field in NOTIFICATION_EVENT_FIELDS}
+            for obj in session.new
+            if isinstance(obj, Notification)
+        ),
+    )
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_notification_events(session):
+    events = session.info.pop(PENDING_EVENTS_KEY, None)
+    if events:
+        notification_broker.publish(events)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_notification_events(session):
+    session.info.pop(PENDING_EVENTS_KEY, None)
+
+
+def unread_counter_increment(name: str, *notified):
+    """
+    CTE увеличения счетчиков непрочитанных по строкам notified
+
+    notified - CTE вставки уведомлений с RETURNING user_id. Добавляется
+    в тот же запрос, что и вставка, - счетчик меняется атомарно с ней.
+    Несколько вставок одного запроса учитываются одним CTE: два UPDATE
+    одной строки пользователя в одном запросе потеряли бы одно из них.
+    """
+    recipients = union_all(*(select(cte.c.user_id) for cte in notified)).subquery()
+    added = (
+        select(recipients.c.user_id, func.count().label("added"))
+        .group_by(recipients.c.user_id)
+        .subquery()
+    )
+    return (
+        update(User)
+        .where(User.id == added.c.user_id)
+        .values(
+            unread_notifications_count=User.unread_notifications_count + added.c.added,
+            # Счетчик не меняет профиль: updated_at участвует в ETag каталога
+            updated_at=User.updated_at,
+        )
+        .cte(name)
+    )
+
+
+def notification_events(*notified):
+    """
+    Подзапрос событий потока по CTE вставки уведомлений
+
+    notified - CTE с RETURNING полей NOTIFICATION_EVENT_FIELDS. Строки
+    выбираются в том же запросе, что и вставка, и передаются
+    в queue_notification_events.
+    """
+    return union_all(
+        *(
+            select(*(cte.c[field] for field in NOTIFICATION_EVENT_FIELDS))
+            for cte in notified
+        )
+    ).subquery("notification_events")
+
+
+class NotificationDraft(NamedTuple):
+    """Данные уведомления для массовой вставки"""
+
+    user_id: str
+    notification_type: NotificationType
+    title: str
+    message: str
+    booking_id: Optional[str] = None
+    scheduled_for: Optional[date] = None
 
 
 class NotificationService:
@@ -35,52 +175,268 @@ class NotificationService:
         )
 
         self.db.add(notification)
+        self._add_unread({user_id: 1})
         self.db.commit()
         self.db.refresh(notification)
 
         return notification
 
+    def _add_unread(self, deltas: Dict) -> None:
+        """
+        Изменение счетчиков непрочитанных в текущей транзакции
+
+        Строки пользователей блокируются в порядке id: одновременные
+        массовые рассылки не взаимоблокируются.
+        """
+        deltas = {uuid.UUID(str(user_id)): delta for user_id, delta in deltas.items() if delta}
+        if not deltas:
+            return
+
+        user_ids = sorted(deltas)
+        self.db.execute(
+            select(User.id).where(User.id.in_(user_ids)).order_by(User.id).with_for_update()
+        )
+        changes = values(
+            column("user_id", UUID(as_uuid=True)),
+            column("delta", Integer),
+            name="unread_delta",
+        ).data([(user_id, deltas[user_id]) for user_id in user_ids])
+        self.db.execute(
+            update(User)
+            .where(User.id == changes.c.user_id)
+            .values(
+                unread_notifications_count=User.unread_notifications_count
+                + changes.c.delta,
+                updated_at=User.updated_at,
+            )
+        )
+
+    def create_notifications_bulk(
+        self, drafts: Iterable[NotificationDraft]
+    ) -> List[uuid.UUID]:
+        """
+        Массовое создание уведомлений в одной транзакции
+
+        Строки передаются пакетами по BULK_INSERT_BATCH_SIZE, драйвер
+        отправляет их многострочными INSERT (insertmanyvalues), идентификаторы
+        генерируются на клиенте и возвращаются через RETURNING без refresh.
+        Плановые уведомления (scheduled_for), уже созданные на ту же дату,
+        пропускаются. Возвращает идентификаторы созданных уведомлений.
+        """
+        drafts = iter(drafts)
+        now = None
+        created: List[uuid.UUID] = []
+
+        while True:
+            batch = list(islice(drafts, BULK_INSERT_BATCH_SIZE))
+            if not batch:
+                break
+            # Порядок событий потока совпадает с порядком (created_at, id),
+            # по которому догружаются пропущенные: время пакетов строго
+            # возрастает, строки пакета упорядочены по id
+            now = datetime.utcnow() if now is None else max(
+                datetime.utcnow(), now + timedelta(microseconds=1)
+            )
+            rows = [
+                {
+                    "id": uuid.uuid4(),
+                    "user_id": draft.user_id,
+                    "booking_id": draft.booking_id,
+                    "type": draft.notification_type,
+                    "title": draft.title,
+                    "message": draft.message,
+                    "is_read": False,
+                    "scheduled_for": draft.scheduled_for,
+                    "created_at": now,
+                }
+                for draft in batch
+            ]
+            rows = self._claim_scheduled(rows)
+            if not rows:
+                continue
+            rows.sort(key=lambda row: row["id"])
+            inserted = self.db.execute(
+                insert(Notification).returning(Notification.id), rows
+            ).scalars().all()
+            rows_by_id = {row["id"]: row for row in rows}
+            queue_notification_events(
+                self.db, (rows_by_id[id_] for id_ in sorted(inserted))
+            )
+            self._add_unread(Counter(rows_by_id[id_]["user_id"] for id_ in inserted))
+            created.extend(inserted)
+
+        self.db.commit()
+        return created
+
+    def _claim_scheduled(self, rows: List[dict]) -> List[dict]:
+        """
+        Отбор плановых уведомлений, еще не созданных на свою дату
+
+        Отметки (booking_id, type, scheduled_for) вставляются в
+        notification_dedup; строки, чья отметка уже есть, отбрасываются.
+        Событийные уведомления (без scheduled_for) проходят без проверки.
+        """
+        keys = {
+            (row["booking_id"], row["type"], row["scheduled_for"])
+            for row in rows
+            if row["scheduled_for"] is not None and row["booking_id"] is not None
+        }
+        if not keys:
+            return rows
+
+        claimed = self.db.execute(
+            pg_insert(NotificationDedup)
+            .on_conflict_do_nothing()
+            .returning(
+                NotificationDedup.booking_id,
+                NotificationDedup.type,
+                NotificationDedup.scheduled_for,
+            ),
+            [
+                {"booking_id": booking_id, "type": type_, "scheduled_for": scheduled_for}
+                for booking_id, type_, scheduled_for in keys
+            ],
+        ).all()
+        claimed = {
+            (str(booking_id), type_, scheduled_for)
+            for booking_id, type_, scheduled_for in claimed
+        }
+        return [
+            row
+            for row in rows
+            if row["scheduled_for"] is None
+            or row["booking_id"] is None
+            or (str(row["booking_id"]), row["type"], row["scheduled_for"]) in claimed
+        ]
+
     def get_user_notifications(
-        self, user_id: str, limit: int = 50, offset: int = 0
+        self,
+        user_id: str,
+        limit: int = 50,
+        offset: int = 0,
+        before: Optional[Tuple[datetime, uuid.UUID]] = None,
     ) -> List[Notification]:
-        """Получение уведомлений пользователя"""
+        """
+        Получение уведомлений пользователя, новые первыми
+
+        before - курсор (created_at, id): уведомления старше него. Страница
+        читается диапазоном индекса (user_id, created_at, id).
+        """
+        query = self.db.query(Notification).filter(Notification.user_id == user_id)
+        if before is not None:
+            query = query.filter(
+                tuple_(Notification.created_at, Notification.id) < tuple_(*before)
+            )
         return (
-            self.db.query(Notification)
-            .filter(Notification.user_id == user_id)
-            .order_by(desc(Notification.created_at))
+            query.order_by(desc(Notification.created_at), desc(Notification.id))
             .offset(offset)
             .limit(limit)
             .all()
         )
 
-    def get_unread_count(self, user_id: str) -> int:
-        """Получение количества непрочитанных уведомлений"""
+    def get_notifications_since(
+        self, user_id: str, since: Tuple[datetime, uuid.UUID], limit: int
+    ) -> List[Notification]:
+        """
+        Уведомления новее курсора since (created_at, id), старые первыми
+
+        Дельта для клиента, который уже видел ленту до since: читаются
+        только новые строки индекса. Если новых больше limit, возвращаются
+        самые ранние, следующая дельта продолжит с последней из них.
+        """
         return (
             self.db.query(Notification)
             .filter(
-                and_(Notification.user_id == user_id, Notification.is_read == False)
+                Notification.user_id == user_id,
+                tuple_(Notification.created_at, Notification.id) > tuple_(*since),
             )
-            .count()
+            .order_by(Notification.created_at, Notification.id)
+            .limit(limit)
+            .all()
         )
 
-    def mark_as_read(self, notification_id: str, user_id: str) -> bool:
-        """Отметка уведомления как прочитанного"""
-        notification = (
+    def get_notifications_after(
+        self, user_id: str, last_id: uuid.UUID, limit: int
+    ) -> List[Notification]:
+        """
+        Уведомления, созданные после уведомления last_id (по created_at, id)
+
+        Используется для догрузки пропущенного при переподключении к потоку.
+        Если last_id не найден (например, удален очисткой), возвращает пустой список.
+        """
+        anchor = (
+            select(Notification.created_at)
+            .where(Notification.id == last_id, Notification.user_id == user_id)
+            .scalar_subquery()
+        )
+        return (
             self.db.query(Notification)
             .filter(
-                and_(
-                    Notification.id == notification_id, Notification.user_id == user_id
-                )
+                Notification.user_id == user_id,
+                tuple_(Notification.created_at, Notification.id)
+                > tuple_(anchor, last_id),
             )
-            .first()
+            .order_by(Notification.created_at, Notification.id)
+            .limit(limit)
+            .all()
         )
 
-        if not notification:
-            return False
+    def get_notifications_version(
+        self, user_id: str
+    ) -> Tuple[int, int, Optional[datetime]]:
+        """
+        Дешевая проверка версии ленты уведомлений
 
-        notification.is_read = True
-        self.db.commit()
+        Возвращает общее и непрочитанное количество и время последнего уведомления.
+        """
+        unread_count = (
+            select(User.unread_notifications_count)
+            .where(User.id == user_id)
+            .scalar_subquery()
+        )
+        total, unread, last_created = (
+            self.db.query(
+                func.count(Notification.id),
+                unread_count,
+                func.max(Notification.created_at),
+            )
+            .filter(Notification.user_id == user_id)
+            .one()
+        )
+        return total, unread, last_created
+
+    def get_unread_count(self, user_id: str) -> int:
+        """Количество непрочитанных уведомлений (счетчик пользователя)"""
+        return (
+            self.db.query(User.unread_notifications_count)
+            .filter(User.id == user_id)
+            .scalar()
+        ) or 0
+
+    def mark_as_read(self, notification_id: str, user_id: str) -> bool:
+        """Отметка уведомления как прочитанного"""
+        marked = self.db.execute(
+            update(Notification)
+            .where(
+                Notification.id == notification_id,
+                Notification.user_id == user_id,
+                Notification.is_read == False,
+            )
+            .values(is_read=True)
+        ).rowcount
+        if not marked:
+            # Уже прочитано или не существует
+            return (
+                self.db.query(Notification.id)
+                .filter(
+                    Notification.id == notification_id, Notification.user_id == user_id
+                )
+                .first()
+                is not None
+            )
 
+        self._add_unread({user_id: -marked})
+        self.db.commit()
         return True
 
     def mark_all_as_read(self, user_id: str) -> int:
@@ -93,109 +449,251 @@ class NotificationService:
             .update({"is_read": True})
         )
 
+        self._add_unread({user_id: -updated_count})
         self.db.commit()
         return updated_count
 
-    def create_booking_notification(self, booking: Booking) -> Notification:
-        """Создание уведомления о новом бронировании для владельца книги"""
-        book = (
-            self.db.query(Booking.book)
-            .join(Booking.book)
-            .filter(Booking.id == booking.id)
-            .first()
+    def _reconcile_unread_batch(
+        self, after: Optional[uuid.UUID], limit: int
+    ) -> Tuple[int, Optional[uuid.UUID]]:
+        """
+        Сверка счетчиков пакета пользователей с таблицей уведомлений
+
+        Строки пользователей блокируются до подсчета: одновременная вставка
+        уведомления либо уже видна подсчету, либо дождется commit и
+        увеличит исправленный счетчик.
+        """
+        query = select(User.id).order_by(User.id).limit(limit).with_for_update()
+        if after is not None:
+            query = query.where(User.id > after)
+        user_ids = self.db.scalars(query).all()
+        if not user_ids:
+            return 0, None
+
+        actual = (
+            select(func.count())
+            .where(Notification.user_id == User.id, Notification.is_read == False)
+            .correlate(User)
+            .scalar_subquery()
         )
-        if not book:
-            return None
+        fixed = self.db.execute(
+            update(User)
+            .where(User.id.in_(user_ids), User.unread_notifications_count != actual)
+            .values(unread_notifications_count=actual, updated_at=User.updated_at)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        return fixed, user_ids[-1]
 
-        title = "Новое бронирование"
-        message = f"Пользователь забронировал вашу книгу '{book.title}'"
+    def reconcile_unread_counters(self, batch_size: int) -> int:
+        """Сверка всех счетчиков непрочитанных; возвращает число исправленных"""
+        fixed, after = 0, None
+        while True:
+            batch_fixed, after = run_in_transaction(
+                self.db, self._reconcile_unread_batch, after, batch_size
+            )
+            if after is None:
+                return fixed
+            fixed += batch_fixed
 
-        return self.create_notification(
-            user_id=book.owner_id,
-            notification_type=NotificationType.BOOKING_CREATED,
-            title=title,
-            message=message,
-            booking_id=str(booking.id),
+    def _booking_books(self, booking_ids: Collection) -> List:
+        """Бронирования с названием и владельцем книги одним запросом"""
+        return (
+            self.db.query(
+                Booking.id,
+                Booking.borrower_id,
+                Booking.planned_return_date,
+                Book.title,
+                Book.owner_id,
+            )
+            .join(Book, Booking.book_id == Book.id)
+            .filter(Booking.id.in_(list(booking_ids)))
+            .all()
         )
 
-    def create_return_reminder(self, booking: Booking) -> Notification:
+    def create_booking_notifications(self, booking_ids: Collection) -> List[uuid.UUID]:
+        """Уведомления о новых бронированиях для владельцев книг"""
+        return self.create_notifications_bulk(
+            NotificationDraft(
+                user_id=row.owner_id,
+                notification_type=NotificationType.BOOKING_CREATED,
+                title="Новое бронирование",
+                message=f"Пользователь забронировал вашу книгу '{row.title}'",
+                booking_id=row.id,
+            )
+            for row in self._booking_books(booking_ids)
+        )
+
+    def create_booking_notification(self, booking: Booking) -> Optional[uuid.UUID]:
+        """Создание уведомления о новом бронировании для владельца книги"""
+        created = self.create_booking_notifications([booking.id])
+        return created[0] if created else None
+
+    def create_return_reminder(self, booking: Booking) -> Optional[uuid.UUID]:
         """Создание напоминания о возврате книги"""
-        book = (
-            self.db.query(Booking.book)
-            .join(Booking.book)
-            .filter(Booking.id == booking.id)
-            .first()
+        created = self.create_notifications_bulk(
+            NotificationDraft(
+                user_id=row.borrower_id,
+                notification_type=NotificationType.RETURN_REMINDER,
+                title="Напоминание о возврате",
+                message=(
+                    f"Не забудьте вернуть книгу '{row.title}' до {row.planned_return_date}"
+                ),
+                booking_id=row.id,
+            )
+            for row in self._booking_books([booking.id])
         )
-        if not book:
-            return None
+        return created[0] if created else None
+
+    def create_escalation_notifications(
+        self, booking_ids: Collection, step: EscalationStep, scheduled_for: date
+    ) -> int:
+        """
+        Уведомления ступени напоминаний для пакета бронирований
+
+        Один INSERT ... SELECT на пакет. Уведомление создается, только если
+        в том же запросе вставлена отметка (booking_id, type, scheduled_for)
+        в notification_dedup, поэтому повторный вызов ничего не дублирует.
+        scheduled_for - дата ступени (срок возврата + offset_days), а не день
+        запуска: досланная позже ступень не создается второй раз.
+        Возвращает количество созданных уведомлений.
+        """
+        if not booking_ids:
+            return 0
 
-        title = "Напоминание о возврате"
-        message = (
-            f"Не забудьте вернуть книгу '{book.title}' до {booking.planned_return_date}"
+        recipient = Book.owner_id if step.recipient == Actor.OWNER else Booking.borrower_id
+        now = datetime.utcnow()
+        claimed = (
+            pg_insert(NotificationDedup)
+            .from_select(
+                [
+                    NotificationDedup.booking_id,
+                    NotificationDedup.type,
+                    NotificationDedup.scheduled_for,
+                ],
+                select(
+                    Booking.id,
+                    literal(step.notification_type, NotificationDedup.type.type),
+                    literal(scheduled_for, NotificationDedup.scheduled_for.type),
+                ).where(Booking.id.in_(list(booking_ids))),
+            )
+            .on_conflict_do_nothing()
+            .returning(NotificationDedup.booking_id)
+            .cte("claimed")
+        )
+        notifications = select(
+            func.gen_random_uuid(),
+            recipient,
+            Booking.id,
+            literal(step.notification_type, Notification.type.type),
+            literal(step.title),
+            step.message(),
+            false(),
+            literal(now, Notification.created_at.type),
+            literal(scheduled_for, Notification.scheduled_for.type),
+        ).join_from(Booking, Book, Booking.book_id == Book.id).where(
+            Booking.id.in_(select(claimed.c.booking_id))
+        )
+        statement = (
+            insert(Notification)
+            .add_cte(claimed)
+            .from_select(
+                [
+                    Notification.id,
+                    Notification.user_id,
+                    Notification.booking_id,
+                    Notification.type,
+                    Notification.title,
+                    Notification.message,
+                    Notification.is_read,
+                    Notification.created_at,
+                    Notification.scheduled_for,
+                ],
+                notifications,
+            )
+            .returning(
+                *(getattr(Notification, field) for field in NOTIFICATION_EVENT_FIELDS)
+            )
         )
 
-        return self.create_notification(
-            user_id=booking.borrower_id,
-            notification_type=NotificationType.RETURN_REMINDER,
-            title=title,
-            message=message,
-            booking_id=str(booking.id),
+        created = self.db.execute(statement).mappings().all()
+        queue_notification_events(self.db, created)
+        self._add_unread(Counter(row["user_id"] for row in created))
+        self.db.commit()
+        return len(created)
+
+    def create_book_available_notifications(
+        self, book_id: str, user_ids: Collection
+    ) -> List[uuid.UUID]:
+        """Уведомления о доступности книги для нескольких пользователей"""
+        title = self.db.query(Book.title).filter(Book.id == book_id).scalar()
+        if title is None:
+            return []
+
+        return self.create_notifications_bulk(
+            NotificationDraft(
+                user_id=user_id,
+                notification_type=NotificationType.BOOK_AVAILABLE,
+                title="Книга доступна",
+                message=f"Книга '{title}' снова доступна для бронирования",
+            )
+            for user_id in user_ids
         )
 
     def create_book_available_notification(
         self, book_id: str, user_id: str
-    ) -> Notification:
+    ) -> Optional[uuid.UUID]:
         """Создание уведомления о доступности книги"""
-        book = self.db.query(Book).filter(Book.id == book_id).first()
-        if not book:
-            return None
-
-        title = "Книга доступна"
-        message = f"Книга '{book.title}' снова доступна для бронирования"
+        created = self.create_book_available_notifications(book_id, [user_id])
+        return created[0] if created else None
 
-        return self.create_notification(
-            user_id=user_id,
-            notification_type=NotificationType.BOOK_AVAILABLE,
-            title=title,
-            message=message,
+    def create_booking_cancelled_notifications(
+        self, booking_ids: Collection
+    ) -> List[uuid.UUID]:
+        """Уведомления об отмене бронирований для владельцев книг"""
+        return self.create_notifications_bulk(
+            NotificationDraft(
+                user_id=row.owner_id,
+                notification_type=NotificationType.BOOKING_CANCELLED,
+                title="Бронирование отменено",
+                message=f"Бронирование книги '{row.title}' было отменено",
+                booking_id=row.id,
+            )
+            for row in self._booking_books(booking_ids)
         )
 
-    def create_booking_cancelled_notification(self, booking: Booking) -> Notification:
+    def create_booking_cancelled_notification(
+        self, booking: Booking
+    ) -> Optional[uuid.UUID]:
         """Создание уведомления об отмене бронирования"""
-        book = (
-            self.db.query(Booking.book)
-            .join(Booking.book)
-            .filter(Booking.id == booking.id)
-            .first()
-        )
-        if not book:
-            return None
-
-        # Уведомление для владельца книги
-        title = "Бронирование отменено"
-        message = f"Бронирование книги '{book.title}' было отменено"
-
-        return self.create_notification(
-            user_id=book.owner_id,
-            notification_type=NotificationType.BOOKING_CANCELLED,
-            title=title,
-            message=message,
-            booking_id=str(booking.id),
-        )
+        created = self.create_booking_cancelled_notifications([booking.id])
+        return created[0] if created else None
 
-    def cleanup_old_notifications(self, days: int = 30) -> int:
-        """Очистка старых уведомлений"""
+    def cleanup_old_notifications(self, days: int = 30) -> Tuple[List[str], int]:
+        """
+        Очистка старых уведомлений (только прочитанных - счетчик не меняется)
+
+        Месячные секции, целиком старше срока, удаляются, непрочитанные из них
+        переносятся без изменений в архивную секцию; в секции по умолчанию
+        прочитанные удаляются по строкам (в ней мало данных). Возвращает
+        удаленные секции и число строк.
+        """
         cutoff_date = datetime.utcnow() - timedelta(days=days)
 
-        deleted_count = (
-            self.db.query(Notification)
-            .filter(
-                and_(
-                    Notification.created_at < cutoff_date, Notification.is_read == True
-                )
+        dropped = NotificationPartitionService(self.db).drop_expired_partitions(
+            cutoff_date
+        )
+        deleted_count = self.db.execute(
+            text(
+                f"DELETE FROM {DEFAULT_PARTITION} "
+                f"WHERE is_read AND created_at < :cutoff"
+            ),
+            {"cutoff": cutoff_date},
+        ).rowcount
+        self.db.execute(
+            delete(NotificationDedup).where(
+                NotificationDedup.scheduled_for < cutoff_date.date()
             )
-            .delete()
         )
 
         self.db.commit()
-        return deleted_count
+        return dropped, deleted_count
@@ -0,0 +1,127 @@
+"""
+Сервис исходящих событий (transactional outbox)
+"""
+
+from datetime import datetime, timedelta
+from typing import Callable
+from sqlalchemy import delete, func, insert, literal, or_, select, update
+from sqlalchemy.orm import Session
+from app.models.outbox import OutboxEvent, OutboxEventType
+
+
+def outbox_event(event_type: OutboxEventType, aggregate_ids, now: datetime, name: str):
+    """
+    CTE записи событий event_type для aggregate_ids (подзапрос с одной колонкой)
+
+    Добавляется в запрос, меняющий бронирование: событие появляется,
+    только если изменение выполнено.
+    """
+    aggregate_ids = aggregate_ids.subquery()
+    return (
+        insert(OutboxEvent)
+        .from_select(
+            [
+                OutboxEvent.id,
+                OutboxEvent.event_type,
+                OutboxEvent.aggregate_id,
+                OutboxEvent.created_at,
+                OutboxEvent.attempts,
+            ],
+            select(
+                func.gen_random_uuid(),
+                literal(event_type, OutboxEvent.event_type.type),
+                *aggregate_ids.c,
+                literal(now, OutboxEvent.created_at.type),
+                literal(0),
+            ),
+        )
+        .cte(name)
+    )
+
+
+class OutboxService:
+    """Сервис исходящих событий"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def relay(
+        self,
+        dispatch: Callable[[OutboxEvent], None],
+        limit: int,
+        redispatch_after: int,
+    ) -> int:
+        """
+        Передача пакета событий обработчикам
+
+        Выбираются необработанные события, еще не переданные или переданные
+        давно (обработчик мог потеряться), - SKIP LOCKED позволяет нескольким
+        relay работать параллельно. dispatch ставит задачу в очередь; при
+        ошибке транзакция откатывается и события будут переданы снова
+        (доставка "хотя бы один раз"). Возвращает число переданных событий.
+        """
+        now = datetime.utcnow()
+        events = self.db.scalars(
+            select(OutboxEvent)
+            .where(
+                OutboxEvent.processed_at.is_(None),
+                or_(
+                    OutboxEvent.dispatched_at.is_(None),
+                    OutboxEvent.dispatched_at < now - timedelta(seconds=redispatch_after),
+                ),
+            )
+            .order_by(OutboxEvent.created_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        ).all()
+        if not events:
+            self.db.commit()
+            return 0
+
+        try:
+            for event in events:
+                dispatch(event)
+        except Exception:
+            self.db.rollback()
+            raise
+
+        self.db.execute(
+            update(OutboxEvent)
+            .where(OutboxEvent.id.in_([event.id for event in events]))
+            .values(dispatched_at=now, attempts=OutboxEvent.attempts + 1)
+            .execution_options(synchronize_session=False)
+        )
+        self.db.commit()
+        return len(events)
+
+    def mark_processed(self, event_id: str) -> bool:
+        """
+        Отметка события обработанным в транзакции обработчика
+
+        False - событие уже обработано (повторная доставка). Commit делает
+        обработчик вместе со своими изменениями; одновременный дубликат
+        ждет блокировку строки и получает False.
+        """
+        marked = self.db.execute(
+            update(OutboxEvent)
+            .where(OutboxEvent.id == event_id, OutboxEvent.processed_at.is_(None))
+            .values(processed_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        return marked > 0
+
+    def purge_processed(self, cutoff: datetime, limit: int) -> int:
+        """Удаление пакета обработанных событий старше cutoff"""
+        expired = (
+            select(OutboxEvent.id)
+            .where(OutboxEvent.processed_at < cutoff)
+            .limit(limit)
+            .scalar_subquery()
+        )
+        deleted = self.db.execute(
+            delete(OutboxEvent)
+            .where(OutboxEvent.id.in_(expired))
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        self.db.commit()
+        return deleted
@@ -0,0 +1,162 @@
+"""
+Сервис очереди ожидания книг
+"""
+
+from datetime import datetime
+from typing import Optional, Tuple
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import delete, false, func, insert, literal, select, true, tuple_
+from sqlalchemy.exc import IntegrityError
+from fastapi import HTTPException, status
+from app.models.book import Book
+from app.models.notification import Notification, NotificationType
+from app.models.waitlist import WaitlistEntry
+from app.services.notification_service import NOTIFICATION_EVENT_FIELDS
+
+
+def waitlist_handoff(book_ids, now: datetime) -> Tuple:
+    """
+    CTE передачи книг первым в очередях ожидания
+
+    Удаляет голову очереди каждой книги из book_ids (запрос с одной колонкой
+    id книги) и создает для нее уведомление BOOK_AVAILABLE. Добавляется
+    в запрос, освобождающий книги, - очередь и уведомление меняются в той же
+    транзакции. Голова выбирается по каждой книге отдельно (LATERAL), запись,
+    которую одновременно удаляет leave(), пропускается (SKIP LOCKED),
+    и уведомление получает следующий в очереди. Возвращает CTE удаления
+    и вставки уведомлений (RETURNING полей события потока); счетчик
+    непрочитанных вызывающий увеличивает через unread_counter_increment
+    вместе с остальными уведомлениями запроса, события читает через
+    notification_events.
+    """
+    books = book_ids.subquery("handoff_books")
+    queued = aliased(WaitlistEntry)
+    head = (
+        select(queued.id)
+        .where(queued.book_id == books.c[0])
+        .order_by(queued.created_at, queued.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .lateral("waitlist_next")
+    )
+    popped = (
+        delete(WaitlistEntry)
+        .where(WaitlistEntry.id.in_(select(head.c.id).select_from(books).join(head, true())))
+        .returning(WaitlistEntry.user_id, WaitlistEntry.book_id)
+        .cte("waitlist_head")
+    )
+
+    values = {
+        Notification.type: NotificationType.BOOK_AVAILABLE,
+        Notification.title: "Книга доступна",
+    }
+    notified = (
+        insert(Notification)
+        .from_select(
+            [
+                Notification.id,
+                Notification.user_id,
+                *values.keys(),
+                Notification.message,
+                Notification.is_read,
+                Notification.created_at,
+            ],
+            select(
+                func.gen_random_uuid(),
+                popped.c.user_id,
+                *(literal(value, column.type) for column, value in values.items()),
+                func.concat(
+                    "Книга '", Book.title, "' снова доступна для бронирования"
+                ),
+                false(),
+                literal(now, Notification.created_at.type),
+            ).join_from(popped, Book, Book.id == popped.c.book_id),
+        )
+        .returning(*(getattr(Notification, field) for field in NOTIFICATION_EVENT_FIELDS))
+        .cte("waitlist_notification")
+    )
+    return popped, notified
+
+
+class WaitlistService:
+    """Сервис очереди ожидания книг"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def join(self, book_id: str, user_id: str) -> dict:
+        """Постановка пользователя в конец очереди ожидания книги"""
+        book = (
+            self.db.query(Book.owner_id, Book.is_active, Book.is_available)
+            .filter(Book.id == book_id)
+            .first()
+        )
+        if not book or not book.is_active:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Книга не найдена"
+            )
+
+        if str(book.owner_id) == str(user_id):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Нельзя встать в очередь на собственную книгу",
+            )
+
+        if book.is_available:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Книга доступна - ее можно забронировать",
+            )
+
+        self.db.add(WaitlistEntry(book_id=book_id, user_id=user_id))
+        try:
+            self.db.commit()
+        except IntegrityError as error:
+            self.db.rollback()
+            constraint = getattr(getattr(error.orig, "diag", None), "constraint_name", None)
+            if constraint == "uq_waitlist_entries_book_user":
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="Вы уже в очереди на эту книгу",
+                )
+            raise
+
+        return self.get_position(book_id, user_id)
+
+    def get_position(self, book_id: str, user_id: str) -> Optional[dict]:
+        """Позиция пользователя в очереди (по индексу book_id, created_at, id)"""
+        entry = (
+            self.db.query(WaitlistEntry.id, WaitlistEntry.created_at)
+            .filter(WaitlistEntry.book_id == book_id, WaitlistEntry.user_id == user_id)
+            .first()
+        )
+        if not entry:
+            return None
+
+        position, queue_length = (
+            self.db.query(
+                func.count().filter(
+                    tuple_(WaitlistEntry.created_at, WaitlistEntry.id)
+                    <= tuple_(entry.created_at, entry.id)
+                ),
+                func.count(),
+            )
+            .filter(WaitlistEntry.book_id == book_id)
+            .one()
+        )
+        return {
+            "book_id": str(book_id),
+            "position": position,
+            "queue_length": queue_length,
+            "joined_at": entry.created_at,
+        }
+
+    def leave(self, book_id: str, user_id: str) -> bool:
+        """Выход из очереди ожидания"""
+        result = self.db.execute(
+            delete(WaitlistEntry).where(
+                WaitlistEntry.book_id == book_id, WaitlistEntry.user_id == user_id
+            )
+        )
+        self.db.commit()
+        return result.rowcount > 0
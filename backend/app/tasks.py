@@ -2,14 +2,21 @@
 Фоновые задачи Celery
 """
 
-from datetime import datetime, timedelta
-from celery import current_task
+import uuid
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Tuple
+from zoneinfo import ZoneInfo
+from celery import group
 from sqlalchemy.orm import sessionmaker
+from app.core.cache import get_cache_backend
 from app.core.database import engine
 from app.core.config import settings
-from app.models.booking import Booking, BookingStatus
-from app.models.notification import Notification
+from app.models.outbox import OutboxEventType
 from app.services.notification_service import NotificationService
+from app.services.notification_partitions import NotificationPartitionService
+from app.services.outbox_service import OutboxService
+from app.services.booking_service import BookingService
+from app.services.booking_escalation import EscalationStep, catchup_days, escalation_ladder
 from app.celery_app import celery_app
 
 # Создание сессии для задач
@@ -25,37 +32,122 @@ def get_db():
         db.close()
 
 
+def _booking_id_shards(count: int) -> List[Tuple[Optional[str], Optional[str]]]:
+    """Разбиение пространства UUID на count диапазонов [от, до)"""
+    bounds = [str(uuid.UUID(int=(index << 128) // count)) for index in range(1, count)]
+    return list(zip([None] + bounds, bounds + [None]))
+
+
+def _escalation_checkpoint_key(
+    step: EscalationStep, step_date: date, id_from: Optional[str]
+) -> str:
+    return (
+        f"checkpoint:escalation:{step_date.isoformat()}:"
+        f"{step.recipient.name}:{step.offset_days}:{id_from or ''}"
+    )
+
+
 @celery_app.task
-def send_return_reminders():
-    """Отправка напоминаний о возврате книг"""
+def escalate_due_bookings():
+    """
+    Запуск лестницы напоминаний о возврате и просрочке
+
+    Выданные бронирования делятся на части по диапазонам id, каждая часть
+    обрабатывается отдельной задачей (group) - время выполнения не растет
+    с числом выдач, пока хватает воркеров.
+    """
+    today = datetime.now(ZoneInfo(settings.local_timezone)).date()
+    shards = _booking_id_shards(settings.overdue_shards)
+    group(
+        escalate_due_bookings_shard.s(id_from, id_to, today.isoformat())
+        for id_from, id_to in shards
+    ).apply_async()
+    return f"Запущено частей: {len(shards)}"
+
+
+@celery_app.task
+def escalate_due_bookings_shard(
+    id_from: Optional[str], id_to: Optional[str], today: str
+):
+    """
+    Уведомления всех ступеней лестницы для части бронирований [id_from, id_to)
+
+    Бронирования читаются пакетами по id, уведомления пакета создаются одним
+    INSERT ... SELECT и фиксируются, после чего последний id пакета
+    сохраняется как контрольная точка ступени: перезапуск (и досылка
+    пропущенных ступеней в следующие дни) продолжает с нее, а
+    notification_dedup не дает дублировать уже созданные уведомления.
+    """
     db = next(get_db())
+    booking_service = BookingService(db)
     notification_service = NotificationService(db)
+    checkpoints = get_cache_backend()
 
     try:
-        # Находим бронирования, которые нужно вернуть завтра
-        tomorrow = datetime.now().date() + timedelta(days=1)
-
-        bookings = (
-            db.query(Booking)
-            .filter(
-                Booking.status == BookingStatus.TAKEN,
-                Booking.planned_return_date == tomorrow,
-            )
-            .all()
-        )
+        today = date.fromisoformat(today)
+        chunk_size = settings.return_reminder_chunk_size
 
-        reminders_sent = 0
-        for booking in bookings:
-            try:
-                notification_service.create_return_reminder(booking)
-                reminders_sent += 1
-            except Exception as e:
-                print(f"Ошибка отправки напоминания для бронирования {booking.id}: {e}")
+        created = 0
+        ladder = catchup_days(escalation_ladder(), settings.escalation_catchup_days)
+        for step, max_lag in ladder:
+            # Ступень, пропущенная в предыдущие дни (задача не запускалась),
+            # создается сейчас; уже созданные отсекает notification_dedup
+            # по дате ступени
+            for lag in range(max_lag + 1):
+                step_date = today - timedelta(days=lag)
+                return_date = step_date - timedelta(days=step.offset_days)
+                checkpoint_key = _escalation_checkpoint_key(step, step_date, id_from)
+                last_id = checkpoints.get(checkpoint_key)
+                while True:
+                    booking_ids = booking_service.get_taken_booking_ids(
+                        return_date, id_from, id_to, chunk_size, after=last_id
+                    )
+                    if not booking_ids:
+                        break
+                    created += notification_service.create_escalation_notifications(
+                        booking_ids, step, step_date
+                    )
+                    last_id = str(booking_ids[-1])
+                    checkpoints.set(
+                        checkpoint_key,
+                        last_id,
+                        ttl=settings.return_reminder_checkpoint_ttl,
+                    )
+                    if len(booking_ids) < chunk_size:
+                        break
 
-        return f"Отправлено напоминаний: {reminders_sent}"
+        return f"Создано уведомлений: {created}"
 
     except Exception as e:
-        print(f"Ошибка в задаче send_return_reminders: {e}")
+        print(f"Ошибка в задаче escalate_due_bookings_shard: {e}")
+        raise
+    finally:
+        db.close()
+
+
+@celery_app.task
+def expire_stale_bookings():
+    """Отмена бронирований, которые не забрали к планируемой дате"""
+    db = next(get_db())
+    booking_service = BookingService(db)
+
+    try:
+        today = datetime.now(ZoneInfo(settings.local_timezone)).date()
+        batch_size = settings.booking_expiry_batch_size
+
+        # Пакеты по batch_size в отдельных транзакциях, чтобы не держать
+        # блокировки на всех просроченных бронированиях сразу
+        expired_count = 0
+        for _ in range(settings.booking_expiry_max_batches):
+            expired = booking_service.expire_stale_bookings(today, batch_size)
+            expired_count += expired
+            if expired < batch_size:
+                break
+
+        return f"Отменено просроченных бронирований: {expired_count}"
+
+    except Exception as e:
+        print(f"Ошибка в задаче expire_stale_bookings: {e}")
         raise
     finally:
         db.close()
@@ -68,8 +160,13 @@ def cleanup_old_notifications():
     notification_service = NotificationService(db)
 
     try:
-        deleted_count = notification_service.cleanup_old_notifications(days=30)
-        return f"Удалено старых уведомлений: {deleted_count}"
+        dropped, deleted_count = notification_service.cleanup_old_notifications(
+            days=settings.notification_retention_days
+        )
+        return (
+            f"Удалено секций уведомлений: {len(dropped)}, "
+            f"старых уведомлений: {deleted_count}"
+        )
 
     except Exception as e:
         print(f"Ошибка в задаче cleanup_old_notifications: {e}")
@@ -79,15 +176,58 @@ def cleanup_old_notifications():
 
 
 @celery_app.task
-def send_booking_notification(booking_id: str):
-    """Отправка уведомления о новом бронировании"""
+def create_notification_partitions():
+    """Создание месячных секций уведомлений заранее"""
+    db = next(get_db())
+    partition_service = NotificationPartitionService(db)
+
+    try:
+        created = partition_service.ensure_partitions(
+            datetime.utcnow().date(), settings.notification_partitions_ahead
+        )
+        return f"Создано секций уведомлений: {len(created)}"
+
+    except Exception as e:
+        print(f"Ошибка в задаче create_notification_partitions: {e}")
+        raise
+    finally:
+        db.close()
+
+
+@celery_app.task
+def reconcile_unread_counters():
+    """Сверка счетчиков непрочитанных уведомлений с таблицей уведомлений"""
+    db = next(get_db())
+    notification_service = NotificationService(db)
+
+    try:
+        fixed = notification_service.reconcile_unread_counters(
+            settings.unread_counter_reconcile_batch_size
+        )
+        return f"Исправлено счетчиков непрочитанных: {fixed}"
+
+    except Exception as e:
+        print(f"Ошибка в задаче reconcile_unread_counters: {e}")
+        raise
+    finally:
+        db.close()
+
+
+@celery_app.task
+def send_booking_notification(booking_id: str, event_id: Optional[str] = None):
+    """
+    Отправка уведомления о новом бронировании
+
+    event_id - исходящее событие: отметка об обработке и уведомление
+    сохраняются одним commit, повторная доставка события пропускается.
+    """
     db = next(get_db())
     notification_service = NotificationService(db)
 
     try:
-        booking = db.query(Booking).filter(Booking.id == booking_id).first()
-        if booking:
-            notification_service.create_booking_notification(booking)
+        if event_id is not None and not OutboxService(db).mark_processed(event_id):
+            return f"Событие {event_id} уже обработано"
+        if notification_service.create_booking_notifications([booking_id]):
             return f"Уведомление отправлено для бронирования {booking_id}"
         else:
             return f"Бронирование {booking_id} не найдено"
@@ -100,15 +240,15 @@ def send_booking_notification(booking_id: str):
 
 
 @celery_app.task
-def send_booking_cancelled_notification(booking_id: str):
-    """Отправка уведомления об отмене бронирования"""
+def send_booking_cancelled_notification(booking_id: str, event_id: Optional[str] = None):
+    """Отправка уведомления об отмене бронирования (event_id - см. выше)"""
     db = next(get_db())
     notification_service = NotificationService(db)
 
     try:
-        booking = db.query(Booking).filter(Booking.id == booking_id).first()
-        if booking:
-            notification_service.create_booking_cancelled_notification(booking)
+        if event_id is not None and not OutboxService(db).mark_processed(event_id):
+            return f"Событие {event_id} уже обработано"
+        if notification_service.create_booking_cancelled_notifications([booking_id]):
             return f"Уведомление об отмене отправлено для бронирования {booking_id}"
         else:
             return f"Бронирование {booking_id} не найдено"
@@ -127,7 +267,7 @@ def send_book_available_notification(book_id: str, user_id: str):
     notification_service = NotificationService(db)
 
     try:
-        notification_service.create_book_available_notification(book_id, user_id)
+        notification_service.create_book_available_notifications(book_id, [user_id])
         return f"Уведомление о доступности отправлено для книги {book_id}"
 
     except Exception as e:
@@ -135,3 +275,46 @@ def send_book_available_notification(book_id: str, user_id: str):
         raise
     finally:
         db.close()
+
+
+# Обработчики исходящих событий
+OUTBOX_HANDLERS = {
+    OutboxEventType.BOOKING_CREATED: send_booking_notification,
+    OutboxEventType.BOOKING_CANCELLED: send_booking_cancelled_notification,
+}
+
+
+def _dispatch_outbox_event(event) -> None:
+    OUTBOX_HANDLERS[event.event_type].apply_async(
+        kwargs={"booking_id": str(event.aggregate_id), "event_id": str(event.id)}
+    )
+
+
+@celery_app.task
+def relay_outbox_events():
+    """Передача исходящих событий в очередь задач"""
+    db = next(get_db())
+    outbox_service = OutboxService(db)
+
+    try:
+        batch_size = settings.outbox_relay_batch_size
+        relayed = 0
+        for _ in range(settings.outbox_relay_max_batches):
+            dispatched = outbox_service.relay(
+                _dispatch_outbox_event, batch_size, settings.outbox_redispatch_after
+            )
+            relayed += dispatched
+            if dispatched < batch_size:
+                break
+
+        outbox_service.purge_processed(
+            datetime.utcnow() - timedelta(hours=settings.outbox_retention_hours),
+            batch_size,
+        )
+        return f"Передано событий: {relayed}"
+
+    except Exception as e:
+        print(f"Ошибка в задаче relay_outbox_events: {e}")
+        raise
+    finally:
+        db.close()
@@ -0,0 +1,124 @@
+"""
+Геопоиск ближайших точек
+"""
+
+import heapq
+import math
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def parse_coordinates(coordinates: Optional[str]) -> Optional[Tuple[float, float]]:
+    """Разбор строки "широта,долгота" (None - координаты не заданы или некорректны)"""
+    if not coordinates:
+        return None
+    try:
+        lat, lng = (float(part.strip()) for part in coordinates.split(","))
+    except ValueError:
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return None
+    return lat, lng
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Расстояние по дуге большого круга в километрах"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class GridIndex:
+    """
+    Пространственный индекс точек на сетке широта/долгота
+
+    Точки раскладываются по ячейкам cell_deg x cell_deg градусов. Поиск
+    обходит ячейки кольцами вокруг точки поиска и уточняет расстояние
+    по формуле гаверсинусов. Индекс неизменяем: при изменении точек
+    строится заново.
+    """
+
+    def __init__(self, points: Iterable[Tuple[str, float, float]], cell_deg: float = 0.1):
+        self.cell_deg = cell_deg
+        self.columns = math.ceil(360 / cell_deg)
+        self.cells: Dict[Tuple[int, int], List[Tuple[str, float, float]]] = defaultdict(list)
+        self.size = 0
+        for key, lat, lng in points:
+            self.cells[self._cell(lat, lng)].append((key, lat, lng))
+            self.size += 1
+
+    def _row(self, lat: float) -> int:
+        return math.floor((lat + 90) / self.cell_deg)
+
+    def _column(self, lng: float) -> int:
+        return math.floor((lng + 180) / self.cell_deg) % self.columns
+
+    def _cell(self, lat: float, lng: float) -> Tuple[int, int]:
+        return self._row(lat), self._column(lng)
+
+    def _bounds(self, lat: float, radius_km: float) -> Tuple[int, int, float]:
+        """
+        Диапазон строк сетки в радиусе и нижняя оценка ширины ячейки в км
+
+        Градус долготы короче у полюсов, поэтому ширина ячейки берется
+        на самой близкой к полюсу широте в радиусе.
+        """
+        dlat = radius_km / KM_PER_DEGREE
+        lat_min, lat_max = max(lat - dlat, -90.0), min(lat + dlat, 90.0)
+        widest = max(abs(lat_min), abs(lat_max))
+        cell_km = self.cell_deg * KM_PER_DEGREE
+        cell_km = min(cell_km, cell_km * math.cos(math.radians(widest)))
+        return self._row(lat_min), self._row(lat_max), cell_km
+
+    def _ring(self, row: int, column: int, ring: int, row_min: int, row_max: int):
+        """Ячейки на расстоянии ring ячеек (по Чебышеву) от центральной"""
+        for ring_row in range(max(row - ring, row_min), min(row + ring, row_max) + 1):
+            if abs(ring_row - row) == ring:
+                offsets = range(-ring, ring + 1)
+            else:
+                offsets = (-ring, ring) if ring else (0,)
+            for offset in offsets:
+                yield ring_row, (column + offset) % self.columns
+
+    def nearest(
+        self, lat: float, lng: float, k: int, radius_km: float
+    ) -> List[Tuple[str, float]]:
+        """
+        k ближайших точек в радиусе: [(ключ, расстояние в км)] по возрастанию
+
+        Ячейки просматриваются кольцами от ячейки точки поиска. Точки
+        за кольцом ring не ближе ring * ширина ячейки, поэтому обход
+        прекращается, как только k-я найденная точка ближе этой оценки.
+        Если колец больше, чем непустых ячеек, просматриваются все ячейки.
+        """
+        row_min, row_max, cell_km = self._bounds(lat, radius_km)
+        max_ring = math.ceil(radius_km / cell_km) + 1 if cell_km > 1e-9 else self.columns
+        row, column = self._cell(lat, lng)
+
+        found: List[Tuple[float, str]] = []
+        if (2 * max_ring + 1) ** 2 > len(self.cells):
+            cells = [self.cells.keys()]
+        else:
+            cells = (self._ring(row, column, ring, row_min, row_max) for ring in range(max_ring + 1))
+
+        visited = set()
+        for ring, ring_cells in enumerate(cells):
+            for cell in ring_cells:
+                if cell in visited:
+                    continue
+                visited.add(cell)
+                for key, point_lat, point_lng in self.cells.get(cell, ()):
+                    distance = haversine_km(lat, lng, point_lat, point_lng)
+                    if distance <= radius_km:
+                        found.append((distance, key))
+
+            # Непросмотренные ячейки не ближе ring * cell_km
+            if len(found) >= k and heapq.nsmallest(k, found)[-1][0] <= ring * cell_km:
+                break
+
+        return [(key, distance) for distance, key in heapq.nsmallest(k, found)]
@@ -0,0 +1,143 @@
+"""
+Разбор часов работы пунктов выдачи
+"""
+
+import re
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+SLOTS_PER_WEEK = 7 * SLOTS_PER_DAY
+BITMAP_BYTES = SLOTS_PER_WEEK // 8
+
+DAY_NAMES = ("пн", "вт", "ср", "чт", "пт", "сб", "вс")
+# День недели по первым буквам: "Пн" и "Понедельник", "Mon" и "Monday"
+_DAY_ALIASES = {
+    **{name: index for index, name in enumerate(DAY_NAMES)},
+    **{name: index for index, name in enumerate(("по", "вт", "ср", "че", "пя", "су", "во"))},
+    **{name: index for index, name in enumerate(("mon", "tue", "wed", "thu", "fri", "sat", "sun"))},
+}
+_EVERY_DAY = ("ежедневно", "без выходных", "daily")
+_ALWAYS_OPEN = ("круглосуточно", "24/7")
+_CLOSED = ("выходной", "закрыто", "closed")
+
+_DAY = (
+    r"\b(?:понедельник|вторник|сред[аеуы]|четверг|пятниц[аеуы]|суббот[аеуы]|воскресенье"
+    r"|пн|вт|ср|чт|пт|сб|вс|(?:mon|tue|wed|thu|fri|sat|sun)[a-z]*)\b\.?"
+)
+_DAY_WORD = re.compile(_DAY, re.IGNORECASE)
+_DAYS_SPEC = re.compile(
+    rf"((?:{_DAY}|ежедневно|без выходных|daily)(?:\s*[-–—,]\s*{_DAY})*)\s*:",
+    re.IGNORECASE,
+)
+_TIME_RANGE = re.compile(
+    r"(\d{1,2})[:.](\d{2})\s*[-–—]\s*(\d{1,2})[:.](\d{2})"
+)
+
+
+def _parse_days(spec: str) -> List[int]:
+    """Дни недели из "Пн-Пт", "Сб, Вс", "Понедельник-пятница", "Ежедневно" (0 - понедельник)"""
+    spec = spec.strip().lower()
+    if spec in _EVERY_DAY:
+        return list(range(7))
+
+    days = []
+    for part in re.split(r"\s*,\s*", spec):
+        bounds = [
+            _DAY_ALIASES.get(bound.strip(" .")[:2], _DAY_ALIASES.get(bound.strip(" .")[:3]))
+            for bound in re.split(r"\s*[-–—]\s*", part)
+        ]
+        start, end = bounds[0], bounds[-1]
+        # Диапазон может переходить через воскресенье ("Сб-Пн")
+        days.extend((start + offset) % 7 for offset in range((end - start) % 7 + 1))
+    return days
+
+
+def _parse_ranges(text: str) -> List[Tuple[int, int]]:
+    """Интервалы работы дня в минутах от полуночи"""
+    lowered = text.lower()
+    if any(word in lowered for word in _ALWAYS_OPEN):
+        return [(0, 24 * 60)]
+    if any(word in lowered for word in _CLOSED):
+        return []
+
+    ranges = []
+    for open_h, open_m, close_h, close_m in _TIME_RANGE.findall(text):
+        opens = int(open_h) * 60 + int(open_m)
+        closes = int(close_h) * 60 + int(close_m)
+        if opens > 24 * 60 or closes > 24 * 60 or int(open_m) > 59 or int(close_m) > 59:
+            raise ValueError(f"Некорректное время: {open_h}:{open_m}-{close_h}:{close_m}")
+        ranges.append((opens, closes))
+
+    if not ranges:
+        raise ValueError(f"Не удалось разобрать часы работы: {text.strip()!r}")
+    return ranges
+
+
+def parse_working_hours(text: str) -> Dict[int, List[Tuple[int, int]]]:
+    """
+    Разбор строки часов работы в недельное расписание
+
+    "Пн-Пт: 9:00-21:00, Сб-Вс: 10:00-18:00" -> {0: [(540, 1260)], ...}
+    "Понедельник-пятница: 09:00-18:00" -> {0: [(540, 1080)], ..., 5: [], 6: []}
+    Интервалы в минутах от полуночи; закрытие раньше открытия означает
+    работу после полуночи. Непонятная строка вызывает ValueError, в том
+    числе дни без двоеточия ("Пн-Пт 9:00-18:00"): такая строка не должна
+    превращаться в расписание на всю неделю.
+    """
+    schedule: Dict[int, List[Tuple[int, int]]] = {day: [] for day in range(7)}
+    parts = _DAYS_SPEC.split(text)
+
+    if len(parts) == 1:
+        # Без указания дней: "Круглосуточно" или "9:00-21:00" на всю неделю
+        if _DAY_WORD.search(text):
+            raise ValueError(f"Не удалось разобрать дни работы: {text.strip()!r}")
+        ranges = _parse_ranges(text)
+        for day in range(7):
+            schedule[day] = list(ranges)
+        return schedule
+
+    if parts[0].strip(" ,;"):
+        raise ValueError(f"Не удалось разобрать часы работы: {parts[0].strip()!r}")
+
+    for spec, ranges_text in zip(parts[1::2], parts[2::2]):
+        ranges = _parse_ranges(ranges_text)
+        for day in _parse_days(spec):
+            schedule[day] = list(ranges)
+    return schedule
+
+
+def schedule_to_bitmap(schedule: Dict[int, List[Tuple[int, int]]]) -> bytes:
+    """
+    Недельное расписание в битовую карту 7 x 96 (15-минутные интервалы)
+
+    Бит weekday * 96 + minute // 15 установлен, если пункт открыт в этот
+    интервал. Интервал, в котором пункт работает хотя бы часть времени,
+    считается открытым.
+    """
+    mask = 0
+    for day, ranges in schedule.items():
+        for opens, closes in ranges:
+            if closes <= opens:
+                closes += 24 * 60  # работа после полуночи
+            first = day * SLOTS_PER_DAY + opens // SLOT_MINUTES
+            last = day * SLOTS_PER_DAY + -(-closes // SLOT_MINUTES)
+            for slot in range(first, last):
+                mask |= 1 << (slot % SLOTS_PER_WEEK)
+    return mask.to_bytes(BITMAP_BYTES, "little")
+
+
+def working_hours_bitmap(text: str) -> bytes:
+    """Битовая карта часов работы из строки"""
+    return schedule_to_bitmap(parse_working_hours(text))
+
+
+def week_slot(moment: datetime) -> int:
+    """Номер 15-минутного интервала недели для момента (местное время)"""
+    return moment.weekday() * SLOTS_PER_DAY + (moment.hour * 60 + moment.minute) // SLOT_MINUTES
+
+
+def is_open(mask: int, moment: datetime) -> bool:
+    """Открыт ли пункт в момент moment (mask - битовая карта как int)"""
+    return bool(mask >> week_slot(moment) & 1)
@@ -10,6 +10,8 @@ import os
 
 from app.core.config import settings
 from app.core.database import engine, Base
+from app.core.cache import invalidation_bus, cache_metrics
+from app.core.notification_stream import notification_broker
 from app.api import auth, books, bookings, notifications
 
 
@@ -24,8 +26,16 @@ async def lifespan(app: FastAPI):
     os.makedirs(os.path.join(settings.upload_dir, "avatars"), exist_ok=True)
     os.makedirs(os.path.join(settings.upload_dir, "book_covers"), exist_ok=True)
 
+    # Подписка на инвалидацию локальных кэшей другими воркерами
+    invalidation_bus.start()
+    # Подписка на события уведомлений для потока /notifications/stream
+    notification_broker.start()
+
     yield
 
+    notification_broker.stop()
+    invalidation_bus.stop()
+
 
 # Создание приложения FastAPI
 app = FastAPI(
@@ -145,6 +155,12 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/health/cache")
+async def cache_health():
+    """Метрики кэшей текущего воркера"""
+    return cache_metrics()
+
+
 if __name__ == "__main__":
     import uvicorn
 
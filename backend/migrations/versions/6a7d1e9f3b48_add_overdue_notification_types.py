@@ -0,0 +1,41 @@
+"""add_overdue_notification_types
+
+Revision ID: 6a7d1e9f3b48
+Revises: 5f2c8e4b1d76
+Create Date: 2026-10-20 00:09:41.273580
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "6a7d1e9f3b48"
+down_revision = "5f2c8e4b1d76"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # В enum хранятся имена значений. ADD VALUE выполняется вне транзакции
+    with op.get_context().autocommit_block():
+        op.execute("ALTER TYPE notificationtype ADD VALUE IF NOT EXISTS 'BOOKING_OVERDUE'")
+        op.execute("ALTER TYPE notificationtype ADD VALUE IF NOT EXISTS 'OVERDUE_ALERT'")
+
+
+def downgrade() -> None:
+    # Значения enum в PostgreSQL не удаляются - пересоздаем тип без них
+    op.execute(
+        "DELETE FROM notifications WHERE type IN ('BOOKING_OVERDUE', 'OVERDUE_ALERT')"
+    )
+    op.execute("ALTER TYPE notificationtype RENAME TO notificationtype_old")
+    op.execute(
+        "CREATE TYPE notificationtype AS ENUM "
+        "('BOOKING_CREATED', 'RETURN_REMINDER', 'BOOK_AVAILABLE', 'BOOKING_CANCELLED')"
+    )
+    op.execute(
+        "ALTER TABLE notifications ALTER COLUMN type TYPE notificationtype "
+        "USING type::text::notificationtype"
+    )
+    op.execute("DROP TYPE notificationtype_old")
@@ -0,0 +1,48 @@
+"""recompute_booking_points_working_hours_bitmap
+
+Revision ID: c4e8b2f6a913
+Revises: a3d7f1b9c046
+Create Date: 2026-10-19 23:14:52.418306
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.utils.working_hours import working_hours_bitmap
+
+
+# revision identifiers, used by Alembic.
+revision = "c4e8b2f6a913"
+down_revision = "a3d7f1b9c046"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Строки с днями без двоеточия ("Пн-Пт 9:00-18:00") и с полными
+    # названиями дней раньше разбирались как расписание на всю неделю
+    connection = op.get_bind()
+    booking_points = sa.table(
+        "booking_points",
+        sa.column("id"),
+        sa.column("working_hours", sa.String),
+        sa.column("working_hours_bitmap", sa.LargeBinary),
+    )
+    rows = connection.execute(
+        sa.select(booking_points.c.id, booking_points.c.working_hours)
+    ).all()
+    for point_id, working_hours in rows:
+        try:
+            bitmap = working_hours_bitmap(working_hours)
+        except ValueError:
+            bitmap = None
+        connection.execute(
+            booking_points.update()
+            .where(booking_points.c.id == point_id)
+            .values(working_hours_bitmap=bitmap)
+        )
+
+
+def downgrade() -> None:
+    pass